@@ -0,0 +1,78 @@
+import hmac
+import json
+from typing import Any, List, Literal, Optional
+from fastapi import Header, HTTPException, Query, Request
+from app.core.config import settings
+from app.core.export import MEDIA_TYPES
+from app.services.completion_cache import cache_bypass
+from app.services.single_flight import coalesce_scope
+from app.services.rate_limiter import request_priority, PRIORITY_INTERACTIVE, PRIORITY_DEFAULT, PRIORITY_BATCH
+
+# Lets a client skip the completion cache for one request with either
+# "Cache-Control: no-cache" or "X-Cache-Bypass: true".
+async def read_cache_headers(request: Request):
+    cache_control = request.headers.get("cache-control", "").lower()
+    bypass = request.headers.get("x-cache-bypass", "").lower() in ("1", "true", "yes")
+    cache_bypass.set(bypass or "no-cache" in cache_control or "no-store" in cache_control)
+
+# Coalesce identical in-flight completions for the endpoints listed in
+# SINGLE_FLIGHT_ENDPOINTS (matched on the endpoint function name).
+async def coalesce_completions(request: Request):
+    endpoint = getattr(request.scope.get("endpoint"), "__name__", None)
+    enabled = {name.strip() for name in settings.SINGLE_FLIGHT_ENDPOINTS.split(",") if name.strip()}
+    coalesce_scope.set(endpoint if endpoint in enabled else None)
+
+# Scheduling priority of the request's completions: /ask is interactive, the
+# agents default, and any caller can demote itself with "X-Priority: batch".
+async def completion_priority(request: Request):
+    endpoint = getattr(request.scope.get("endpoint"), "__name__", None)
+    if request.headers.get("x-priority", "").lower() == "batch":
+        request_priority.set(PRIORITY_BATCH)
+    elif endpoint == "ask":
+        request_priority.set(PRIORITY_INTERACTIVE)
+    else:
+        request_priority.set(PRIORITY_DEFAULT)
+
+# Admin-only endpoints require "X-Admin-Token: <ADMIN_TOKEN>"; they are
+# disabled when no ADMIN_TOKEN is configured.
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not settings.ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+# Streaming export format of a list endpoint, from "?format=" or the Accept
+# header ("application/x-ndjson", "text/csv"); None means a JSON page.
+async def export_format(
+    request: Request,
+    format: Optional[Literal["json", "ndjson", "csv"]] = Query(None, description="ndjson or csv stream every matching row"),
+) -> Optional[str]:
+    if format is not None:
+        return None if format == "json" else format
+    accept = request.headers.get("accept", "")
+    for name, media_type in MEDIA_TYPES.items():
+        if media_type in accept:
+            return name
+    return None
+
+# Rows of a bulk request: a JSON array, or NDJSON ("application/x-ndjson", one
+# object per line) where a line that does not parse becomes that row's error.
+async def bulk_rows(request: Request) -> List[Any]:
+    body = await request.body()
+    if "ndjson" in request.headers.get("content-type", ""):
+        rows = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as exc:
+                rows.append(exc)
+    else:
+        try:
+            rows = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if len(rows) > settings.BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BULK_MAX_ROWS} rows per request")
+    return rows
@@ -0,0 +1,74 @@
+import asyncio
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.api.dependencies import require_admin
+from app.core import profiler
+from app.core.config import settings
+from app.core.database import pool_stats
+from app.core.tracing import traces, get_trace
+
+# Traces carry SQL statement text and the pool stats infrastructure details:
+# every debug route needs the admin token
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+# Recent traces, newest first
+@router.get("/traces")
+def list_traces(limit: int = Query(50, le=1000), min_duration_ms: float = Query(0, description="Only slower traces")):
+    summaries = []
+    for trace in reversed(traces):
+        waterfall = trace.waterfall()
+        if (waterfall["duration_ms"] or 0) < min_duration_ms:
+            continue
+        summaries.append({key: waterfall[key] for key in ("trace_id", "name", "duration_ms")} | {"spans": len(waterfall["spans"])})
+        if len(summaries) >= limit:
+            break
+    return summaries
+
+# One trace as a waterfall (spans with offset, duration and depth)
+@router.get("/traces/{trace_id}")
+def trace_waterfall(trace_id: str):
+    trace = get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace.waterfall()
+
+# Connection pool occupancy and checkout waits of this worker
+@router.get("/db/pool")
+def db_pool():
+    return pool_stats()
+
+# Samples this worker's stacks for `seconds`, or while requests under `route`
+# run until `requests` of them have finished (capped at PROFILER_MAX_SECONDS)
+@router.post("/profile")
+async def profile(
+    seconds: Optional[float] = Query(None, gt=0, description="Profile for this long"),
+    route: Optional[str] = Query(None, description="Only sample while requests under this path prefix run"),
+    requests: int = Query(10, gt=0, description="With route: stop after this many matching requests"),
+    format: Literal["speedscope", "collapsed"] = Query("speedscope"),
+    interval_ms: float = Query(settings.PROFILER_INTERVAL_MS, ge=1, le=1000),
+    include_idle: bool = Query(False, description="Keep stacks of parked threads"),
+):
+    if profiler.active_session is not None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    timeout = min(seconds or (settings.PROFILER_MAX_SECONDS if route else 10), settings.PROFILER_MAX_SECONDS)
+    session = profiler.ProfileSession(interval_ms / 1000, route, requests if route else None, include_idle)
+    profiler.active_session = session
+    session.start()
+    try:
+        if route:
+            try:
+                await asyncio.wait_for(session.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(timeout)
+    finally:
+        profiler.active_session = None
+        await asyncio.to_thread(session.stop)
+
+    headers = {f"X-Profile-{key.replace('_', '-').title()}": str(value) for key, value in session.summary().items()}
+    if format == "collapsed":
+        return PlainTextResponse(session.collapsed(), headers=headers)
+    return JSONResponse(session.speedscope(), headers=headers)
@@ -1,8 +1,18 @@
 from datetime import date
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.core.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List, Optional
+from uuid import UUID
+from app.api.dependencies import bulk_rows, export_format
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.core.export import stream_response
+from app.core.pagination import fetch_page
+from app.core.writes import delete_returning, insert_returning, update_returning
+from app.schemas.bulk import BulkResponse
+from app.schemas.pagination import Page
+from app.services.bulk import BulkError, Mode, bulk_create, bulk_update, update_schema
 from app.models.medicare import (
     PatientResponse,
     PatientCreateRequest,
@@ -14,124 +24,148 @@ from app.models.medicare import (
 
 router = APIRouter()
 
+# Bulk Endpoints (before the "/{id}" routes, which would match "bulk")
+# Bodies are a JSON array or NDJSON of the single-row bodies; updates add "id".
+
+BULK_MODE = Query("atomic", description="atomic: all rows or none; best_effort: write the valid rows")
+PatientBulkUpdate = update_schema(PatientCreateRequest)
+AppointmentBulkUpdate = update_schema(AppointmentCreate)
+
+@router.post("/patients/bulk", response_model=BulkResponse)
+async def bulk_create_patients(rows: List[Any] = Depends(bulk_rows), mode: Mode = BULK_MODE, db: AsyncSession = Depends(get_async_db)):
+    try:
+        return await bulk_create(db, Patient, PatientCreateRequest, rows, mode)
+    except BulkError as exc:
+        raise HTTPException(status_code=422, detail={"mode": mode, "errors": exc.errors})
+
+@router.put("/patients/bulk", response_model=BulkResponse)
+async def bulk_update_patients(rows: List[Any] = Depends(bulk_rows), mode: Mode = BULK_MODE, db: AsyncSession = Depends(get_async_db)):
+    try:
+        return await bulk_update(db, Patient, PatientBulkUpdate, rows, mode)
+    except BulkError as exc:
+        raise HTTPException(status_code=422, detail={"mode": mode, "errors": exc.errors})
+
+@router.post("/appointments/bulk", response_model=BulkResponse)
+async def bulk_create_appointments(rows: List[Any] = Depends(bulk_rows), mode: Mode = BULK_MODE, db: AsyncSession = Depends(get_async_db)):
+    try:
+        return await bulk_create(db, Appointment, AppointmentCreate, rows, mode)
+    except BulkError as exc:
+        raise HTTPException(status_code=422, detail={"mode": mode, "errors": exc.errors})
+
+@router.put("/appointments/bulk", response_model=BulkResponse)
+async def bulk_update_appointments(rows: List[Any] = Depends(bulk_rows), mode: Mode = BULK_MODE, db: AsyncSession = Depends(get_async_db)):
+    try:
+        return await bulk_update(db, Appointment, AppointmentBulkUpdate, rows, mode)
+    except BulkError as exc:
+        raise HTTPException(status_code=422, detail={"mode": mode, "errors": exc.errors})
+
 # Patients CRUD Endpoints
 
 # Get a specific patient by ID
 @router.get("/patients/{patient_id}", response_model=PatientResponse)
-def get_patient(patient_id: str, db: Session = Depends(get_db)):
-    db_patient = db.query(Patient).filter(Patient.id == patient_id).first()
+async def get_patient(patient_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    db_patient = await db.get(Patient, patient_id)
     if not db_patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     return db_patient
 
-# Get all patients
-@router.get("/patients", response_model=List[PatientResponse])
-def get_all_patients(db: Session = Depends(get_db)):
-    patients = db.query(Patient).all()
-    return patients
+# Get all patients, one page at a time (oldest first), or all of them as a stream
+@router.get("/patients", response_model=Page[PatientResponse])
+async def get_all_patients(
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX, description="Maximum number of records to return"),
+    export: Optional[str] = Depends(export_format),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if export:
+        return stream_response(select(Patient), Patient, PatientResponse, export, cursor, filename="patients")
+    return await fetch_page(db, select(Patient), Patient, limit, cursor)
 
 # Create a new patient
 @router.post("/patients", response_model=PatientResponse)
-def create_patient_endpoint(patient_data: PatientCreateRequest, db: Session = Depends(get_db)):
-    new_patient = Patient(
-        name=patient_data.name,
-        email=patient_data.email,
-        mobile_phone=patient_data.mobile_phone,
-        home_phone=patient_data.home_phone,
-        referral_info=patient_data.referral_info
-    )
-    db.add(new_patient)
-    db.commit()  # Save to the database
-    db.refresh(new_patient)  # Get the patient object with the generated id and timestamps
-    return new_patient
+async def create_patient_endpoint(patient_data: PatientCreateRequest, db: AsyncSession = Depends(get_async_db)):
+    # One INSERT ... RETURNING: the generated id and timestamps come back with it
+    return await insert_returning(db, Patient, patient_data.dict())
 
 # Update an existing patient
 @router.put("/patients/{patient_id}", response_model=PatientResponse)
-def update_patient(patient_id: str, patient: PatientCreateRequest, db: Session = Depends(get_db)):
-    db_patient = db.query(Patient).filter(Patient.id == patient_id).first()
+async def update_patient(patient_id: UUID, patient: PatientCreateRequest, db: AsyncSession = Depends(get_async_db)):
+    db_patient = await update_returning(db, Patient, patient_id, patient.dict())  # updated_at is set by the database
     if not db_patient:
         raise HTTPException(status_code=404, detail="Patient not found")
-    
-    for key, value in patient.dict().items():
-        setattr(db_patient, key, value)
-    
-    db.commit()
     return db_patient
 
 # Delete a patient
 @router.delete("/patients/{patient_id}", response_model=PatientResponse)
-def delete_patient(patient_id: str, db: Session = Depends(get_db)):
-    db_patient = db.query(Patient).filter(Patient.id == patient_id).first()
+async def delete_patient(patient_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    db_patient = await delete_returning(db, Patient, patient_id)
     if not db_patient:
         raise HTTPException(status_code=404, detail="Patient not found")
-    
-    db.delete(db_patient)
-    db.commit()
     return db_patient
 
 # Appointments CRUD Endpoints
 
-@router.get("/appointments", response_model=List[AppointmentResponse])
-def get_appointments(
-    patient_id: Optional[str] = Query(None, description="Filter by patient ID"),
-    status: Optional[str] = Query(None, description="Filter by status"),
-    type: Optional[str] = Query(None, description="Filter by type"),
-    scheduled_date: Optional[date] = Query(None, description="Filter by scheduled date"),
-    skip: int = Query(0, description="Number of records to skip for pagination"),
-    limit: int = Query(10, description="Maximum number of records to return"),
-    db: Session = Depends(get_db)
+# Filtered appointments query (shared with the agent tools)
+def appointments_statement(
+    patient_id: Optional[UUID] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    scheduled_date: Optional[date] = None,
 ):
-    query = db.query(Appointment)
+    statement = select(Appointment)
 
     if patient_id:
-        query = query.filter(Appointment.patient_id == patient_id)
-    
+        statement = statement.where(Appointment.patient_id == patient_id)
+
     if status:
-        query = query.filter(Appointment.status == status)
-    
+        statement = statement.where(Appointment.status == status)
+
     if type:
-        query = query.filter(Appointment.type == type)
-    
+        statement = statement.where(Appointment.type == type)
+
     if scheduled_date:
-        query = query.filter(Appointment.scheduled_date == scheduled_date)
+        statement = statement.where(Appointment.scheduled_date == scheduled_date)
+
+    return statement
 
-    appointments = query.order_by(Appointment.created_at).offset(skip).limit(limit).all()
-    
-    return appointments
+@router.get("/appointments", response_model=Page[AppointmentResponse])
+async def get_appointments(
+    patient_id: Optional[UUID] = Query(None, description="Filter by patient ID"),
+    status: Optional[str] = Query(None, description="Filter by status"),
+    type: Optional[str] = Query(None, description="Filter by type"),
+    scheduled_date: Optional[date] = Query(None, description="Filter by scheduled date"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX, description="Maximum number of records to return"),
+    export: Optional[str] = Depends(export_format),
+    db: AsyncSession = Depends(get_async_db)
+):
+    statement = appointments_statement(patient_id, status, type, scheduled_date)
+
+    if export:
+        return stream_response(statement, Appointment, AppointmentResponse, export, cursor, filename="appointments")
+    return await fetch_page(db, statement, Appointment, limit, cursor)
 
 # Create a new appointment
 @router.post("/appointments", response_model=AppointmentResponse)
-def create_appointment(appointment: AppointmentCreate, db: Session = Depends(get_db)):
-    db_appointment = Appointment(**appointment.dict())
-    db.add(db_appointment)
-    db.commit()
-    db.refresh(db_appointment)
-    return db_appointment
+async def create_appointment(appointment: AppointmentCreate, db: AsyncSession = Depends(get_async_db)):
+    return await insert_returning(db, Appointment, appointment.dict())
 
 # Update an existing appointment
 @router.put("/appointments/{appointment_id}", response_model=AppointmentResponse)
-def update_appointment(appointment_id: str, appointment: AppointmentCreate, db: Session = Depends(get_db)):
-    db_appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
-    
+async def update_appointment(appointment_id: UUID, appointment: AppointmentCreate, db: AsyncSession = Depends(get_async_db)):
+    db_appointment = await update_returning(db, Appointment, appointment_id, appointment.dict())  # updated_at is set by the database
+
     if not db_appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
-    
-    for key, value in appointment.dict().items():
-        setattr(db_appointment, key, value)
 
-    db.commit()
-    
     return db_appointment
 
 # Delete an appointment
 @router.delete("/appointments/{appointment_id}", response_model=AppointmentResponse)
-def delete_appointment(appointment_id: str, db: Session = Depends(get_db)):
-    db_appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
-    
+async def delete_appointment(appointment_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    db_appointment = await delete_returning(db, Appointment, appointment_id)
+
     if not db_appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
-    
-    db.delete(db_appointment)
-    db.commit()
-    
+
     return db_appointment
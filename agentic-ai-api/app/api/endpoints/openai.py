@@ -1,24 +1,51 @@
-from fastapi import APIRouter, FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks, Query, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import json
 from typing import Optional
 import os
 # from app.core.config import openai_api_key
-# from app.core.logging_config import logger  # Import logger from logging_config
+from app.core.logging_config import logger  # Import logger from logging_config
 # from app.core.database import SessionLocal
 from app.services.openai_service import (
+    AGENTS,
+    agent_events,
     complete_chat,
-    process_agent3,
-    process_agent4,
-    process_agent5
+    chat_events,
+    process_agent
 )
+from app.services.completion_cache import completion_cache
+from app.services.semantic_cache import semantic_caches, report_false_hit
+from app.services.conversation_store import conversation_store
+from app.api.dependencies import read_cache_headers, coalesce_completions, completion_priority
+from app.services.single_flight import completion_flights
+from app.services.rate_limiter import completion_scheduler
 
-router = APIRouter()
+router = APIRouter(
+    dependencies=[Depends(read_cache_headers), Depends(coalesce_completions), Depends(completion_priority)]
+)
+
+# Server-Sent Events: tokens and agent progress are sent as soon as they arrive
+async def sse_events(events):
+    try:
+        async for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+    except Exception:
+        logger.exception("Streaming response failed")
+        yield f"event: error\ndata: {json.dumps({'error': 'Failed to complete chat.'})}\n\n"
+
+def sse_response(events):
+    return StreamingResponse(
+        sse_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.post("/ask")
-async def ask(message: str):
-    completion = complete_chat(message)
+async def ask(message: str, stream: bool = Query(False, description="Stream tokens as Server-Sent Events")):
+    if stream:
+        return sse_response(chat_events(message))
+    completion = await complete_chat(message)
     if completion:
         return {"Nunia.AI": completion}
     else:
@@ -41,25 +68,92 @@ async def ask(message: str):
 #         return {"error": "Failed to complete chat."}
 
 @router.post("/agent3")
-async def agent3(message: str):
-    completion = await process_agent3(message)
+async def agent3(
+    message: str,
+    stream: bool = Query(False, description="Stream tokens and agent progress as Server-Sent Events"),
+    conversation_id: Optional[str] = Query(None, description="Continue a server-side conversation"),
+):
+    if stream:
+        return sse_response(agent_events(AGENTS["agent3"], message, stream=True, conversation_id=conversation_id))
+    meta = {}
+    completion = await process_agent("agent3", message, meta, conversation_id)
     if completion:
-        return {"Nunia.AI": completion}
+        return {"Nunia.AI": completion, **({"meta": meta} if meta else {})}
     else:
         return {"error": "Failed to complete chat."}
 
 @router.post("/agent4")
-async def agent3(message: str):
-    completion = await process_agent4(message)
+async def agent4(
+    message: str,
+    stream: bool = Query(False, description="Stream tokens and agent progress as Server-Sent Events"),
+    conversation_id: Optional[str] = Query(None, description="Continue a server-side conversation"),
+):
+    if stream:
+        return sse_response(agent_events(AGENTS["agent4"], message, stream=True, conversation_id=conversation_id))
+    meta = {}
+    completion = await process_agent("agent4", message, meta, conversation_id)
     if completion:
-        return {"Nunia.AI": completion}
+        return {"Nunia.AI": completion, **({"meta": meta} if meta else {})}
     else:
         return {"error": "Failed to complete chat."}
 
 @router.post("/agent5")
-async def agent3(message: str):
-    completion = await process_agent5(message)
+async def agent5(
+    message: str,
+    stream: bool = Query(False, description="Stream tokens and agent progress as Server-Sent Events"),
+    conversation_id: Optional[str] = Query(None, description="Continue a server-side conversation"),
+):
+    if stream:
+        return sse_response(agent_events(AGENTS["agent5"], message, stream=True, conversation_id=conversation_id))
+    meta = {}
+    completion = await process_agent("agent5", message, meta, conversation_id)
     if completion:
-        return {"Nunia.AI": completion}
+        return {"Nunia.AI": completion, **({"meta": meta} if meta else {})}
     else:
-        return {"error": "Failed to complete chat."}
\ No newline at end of file
+        return {"error": "Failed to complete chat."}
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return {
+        "completion_cache": completion_cache.stats() if completion_cache else None,
+        "semantic_cache": {namespace: cache.stats() for namespace, cache in semantic_caches.items()},
+        "single_flight": completion_flights.stats(),
+    }
+
+@router.delete("/cache")
+async def clear_cache():
+    if completion_cache:
+        await completion_cache.clear()
+    for cache in semantic_caches.values():
+        cache.clear()
+    return {"detail": "Cache cleared"}
+
+# Report a semantic cache hit that answered the wrong question
+@router.post("/cache/semantic/false-hit")
+async def semantic_false_hit(cache_id: str):
+    if not report_false_hit(cache_id):
+        raise HTTPException(status_code=404, detail="Cache entry not found")
+    return {"detail": "False hit recorded"}
+
+@router.post("/cache/semantic/rebuild")
+async def semantic_rebuild():
+    for cache in semantic_caches.values():
+        cache.rebuild()
+    return {namespace: cache.stats() for namespace, cache in semantic_caches.items()}
+
+@router.get("/conversations/{conversation_id}")
+async def get_conversation(conversation_id: str):
+    messages = await conversation_store.get(conversation_id)
+    if messages is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return {"conversation_id": conversation_id, "messages": messages}
+
+@router.delete("/conversations/{conversation_id}")
+async def delete_conversation(conversation_id: str):
+    if not await conversation_store.delete(conversation_id):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return {"detail": "Conversation deleted successfully"}
+
+@router.get("/scheduler/stats")
+async def scheduler_stats():
+    return completion_scheduler.stats()
@@ -1,43 +1,77 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.services.reservations import create_reservation, get_reservation, get_reservations, update_reservation, delete_reservation
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.reservations import create_reservation, get_reservation, get_reservations, reservations_statement, update_reservation, delete_reservation
 from app.schemas.reservations import ReservationCreate, ReservationResponse
-from app.core.database import get_db 
+from app.api.dependencies import bulk_rows, export_format
+from app.models.reservations import Reservation
+from app.schemas.bulk import BulkResponse
+from app.schemas.pagination import Page
+from app.services.bulk import BulkError, Mode, bulk_create, bulk_update, update_schema
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.core.export import stream_response
+from typing import Any, List, Optional
 from uuid import UUID
 
 router = APIRouter()
 
+BULK_MODE = Query("atomic", description="atomic: all rows or none; best_effort: write the valid rows")
+ReservationBulkUpdate = update_schema(ReservationCreate)
+
+# A JSON array or NDJSON of reservation bodies
+@router.post("/reservations/bulk", response_model=BulkResponse)
+async def bulk_create_reservations(rows: List[Any] = Depends(bulk_rows), mode: Mode = BULK_MODE, db: AsyncSession = Depends(get_async_db)):
+    try:
+        return await bulk_create(db, Reservation, ReservationCreate, rows, mode)
+    except BulkError as exc:
+        raise HTTPException(status_code=422, detail={"mode": mode, "errors": exc.errors})
+
+# Same, each with its "id"; like the single PUT only the given fields change
+@router.put("/reservations/bulk", response_model=BulkResponse)
+async def bulk_update_reservations(rows: List[Any] = Depends(bulk_rows), mode: Mode = BULK_MODE, db: AsyncSession = Depends(get_async_db)):
+    try:
+        return await bulk_update(db, Reservation, ReservationBulkUpdate, rows, mode, partial=True)
+    except BulkError as exc:
+        raise HTTPException(status_code=422, detail={"mode": mode, "errors": exc.errors})
+
 @router.post("/reservations/", response_model=ReservationResponse)
-def create_new_reservation(reservation: ReservationCreate, db: Session = Depends(get_db)):
-    return create_reservation(db=db, reservation=reservation)
+async def create_new_reservation(reservation: ReservationCreate, db: AsyncSession = Depends(get_async_db)):
+    return await create_reservation(db=db, reservation=reservation)
 
 @router.get("/reservations/{reservation_id}", response_model=ReservationResponse)
-def read_reservation(reservation_id: UUID, db: Session = Depends(get_db)):
-    reservation = get_reservation(db=db, reservation_id=reservation_id)
-    
+async def read_reservation(reservation_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    reservation = await get_reservation(db=db, reservation_id=reservation_id)
+
     if reservation is None:
         raise HTTPException(status_code=404, detail="Reservation not found")
-    
+
     return reservation
 
-@router.get("/reservations/", response_model=list[ReservationResponse])
-def read_all_reservations(db: Session = Depends(get_db)):
-    return get_reservations(db=db)
+@router.get("/reservations/", response_model=Page[ReservationResponse])
+async def read_all_reservations(
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    export: Optional[str] = Depends(export_format),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if export:
+        return stream_response(reservations_statement(), Reservation, ReservationResponse, export, cursor, filename="reservations")
+    return await get_reservations(db=db, limit=limit, cursor=cursor)
 
 @router.put("/reservations/{reservation_id}", response_model=ReservationResponse)
-def update_existing_reservation(reservation_id: UUID, reservation_data: ReservationCreate, db: Session = Depends(get_db)):
-    updated_reservation = update_reservation(db=db, reservation_id=reservation_id, reservation_data=reservation_data)
-    
+async def update_existing_reservation(reservation_id: UUID, reservation_data: ReservationCreate, db: AsyncSession = Depends(get_async_db)):
+    updated_reservation = await update_reservation(db=db, reservation_id=reservation_id, reservation_data=reservation_data)
+
     if updated_reservation is None:
         raise HTTPException(status_code=404, detail="Reservation not found")
-    
+
     return updated_reservation
 
 @router.delete("/reservations/{reservation_id}")
-def delete_existing_reservation(reservation_id: UUID, db: Session = Depends(get_db)):
-    success = delete_reservation(db=db, reservation_id=reservation_id)
-    
+async def delete_existing_reservation(reservation_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    success = await delete_reservation(db=db, reservation_id=reservation_id)
+
     if not success:
         raise HTTPException(status_code=404, detail="Reservation not found")
-    
+
     return {"detail": "Reservation deleted successfully"}
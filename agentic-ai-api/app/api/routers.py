@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends
-from app.api.endpoints import openai, medicare, reservations
+from app.api.endpoints import openai, medicare, reservations, debug
 # from app.api.dependencies import get_api_key
 
 router = APIRouter()
@@ -28,3 +28,9 @@ router.include_router(
     prefix="/reservations",
     tags=["Reservations"]
 )
+
+router.include_router(
+    debug.router,
+    prefix="/debug",
+    tags=["Debug"]
+)
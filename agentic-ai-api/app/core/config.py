@@ -1,6 +1,7 @@
 from dotenv import load_dotenv
 import os
 from pydantic_settings import BaseSettings
+from typing import Optional
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,6 +16,123 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: str
     AWS_REGION: str
 
+    # OpenAI HTTP connection pool (shared by every request on the worker)
+    OPENAI_MAX_CONNECTIONS: int = 200
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    OPENAI_KEEPALIVE_EXPIRY: float = 30.0
+    OPENAI_CONNECT_TIMEOUT: float = 5.0
+    OPENAI_TIMEOUT: float = 60.0  # Per-call timeout in seconds
+    OPENAI_MAX_RETRIES: int = 0  # Retries are done by the completion scheduler
+
+    # Database (SQL Server, PostgreSQL or SQLite; the async driver is derived from the URL)
+    DATABASE_URL: str = (
+        "mssql+pyodbc:///?odbc_connect="
+        "Driver={ODBC Driver 17 for SQL Server};"
+        "Server=NUNIA\\SQLEXPRESS;"
+        "Database=NuniaAI;"
+        "Trusted_Connection=yes;"
+    )
+    DB_POOL_SIZE: int = 10  # Connections kept open per engine and worker
+    DB_MAX_OVERFLOW: int = 10  # Extra connections opened during bursts, closed when returned
+    DB_MAX_CONNECTIONS: Optional[int] = None  # Server-side budget shared by all workers; caps the two above
+    WEB_CONCURRENCY: int = 1  # Worker processes (the variable uvicorn and gunicorn read)
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds a checkout waits before failing
+    DB_POOL_RECYCLE: int = 1800  # Seconds; replaces connections before server or firewall idle cutoffs
+    DB_POOL_PRE_PING: bool = True  # Test each connection on checkout, reconnecting stale ones
+    DB_POOL_PREWARM: bool = True  # Open the async pool's connections at startup
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # 0 disables; not supported on SQLite
+    DB_MIGRATE_ON_STARTUP: bool = False  # Apply pending migrations at startup (single-worker/local runs; see app.core.migrations)
+
+    # List endpoints (cursor pagination)
+    PAGE_SIZE_DEFAULT: int = 20
+    PAGE_SIZE_MAX: int = 200
+    EXPORT_CHUNK_SIZE: int = 1000  # Rows fetched and sent per chunk by ndjson/csv exports
+
+    # Bulk create/update endpoints
+    BULK_MAX_ROWS: int = 10000  # Per request
+    BULK_CHUNK_SIZE: int = 500  # Rows per INSERT/UPDATE round trip
+
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    LOG_QUEUE_SIZE: int = 10000  # Records beyond this are dropped rather than blocking a request
+    LOG_SAMPLE_RATE: float = 0.01  # Share of verbose ("sampled") records kept
+
+    # Request tracing (/debug/traces)
+    TRACING_ENABLED: bool = True
+    TRACE_SAMPLE_RATE: float = 0.05  # Share of requests traced; "X-Trace: 1" forces it
+    TRACE_BUFFER_SIZE: int = 200  # Finished traces kept in memory
+    TRACE_MAX_SPANS: int = 500  # Per trace
+    TRACE_EXPORT_PATH: Optional[str] = None  # Append traces as OTLP/JSON lines to this file
+    TRACE_SERVICE_NAME: str = "nunia-agentic-ai-api"
+
+    # Admin-only endpoints (e.g. /debug/profile) are disabled while unset
+    ADMIN_TOKEN: Optional[str] = None
+
+    # On-demand sampling profiler
+    PROFILER_INTERVAL_MS: float = 5.0
+    PROFILER_MAX_SECONDS: float = 60.0  # Upper bound on one profiling session
+
+    # Completion backend: "openai", or "mock" for offline runs and benchmarks
+    LLM_BACKEND: str = "openai"
+    MOCK_LLM_SCRIPT: Optional[str] = None  # JSON file of scripted responses (see app.services.mock_llm)
+    MOCK_LLM_LATENCY_DISTRIBUTION: str = "lognormal"  # "fixed", "uniform" or "lognormal"
+    MOCK_LLM_LATENCY_MS: float = 300  # Median
+    MOCK_LLM_LATENCY_SIGMA: float = 0.5
+    MOCK_LLM_SEED: Optional[int] = None
+
+    # Client-side rate limiting of OpenAI calls (per worker)
+    OPENAI_REQUESTS_PER_MINUTE: int = 3500
+    OPENAI_TOKENS_PER_MINUTE: int = 90000
+    SCHEDULER_COMPLETION_TOKENS: int = 256  # Completion tokens reserved per call when max_tokens is unset
+    SCHEDULER_MAX_RETRIES: int = 4
+    SCHEDULER_BACKOFF_BASE: float = 0.5  # Seconds; doubled per attempt, full jitter
+    SCHEDULER_BACKOFF_MAX: float = 20.0
+
+    # Agent tool execution
+    TOOL_MAX_WORKERS: int = 16  # Thread pool shared by all blocking tools
+    TOOL_TIMEOUT: float = 15.0  # Per tool call, in seconds
+    TOOL_RESULT_PAGE_SIZE: int = 20  # Rows a tool returns at most; the rest is reported as "N more rows"
+    TOOL_RESULT_MAX_TOKENS: int = 1000  # Hard cap on one encoded tool result
+
+    # Prompt packing before every completion
+    CONTEXT_TOKEN_BUDGET: int = 12000  # Estimated prompt tokens (gpt-3.5-turbo has a 16k window)
+    CONTEXT_TOOL_OUTPUT_TOKENS: int = 200  # Tool outputs are truncated to this first
+
+    # Agent loop budgets (per request)
+    AGENT_MAX_STEPS: int = 5  # Model turns
+    AGENT_MAX_TOKENS: int = 16000  # Prompt + completion tokens
+    AGENT_MAX_SECONDS: float = 60.0
+    # A first turn that calls one tool with a direct_template answers without a
+    # second completion (and ends the loop there)
+    AGENT_DIRECT_RESPONSES: bool = True
+
+    # Conversation sessions
+    CONVERSATION_STORE: str = "memory"  # "memory" or "sqlite"
+    CONVERSATION_STORE_PATH: str = "conversations.db"
+    CONVERSATION_MAX_SESSIONS: int = 10000  # In-memory store only
+    CONVERSATION_TTL_SECONDS: float = 3600
+    CONVERSATION_MAX_TURNS: int = 10  # Older turns are folded into a summary
+    CONVERSATION_TOOL_OUTPUT_TURNS: int = 2  # Tool outputs kept for the last N turns
+    CONVERSATION_SUMMARY_CHARS: int = 2000
+
+    # Exact-match completion cache
+    COMPLETION_CACHE_ENABLED: bool = True
+    COMPLETION_CACHE_MAX_ENTRIES: int = 1024
+    COMPLETION_CACHE_TTL_SECONDS: float = 300
+    COMPLETION_CACHE_PATH: Optional[str] = None  # SQLite file, e.g. "completion_cache.db"
+
+    # Request coalescing: endpoints whose identical in-flight completions share one call
+    SINGLE_FLIGHT_ENDPOINTS: str = "ask,agent3,agent4,agent5"
+
+    # Semantic (near-duplicate prompt) cache in front of the agents
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1024
+    SEMANTIC_CACHE_TTL_SECONDS: float = 300
+    # Calibrated against the paraphrase set in tests/test_semantic_cache.py
+    SEMANTIC_CACHE_ANSWER_THRESHOLD: float = 0.9  # Reuse the prior final answer (same entities only)
+    SEMANTIC_CACHE_DIM: int = 512
+
     class Config:
         env_file = ".env"
 
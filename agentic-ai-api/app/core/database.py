@@ -1,21 +1,156 @@
-from sqlalchemy import create_engine
+import asyncio
+import time
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+from sqlalchemy.sql.functions import now
+from app.core.config import settings
+from app.core.logging_config import logger
+from app.core.metrics import db_pool_checkout_wait, db_pool_connections, db_pool_timeouts, db_query_duration
+from app.core.timing import record_stage
+from app.core.tracing import start_span
 
-# Define your database connection string
-SQLALCHEMY_DATABASE_URL = (
-    "mssql+pyodbc:///?odbc_connect="
-    "Driver={ODBC Driver 17 for SQL Server};"
-    "Server=NUNIA\SQLEXPRESS;"
-    "Database=NuniaAI;"
-    "Trusted_Connection=yes;"
-)
+# Define your database connection string (DATABASE_URL; SQL Server by default)
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-# Create SQLAlchemy engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=False)
+# Async drivers for the sync URL's database
+ASYNC_DRIVERS = {
+    "mssql": "mssql+aioodbc",
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+class TimedCheckout:
+    """Pool mixin recording how long each checkout waited for a connection."""
+
+    engine_label = ""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            db_pool_timeouts.inc(engine=self.engine_label)
+            raise
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - started, engine=self.engine_label)
+
+class TimedQueuePool(TimedCheckout, QueuePool):
+    engine_label = "sync"
+
+class TimedAsyncQueuePool(TimedCheckout, AsyncAdaptedQueuePool):
+    engine_label = "async"
+
+#############
+# Engine options
+#############
+
+def pool_limits():
+    """(pool_size, max_overflow) for one engine of this worker. With
+    DB_MAX_CONNECTIONS set, the server's budget is split across WEB_CONCURRENCY
+    workers so that a burst on every worker cannot exceed it."""
+    size, overflow = settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+    if settings.DB_MAX_CONNECTIONS:
+        per_worker = max(1, settings.DB_MAX_CONNECTIONS // max(1, settings.WEB_CONCURRENCY))
+        size = min(size, per_worker)
+        overflow = max(0, min(overflow, per_worker - size))
+    return size, overflow
+
+def engine_options(url, poolclass):
+    url = make_url(url)
+    backend, driver = url.get_backend_name(), url.get_driver_name()
+    options = {"echo": False}
+
+    if backend == "sqlite" and url.database in (None, "", ":memory:"):
+        # One shared connection, or every session would see its own empty database
+        options["poolclass"] = StaticPool
+    else:
+        size, overflow = pool_limits()
+        options.update(
+            poolclass=poolclass,
+            pool_size=size,
+            max_overflow=overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+
+    timeout = settings.DB_STATEMENT_TIMEOUT_MS
+    if backend == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    elif backend == "postgresql" and timeout:
+        if driver == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+def _set_query_timeout(dbapi_connection, connection_record):
+    # pyodbc's per-connection query timeout (whole seconds); under aioodbc the
+    # pyodbc connection sits behind the adapter and aioodbc's wrapper
+    raw = getattr(dbapi_connection, "driver_connection", dbapi_connection)
+    raw = getattr(raw, "_conn", raw)
+    raw.timeout = max(1, round(settings.DB_STATEMENT_TIMEOUT_MS / 1000))
+
+# SQLite's CURRENT_TIMESTAMP has no fractional seconds, while bound datetimes
+# are stored with microseconds; both must compare as text (cursor pagination)
+@compiles(now, "sqlite")
+def _sqlite_now(element, compiler, **kw):
+    return "(STRFTIME('%Y-%m-%d %H:%M:%f', 'now') || '000')"
+
+def build_engine(engine):
+    if engine.dialect.name == "mssql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        event.listen(engine, "connect", _set_query_timeout)
+    return instrument(engine)
+
+# Query time, per request (see app.core.timing) and in the metrics
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+    conn.info.setdefault("query_spans", []).append(start_span("db.query", statement=statement[:200]))
+
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    record_stage("db", elapsed)
+    db_query_duration.observe(elapsed, operation=statement.lstrip().split(" ", 1)[0].upper())
+    query_span = conn.info["query_spans"].pop()
+    if query_span is not None:
+        query_span.end()
+
+def _query_failed(context):
+    # after_cursor_execute does not run for a failed statement
+    info = context.connection.info if context.connection is not None else {}
+    if info.get("query_started"):
+        info["query_started"].pop()
+    if info.get("query_spans"):
+        query_span = info["query_spans"].pop()
+        if query_span is not None:
+            query_span.end(context.original_exception)
+
+def instrument(engine):
+    event.listen(engine, "before_cursor_execute", _query_started)
+    event.listen(engine, "after_cursor_execute", _query_finished)
+    event.listen(engine, "handle_error", _query_failed)
+    return engine
+
+# Create SQLAlchemy engine (blocking; used from threads)
+engine = build_engine(create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL, TimedQueuePool)))
+
+# Async engine on the same database, used by the API routes and agent tools
+ASYNC_DATABASE_URL = async_database_url(SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, TimedAsyncQueuePool))
+build_engine(async_engine.sync_engine)
 
 # Create a sessionmaker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 # Create a base class for your ORM models
 Base = declarative_base()
@@ -27,3 +162,70 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Async variant for `async def` routes: no thread per request
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+#############
+# Pool lifecycle and telemetry
+#############
+
+async def prewarm_pool():
+    """Opens the async pool's connections up front, so the first requests after
+    a start do not each pay for a login handshake."""
+    pool = async_engine.pool
+    if not isinstance(pool, QueuePool):
+        return 0
+    results = await asyncio.gather(*(async_engine.connect().start() for _ in range(pool.size())), return_exceptions=True)
+    opened = [result for result in results if not isinstance(result, BaseException)]
+    for connection in opened:
+        await connection.close()  # Back to the pool, still open
+    failures = [result for result in results if isinstance(result, BaseException)]
+    if failures:
+        logger.warning("Pool pre-warm opened %d of %d connections: %r", len(opened), len(results), failures[0])
+    return len(opened)
+
+async def dispose_engines():
+    await async_engine.dispose()
+    engine.dispose()
+
+def _pools():
+    return {"sync": engine.pool, "async": async_engine.pool}
+
+def pool_stats():
+    """Current occupancy of both pools, plus checkout counts and waits since start."""
+    waits = db_pool_checkout_wait.collect()
+    timeouts = db_pool_timeouts.collect()
+    stats = {}
+    for label, pool in _pools().items():
+        entry = {"pool": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            entry.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                idle=pool.checkedin(),
+                overflow=max(0, pool.overflow()),
+                max_overflow=pool._max_overflow,
+            )
+        values = waits.get((label,))
+        checkouts = sum(values[:-1]) if values else 0
+        entry.update(
+            checkouts=checkouts,
+            checkout_wait_seconds=round(values[-1], 6) if values else 0.0,
+            checkout_wait_mean_ms=round(values[-1] / checkouts * 1000, 3) if checkouts else 0.0,
+            timeouts=timeouts.get((label,), 0),
+        )
+        stats[label] = entry
+    return stats
+
+def _pool_gauges():
+    gauges = {}
+    for label, entry in pool_stats().items():
+        for state in ("checked_out", "idle", "overflow", "size"):
+            if state in entry:
+                gauges[(label, state)] = entry[state]
+    return gauges
+
+db_pool_connections.set_function(_pool_gauges)
@@ -0,0 +1,139 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from uuid import uuid4
+from app.core.config import settings
+
+#############
+# Structured, non-blocking logging
+#############
+# Records are put on a bounded in-memory queue by the request (never blocking
+# it: when the queue is full the record is dropped and counted) and
+# formatted and written by a background thread. Messages use %-style
+# arguments so large objects are only turned into text by that thread, and
+# only when the record is actually emitted.
+#
+#   logger.info("Agent finished", extra={"agent": name, "steps": steps})
+#   logger.debug("AI Response: %s", response, extra={"sampled": True})
+#
+# Records marked "sampled" are verbose events kept at LOG_SAMPLE_RATE.
+
+logger = logging.getLogger("nunia")
+
+# Set per HTTP request by RequestIdMiddleware; copied into tool threads with the context
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sampled"}
+
+class RequestContextFilter(logging.Filter):
+    """Tags every record with the request id and applies sampling. Runs on the
+    caller's thread, where the request context is available."""
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False) and random.random() >= self.sample_rate:
+            return False
+        record.request_id = request_id.get()
+        return True
+
+class NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the listener thread (QueueHandler would do it here)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[NonBlockingQueueHandler] = None
+
+def setup_logging():
+    """Routes all logging through the queue. Called once from main.py."""
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _handler = NonBlockingQueueHandler(log_queue)
+    _handler.addFilter(RequestContextFilter(settings.LOG_SAMPLE_RATE))
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(settings.LOG_LEVEL)
+    atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Writes out what is still queued and stops the background thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        if _handler is not None and _handler.dropped:
+            sys.stderr.write(f"logging: {_handler.dropped} records dropped (queue full)\n")
+
+class RequestIdMiddleware:
+    """ASGI middleware assigning a request id (the client's X-Request-ID when
+    sent) and echoing it back in the response."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        rid = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid4().hex
+        token = request_id.set(rid)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id.reset(token)
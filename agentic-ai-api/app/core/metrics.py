@@ -0,0 +1,234 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Sequence, Tuple
+
+#############
+# Prometheus-style metrics
+#############
+# Counters, histograms and gauges rendered in the Prometheus text format on /metrics.
+# Recording is lock-free: every thread (the event loop, each tool worker)
+# writes to its own shard and shards are only summed when scraped. Values are
+# per worker process; Prometheus aggregates across workers.
+
+# Agent of the current request, used as a label on completion metrics
+current_agent: ContextVar[str] = ContextVar("current_agent", default="none")
+
+# Seconds; from fast local work up to slow completions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        REGISTRY.append(self)
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = self._local.values = {}
+            self._shards.append(shard)  # Atomic; happens once per thread
+        return shard
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues, extra: str = "") -> str:
+        pairs = [f'{name}="{escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def collect(self) -> Dict[LabelValues, float]:
+        totals: Dict[LabelValues, float] = {}
+        for shard in list(self._shards):
+            for key, value in shard.copy().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{self._labels(key)} {value}")
+        return lines
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        # [count per bucket..., +Inf count, sum]
+        values = shard.get(key)
+        if values is None:
+            values = shard[key] = [0] * (len(self.buckets) + 2)
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def collect(self) -> Dict[LabelValues, List[float]]:
+        totals: Dict[LabelValues, List[float]] = {}
+        for shard in list(self._shards):
+            for key, values in shard.copy().items():
+                total = totals.setdefault(key, [0] * len(values))
+                for index, value in enumerate(list(values)):
+                    total[index] += value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, values in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                labels = self._labels(key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += values[len(self.buckets)]
+            labels = self._labels(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {values[-1]}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+class Gauge(Metric):
+    """Sampled when scraped from a function returning {label values: value}."""
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set_function(self, function: Callable[[], Dict[LabelValues, float]]):
+        self._function = function
+
+    def collect(self) -> Dict[LabelValues, float]:
+        return self._function() if self._function is not None else {}
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{self._labels(key)} {value}")
+        return lines
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REGISTRY: List[Metric] = []
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+#############
+# Application metrics
+#############
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ["method", "route", "status"]
+)
+openai_request_duration = Histogram(
+    "openai_request_duration_seconds", "OpenAI completion call latency (per attempt).", ["model", "agent"]
+)
+tool_duration = Histogram("agent_tool_duration_seconds", "Agent tool execution time.", ["tool", "status"])
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "SQLAlchemy query execution time.", ["operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+db_pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds", "Time waiting for a pooled DB connection.", ["engine"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+db_pool_timeouts = Counter("db_pool_timeouts_total", "Checkouts that gave up waiting for a connection.", ["engine"])
+db_pool_connections = Gauge(
+    "db_pool_connections", "Pooled DB connections by state (checked_out, idle, overflow, size).", ["engine", "state"]
+)
+llm_tokens = Counter("llm_tokens_total", "Tokens billed by the model.", ["model", "agent", "direction"])
+errors = Counter("errors_total", "Errors by component and type.", ["component", "type"])
+cache_requests = Counter("cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"])
+llm_scheduler_queue_depth = Gauge(
+    "llm_scheduler_queue_depth", "Completion calls waiting for the rate-limit budget (current, max).", ["stat"]
+)
+llm_scheduler_wait = Histogram(
+    "llm_scheduler_wait_seconds", "Time a completion call waited for the rate-limit budget.", ["priority"]
+)
+llm_scheduler_retries = Counter("llm_scheduler_retries_total", "Completion attempts retried, by error.", ["error"])
+llm_scheduler_rate_limited = Counter("llm_scheduler_rate_limited_total", "Completion attempts rejected with a 429.")
+llm_scheduler_failures = Counter(
+    "llm_scheduler_failures_total", "Completion calls given up after retries or at their deadline."
+)
+
+def record_token_usage(model: str, usage):
+    if usage is None:
+        return
+    agent = current_agent.get()
+    llm_tokens.inc(usage.prompt_tokens, model=model, agent=agent, direction="in")
+    llm_tokens.inc(usage.completion_tokens, model=model, agent=agent, direction="out")
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by its route template (not
+    the raw path, which would explode the label cardinality)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_request_duration.observe(
+                time.perf_counter() - started, method=scope["method"], route=route, status=str(status)
+            )
+            if status >= 500:
+                errors.inc(component="http", type=str(status))
@@ -0,0 +1,134 @@
+import argparse
+import importlib.util
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from types import ModuleType
+from typing import List, Optional
+import sqlalchemy as sa
+from app.core.logging_config import logger
+
+#############
+# Schema migrations
+#############
+# The schema is owned by the numbered modules in app/migrations
+# ("0001_initial_schema.py", ...). Each defines upgrade(connection) and
+# downgrade(connection) on a SQLAlchemy Connection and is applied in its own
+# transaction; applied versions are recorded in the schema_migrations table.
+#
+#   python -m app.core.migrations status
+#   python -m app.core.migrations upgrade [version]
+#   python -m app.core.migrations downgrade <version|base>
+#
+# Migrations are frozen history: they describe tables with their own
+# sa.Table definitions, never by importing the current models.
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+
+schema_migrations = sa.Table(
+    "schema_migrations",
+    sa.MetaData(),
+    sa.Column("version", sa.String(32), primary_key=True),
+    sa.Column("name", sa.String(200), nullable=False),
+    sa.Column("applied_at", sa.DateTime, nullable=False),
+)
+
+@dataclass(frozen=True)
+class Migration:
+    version: str
+    name: str
+    module: ModuleType
+
+    def upgrade(self, connection):
+        self.module.upgrade(connection)
+
+    def downgrade(self, connection):
+        self.module.downgrade(connection)
+
+def discover(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for path in sorted(directory.glob("[0-9]*.py")):
+        version, _, name = path.stem.partition("_")
+        spec = importlib.util.spec_from_file_location(f"app.migrations.m{path.stem}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migrations.append(Migration(version, name, module))
+    versions = [migration.version for migration in migrations]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+def applied_versions(connection) -> List[str]:
+    schema_migrations.create(connection, checkfirst=True)
+    versions = connection.scalars(sa.select(schema_migrations.c.version).order_by(schema_migrations.c.version)).all()
+    connection.commit()
+    return list(versions)
+
+def upgrade(connection, target: Optional[str] = None) -> List[str]:
+    """Applies every pending migration up to and including `target` (default:
+    the latest), committing after each one."""
+    applied = set(applied_versions(connection))
+    done = []
+    for migration in discover():
+        if target is not None and migration.version > target:
+            break
+        if migration.version in applied:
+            continue
+        logger.info("Applying migration %s_%s", migration.version, migration.name)
+        migration.upgrade(connection)
+        connection.execute(schema_migrations.insert().values(
+            version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+        ))
+        connection.commit()
+        done.append(migration.version)
+    return done
+
+def downgrade(connection, target: str) -> List[str]:
+    """Reverts applied migrations newer than `target` ("base" reverts all)."""
+    applied = set(applied_versions(connection))
+    done = []
+    for migration in reversed(discover()):
+        if target != "base" and migration.version <= target:
+            break
+        if migration.version not in applied:
+            continue
+        logger.info("Reverting migration %s_%s", migration.version, migration.name)
+        migration.downgrade(connection)
+        connection.execute(schema_migrations.delete().where(schema_migrations.c.version == migration.version))
+        connection.commit()
+        done.append(migration.version)
+    return done
+
+async def migrate():
+    """Upgrades the configured database to the latest migration (DB_MIGRATE_ON_STARTUP)."""
+    from app.core.database import async_engine
+
+    async with async_engine.connect() as connection:
+        return await connection.run_sync(upgrade)
+
+def main(argv=None):
+    from app.core.database import engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.core.migrations", description="Schema migrations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="List migrations and whether they are applied")
+    upgrade_parser = commands.add_parser("upgrade", help="Apply pending migrations")
+    upgrade_parser.add_argument("version", nargs="?", help="Stop at this version (default: latest)")
+    downgrade_parser = commands.add_parser("downgrade", help="Revert migrations newer than a version")
+    downgrade_parser.add_argument("version", help='Version to keep, or "base" to revert all')
+    args = parser.parse_args(argv)
+
+    with engine.connect() as connection:
+        if args.command == "upgrade":
+            done = upgrade(connection, args.version)
+        elif args.command == "downgrade":
+            done = downgrade(connection, args.version)
+        else:
+            applied = set(applied_versions(connection))
+            for migration in discover():
+                print(f"{'applied' if migration.version in applied else 'pending':8} {migration.version}_{migration.name}")
+            return
+    print(f"{args.command}: {', '.join(done) if done else 'nothing to do'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import httpx
+from openai import AsyncOpenAI
+from app.core.config import settings
+
+# One AsyncOpenAI client (and one httpx connection pool) per worker process.
+# Connections are kept alive between requests so concurrent agent
+# conversations reuse sockets instead of paying a TLS handshake per call.
+# With LLM_BACKEND=mock the offline mock backend is returned instead.
+_client: AsyncOpenAI = None
+
+def get_openai_client() -> AsyncOpenAI:
+    global _client
+    if _client is None and settings.LLM_BACKEND == "mock":
+        from app.services.mock_llm import MockLLMClient
+        _client = MockLLMClient(settings.MOCK_LLM_SCRIPT)
+    if _client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT),
+        )
+        _client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,  # Use the API key from settings
+            http_client=http_client,
+            max_retries=settings.OPENAI_MAX_RETRIES,
+        )
+    return _client
+
+async def close_openai_client():
+    """Release the pooled connections (called on application shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
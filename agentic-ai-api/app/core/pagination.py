@@ -0,0 +1,66 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Tuple
+from uuid import UUID
+from fastapi import HTTPException
+from sqlalchemy import and_, cast, or_
+
+#############
+# Keyset (cursor) pagination
+#############
+# Lists are ordered on (created_at, id) and a page continues strictly after
+# the last row of the previous one: WHERE created_at >= :c AND (created_at > :c
+# OR id > :id). Unlike OFFSET the database seeks straight to the position,
+# so page 1000 costs what page 1 costs, and rows inserted meanwhile can
+# neither shift a page nor be returned twice (new rows sort last).
+#
+# The cursor is opaque to clients: base64url of the last row's key.
+
+Key = Tuple[datetime, UUID]
+
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    raw = json.dumps([created_at.isoformat(), str(id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Key:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def after_cursor(statement, model, cursor: str, dialect: str = ""):
+    """Restricts `statement` to the rows sorting after `cursor`."""
+    created_at, id = decode_cursor(cursor)
+    if dialect == "mssql":
+        # DATETIME compared with a datetime2 parameter is rounded
+        # differently; casting the parameter keeps equality exact
+        created_at = cast(created_at, model.created_at.type)
+    # The leading created_at >= :c gives the database a range to seek to in a
+    # (..., created_at, id) index; the OR alone would be a scan
+    return statement.where(and_(
+        model.created_at >= created_at,
+        or_(model.created_at > created_at, model.id > id),
+    ))
+
+def keyset_statement(statement, model, limit: int, cursor: Optional[str] = None, dialect: str = ""):
+    """Orders `statement` on (created_at, id) and limits it to the page after
+    `cursor`, plus one row telling whether another page follows."""
+    if cursor:
+        statement = after_cursor(statement, model, cursor, dialect)
+    return statement.order_by(model.created_at, model.id).limit(limit + 1)
+
+def keyset_page(rows: Sequence[Any], limit: int) -> Dict[str, Any]:
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return {"items": items, "next_cursor": next_cursor}
+
+async def fetch_page(db, statement, model, limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+    dialect = db.get_bind().dialect.name
+    rows = (await db.scalars(keyset_statement(statement, model, limit, cursor, dialect))).all()
+    return keyset_page(rows, limit)
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+#############
+# On-demand sampling profiler
+#############
+# A background thread snapshots the stack of every thread of the worker
+# (sys._current_frames) at a fixed interval and counts identical stacks.
+# Nothing runs unless a session was started from /debug/profile: the
+# middleware then only checks one attribute per request.
+#
+# A session either runs for N seconds, or samples only while requests
+# matching a route prefix are in flight, until N of them have finished.
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+# Leaf frames of threads that are parked, not working
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+class ProfileSession:
+    def __init__(self, interval: float, route: Optional[str] = None, requests: Optional[int] = None, include_idle: bool = False):
+        self.interval = interval
+        self.route = route
+        self.requests = requests
+        self.include_idle = include_idle
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.done = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            # In request mode only while a matching request is running
+            if self.route is not None and self.in_flight == 0:
+                continue
+            self.sample_count += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                if not self.include_idle and (os.path.basename(stack[0][1]), stack[0][0]) in _IDLE_LEAVES:
+                    continue
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append((names.get(ident, f"thread-{ident}"), "", 0))
+                self.samples[tuple(reversed(stack))] += 1
+
+    # Request mode bookkeeping (called by ProfilerMiddleware on the event loop)
+    def matches(self, path: str) -> bool:
+        return self.route is not None and path.startswith(self.route)
+
+    def request_started(self):
+        self.in_flight += 1
+
+    def request_finished(self):
+        self.in_flight -= 1
+        self.completed += 1
+        if self.requests is not None and self.completed >= self.requests:
+            self.done.set()
+
+    #############
+    # Output
+    #############
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed stacks ("a;b;c count"), for flamegraph.pl
+        and most flame graph viewers."""
+        lines = []
+        for stack, count in self.samples.most_common():
+            frames = ";".join(
+                f"{name} ({os.path.basename(path)}:{line})" if path else name for name, path, line in stack
+            )
+            lines.append(f"{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> Dict[str, Any]:
+        """speedscope file format, one sampled profile for the whole worker."""
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.samples.most_common():
+            sample = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    name, path, line = frame
+                    frames.append({"name": name, "file": path, "line": line} if path else {"name": name})
+                sample.append(index[frame])
+            samples.append(sample)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": f"pid {os.getpid()}" + (f" {self.route}" if self.route else ""),
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": "agentic-ai-api profile",
+            "exporter": "app.core.profiler",
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "seconds": round(self.elapsed, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.sample_count,
+            "requests": self.completed if self.route is not None else None,
+        }
+
+# The running session, if any (one per worker at a time)
+active_session: Optional[ProfileSession] = None
+
+class ProfilerMiddleware:
+    """Counts in-flight requests matching the active session's route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = active_session
+        if session is None or scope["type"] != "http" or not session.matches(scope["path"]):
+            return await self.app(scope, receive, send)
+        session.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session.request_finished()
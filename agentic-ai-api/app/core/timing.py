@@ -0,0 +1,22 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Time spent per stage ("llm", "tool", "db") by the current request. Whoever
+# owns the request (e.g. the benchmark) sets a dict; tool threads run in a
+# copy of the context and so add to the same dict.
+stage_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+def record_stage(stage: str, seconds: float):
+    timings = stage_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+@contextmanager
+def timed(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
@@ -0,0 +1,208 @@
+import json
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.core.logging_config import logger, request_id
+
+#############
+# In-process request tracing
+#############
+# A sampled request gets a trace; spans opened while it runs (route, agent
+# turns, OpenAI calls, tools, SQL queries) are recorded into it with their
+# parent, and finished traces are kept in a ring buffer served by
+# /debug/traces. The sampling decision is made once per request (head
+# sampling); unsampled requests only pay a context variable lookup per span.
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.status = "ok"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None):
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = type(error).__name__
+        self.trace.add(self)
+
+class Trace:
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.dropped = 0
+
+    def add(self, span: Span):
+        # Spans may end on tool threads; list.append is atomic
+        if len(self.spans) < settings.TRACE_MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+    def waterfall(self) -> Dict[str, Any]:
+        """Spans ordered by start, with offsets from the start of the trace and
+        their depth, ready to draw as a waterfall."""
+        spans = sorted(self.spans, key=lambda span: span.start_ns)
+        origin = spans[0].start_ns if spans else 0
+        depth: Dict[Optional[str], int] = {}
+        root = next((span for span in spans if span.parent_id is None), None)
+        for span in spans:
+            depth[span.span_id] = depth.get(span.parent_id, -1) + 1
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name if root else None,
+            "duration_ms": round((root.end_ns - root.start_ns) / 1e6, 3) if root else None,
+            "dropped_spans": self.dropped,
+            "spans": [
+                {
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "name": span.name,
+                    "depth": depth[span.span_id],
+                    "offset_ms": round((span.start_ns - origin) / 1e6, 3),
+                    "duration_ms": round((span.end_ns - span.start_ns) / 1e6, 3),
+                    "status": span.status,
+                    "attributes": span.attributes,
+                }
+                for span in spans
+            ],
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """OTLP/JSON (ExportTraceServiceRequest) encoding of the trace."""
+        def value(v):
+            if isinstance(v, bool):
+                return {"boolValue": v}
+            if isinstance(v, int):
+                return {"intValue": str(v)}
+            if isinstance(v, float):
+                return {"doubleValue": v}
+            return {"stringValue": str(v)}
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": settings.TRACE_SERVICE_NAME}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.core.tracing"},
+                    "spans": [
+                        {
+                            "traceId": self.trace_id,
+                            "spanId": span.span_id,
+                            **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                            "name": span.name,
+                            "kind": 2 if span.parent_id is None else 1,  # SERVER for the root, INTERNAL otherwise
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns),
+                            "attributes": [{"key": k, "value": value(v)} for k, v in span.attributes.items()],
+                            "status": {"code": 2 if span.status == "error" else 1},
+                        }
+                        for span in self.spans
+                    ],
+                }],
+            }],
+        }
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+# Most recent finished traces, newest last
+traces: deque = deque(maxlen=settings.TRACE_BUFFER_SIZE)
+
+# OTLP file export happens off the request path, one line per trace
+_exporter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-export") if settings.TRACE_EXPORT_PATH else None
+
+def _export(trace: Trace):
+    try:
+        with open(settings.TRACE_EXPORT_PATH, "a") as f:
+            f.write(json.dumps(trace.to_otlp(), default=str) + "\n")
+    except OSError:
+        logger.exception("Trace export failed")
+
+def start_span(name: str, **attributes) -> Optional[Span]:
+    """Starts a child of the current span; None when the request is not traced."""
+    parent = current_span.get()
+    if parent is None:
+        return None
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+@contextmanager
+def span(name: str, **attributes):
+    """Times a block as a child of the current span (no-op when not traced)."""
+    child = start_span(name, **attributes)
+    if child is None:
+        yield None
+        return
+    token = current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.end(e)
+        raise
+    else:
+        child.end()
+    finally:
+        try:
+            current_span.reset(token)
+        except ValueError:
+            # Closed from another context (e.g. an abandoned stream)
+            pass
+
+def get_trace(trace_id: str) -> Optional[Trace]:
+    return next((trace for trace in traces if trace.trace_id == trace_id), None)
+
+class TracingMiddleware:
+    """ASGI middleware starting the root span of sampled requests. Requests
+    with "X-Trace: 1" are always traced."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.TRACING_ENABLED:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-trace") != b"1" and random.random() >= settings.TRACE_SAMPLE_RATE:
+            return await self.app(scope, receive, send)
+
+        trace = Trace()
+        root = Span(trace, f"{scope['method']} {scope['path']}", None, {"http.method": scope["method"], "request_id": request_id.get()})
+        token = current_span.set(root)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.set(**{"http.status_code": message["status"]})
+                message["headers"] = list(message.get("headers") or []) + [(b"x-trace-id", trace.trace_id.encode())]
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            current_span.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                root.name = f"{scope['method']} {route}"
+                root.set(**{"http.route": route})
+            root.end(error)
+            traces.append(trace)
+            if _exporter is not None:
+                _exporter.submit(_export, trace)
@@ -0,0 +1,46 @@
+from typing import Any, Dict, Optional
+from sqlalchemy import delete, insert, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+#############
+# Single-statement writes
+#############
+# Create, update and delete of one row are a single statement plus COMMIT:
+# the row comes back through RETURNING (OUTPUT INSERTED.* / DELETED.* on SQL
+# Server) with its server-side values (created_at, updated_at), instead of
+# INSERT + COMMIT + SELECT (refresh) or SELECT + DML + COMMIT + SELECT.
+#
+# Updates and deletes are conditional on the key: a missing row is no
+# returned row (no affected row), reported by the caller as not found; there
+# is no read beforehand.
+#
+# Rows are Core rows, which the response models read like ORM objects
+# (from_attributes); nothing goes through the session's identity map.
+
+async def insert_returning(db: AsyncSession, model, values: Dict[str, Any]) -> Row:
+    table = model.__table__
+    row = (await db.execute(insert(table).values(values).returning(*table.c))).one()
+    await db.commit()
+    return row
+
+async def update_returning(db: AsyncSession, model, id, values: Dict[str, Any]) -> Optional[Row]:
+    """The updated row, or None if there is no row with this id."""
+    table = model.__table__
+    row = (await db.execute(update(table).where(table.c.id == id).values(values).returning(*table.c))).first()
+    await db.commit()
+    return row
+
+async def delete_returning(db: AsyncSession, model, id) -> Optional[Row]:
+    """The deleted row, or None if there is no row with this id."""
+    table = model.__table__
+    row = (await db.execute(delete(table).where(table.c.id == id).returning(*table.c))).first()
+    await db.commit()
+    return row
+
+async def delete_by_id(db: AsyncSession, model, id) -> bool:
+    """Deletes without reading the row back; False if nothing was deleted."""
+    table = model.__table__
+    result = await db.execute(delete(table).where(table.c.id == id))
+    await db.commit()
+    return result.rowcount > 0
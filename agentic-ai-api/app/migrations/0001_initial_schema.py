@@ -0,0 +1,57 @@
+"""Patients, Appointments and reservations as in agentic-ai.bacpac.
+
+Tables are only created when missing, so a database restored from the
+bacpac is simply marked as being at this version.
+"""
+import sqlalchemy as sa
+
+def tables(connection) -> sa.MetaData:
+    metadata = sa.MetaData()
+    # Keys default to NEWID() on SQL Server, as in the bacpac; elsewhere the
+    # application generates them
+    new_id = {"server_default": sa.text("NEWID()")} if connection.dialect.name == "mssql" else {}
+
+    sa.Table(
+        "Patients", metadata,
+        sa.Column("id", sa.Uuid, primary_key=True, **new_id),
+        sa.Column("name", sa.Unicode(100), nullable=False),
+        sa.Column("email", sa.Unicode(150)),
+        sa.Column("mobile_phone", sa.Unicode(15), nullable=False),
+        sa.Column("home_phone", sa.Unicode(15)),
+        sa.Column("referral_info", sa.Text),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime, server_default=sa.func.now()),
+    )
+    appointments = sa.Table(
+        "Appointments", metadata,
+        sa.Column("id", sa.Uuid, primary_key=True, **new_id),
+        sa.Column("patient_id", sa.Uuid, sa.ForeignKey("Patients.id"), nullable=False),
+        sa.Column("type", sa.Unicode(50), nullable=False),
+        sa.Column("status", sa.Unicode(20), nullable=False),
+        sa.Column("scheduled_date", sa.Date),
+        sa.Column("insurance_required", sa.Boolean, server_default=sa.false()),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime, server_default=sa.func.now()),
+        sa.CheckConstraint("status IN ('Cancelled', 'Completed', 'Confirmed', 'Pending')"),
+    )
+    sa.Index("idx_appointments_patient_id", appointments.c.patient_id)
+    sa.Table(
+        "reservations", metadata,
+        sa.Column("id", sa.Uuid, primary_key=True, **new_id),
+        sa.Column("user_id", sa.Integer, nullable=False),
+        sa.Column("restaurant_name", sa.Unicode(255), nullable=False),
+        sa.Column("reservation_time", sa.DateTime, nullable=False),
+        sa.Column("number_of_people", sa.Integer, nullable=False),
+        sa.Column("budget", sa.Numeric(10, 2), nullable=False),
+        sa.Column("status", sa.Unicode(20), server_default="pending"),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime, server_default=sa.func.now()),
+        sa.CheckConstraint("status IN ('canceled', 'confirmed', 'pending')"),
+    )
+    return metadata
+
+def upgrade(connection):
+    tables(connection).create_all(connection, checkfirst=True)
+
+def downgrade(connection):
+    tables(connection).drop_all(connection)
@@ -0,0 +1,74 @@
+"""Indexes for the list, filter and export queries.
+
+Every list is read in keyset order (created_at, id) (see app.core.pagination),
+so each index ends in those two columns: the database seeks to the cursor
+inside the filtered range and reads the page in order, with no sort.
+
+  Appointments (patient_id, created_at, id)  a patient's appointments; also
+                                             serves the foreign key, so it
+                                             replaces idx_appointments_patient_id
+  Appointments (status, created_at, id)      status filter of the API and the
+                                             agents; covering on SQL Server and
+                                             PostgreSQL (INCLUDE the other
+                                             columns), so no key lookups
+  Appointments (scheduled_date, created_at, id)
+  Appointments (created_at, id)              unfiltered pages and exports
+  Patients (created_at, id)
+  reservations (status, created_at, id)
+  reservations (created_at, id)
+
+benchmarks/db_indexes.py measures each against the query it is for.
+"""
+import sqlalchemy as sa
+
+APPOINTMENT_COLUMNS = ("patient_id", "type", "scheduled_date", "insurance_required", "updated_at")
+
+def indexes():
+    metadata = sa.MetaData()
+    patients = sa.Table(
+        "Patients", metadata,
+        sa.Column("id", sa.Uuid, primary_key=True),
+        sa.Column("created_at", sa.DateTime),
+    )
+    appointments = sa.Table(
+        "Appointments", metadata,
+        sa.Column("id", sa.Uuid, primary_key=True),
+        sa.Column("patient_id", sa.Uuid),
+        sa.Column("type", sa.Unicode(50)),
+        sa.Column("status", sa.Unicode(20)),
+        sa.Column("scheduled_date", sa.Date),
+        sa.Column("insurance_required", sa.Boolean),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+    )
+    reservations = sa.Table(
+        "reservations", metadata,
+        sa.Column("id", sa.Uuid, primary_key=True),
+        sa.Column("status", sa.Unicode(20)),
+        sa.Column("created_at", sa.DateTime),
+    )
+    a, p, r = appointments.c, patients.c, reservations.c
+    return [
+        sa.Index("ix_appointments_patient_created", a.patient_id, a.created_at, a.id),
+        sa.Index(
+            "ix_appointments_status_created", a.status, a.created_at, a.id,
+            mssql_include=list(APPOINTMENT_COLUMNS), postgresql_include=list(APPOINTMENT_COLUMNS),
+        ),
+        sa.Index("ix_appointments_scheduled_created", a.scheduled_date, a.created_at, a.id),
+        sa.Index("ix_appointments_created", a.created_at, a.id),
+        sa.Index("ix_patients_created", p.created_at, p.id),
+        sa.Index("ix_reservations_status_created", r.status, r.created_at, r.id),
+        sa.Index("ix_reservations_created", r.created_at, r.id),
+    ], sa.Index("idx_appointments_patient_id", a.patient_id)
+
+def upgrade(connection):
+    new, replaced = indexes()
+    for index in new:
+        index.create(connection)
+    replaced.drop(connection)
+
+def downgrade(connection):
+    new, replaced = indexes()
+    replaced.create(connection)
+    for index in new:
+        index.drop(connection)
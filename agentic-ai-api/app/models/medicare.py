@@ -1,18 +1,21 @@
-from sqlalchemy import Column, String, DateTime, Date, ForeignKey, Boolean
-from sqlalchemy.dialects.mssql import UNIQUEIDENTIFIER
+from sqlalchemy import Column, String, DateTime, Date, ForeignKey, Boolean, Index, Uuid
 from sqlalchemy.sql import func
 from app.core.database import Base
 from pydantic import BaseModel, validator
 from typing import Optional
 from datetime import datetime, date
-from uuid import UUID
+from uuid import UUID, uuid4
 from sqlalchemy.orm import relationship
 
-# SQLAlchemy ORM Models
+# SQLAlchemy ORM Models (the schema is owned by app/migrations; indexes are
+# declared here too so that the models describe the database)
 class Patient(Base):
     __tablename__ = "Patients"
+    __table_args__ = (
+        Index("ix_patients_created", "created_at", "id"),
+    )
 
-    id = Column(UNIQUEIDENTIFIER, primary_key=True, server_default=func.newid())  # Auto-generate ID
+    id = Column(Uuid, primary_key=True, default=uuid4)  # Auto-generate ID (UNIQUEIDENTIFIER on SQL Server)
     name = Column(String, nullable=False)
     email = Column(String, nullable=True)
     mobile_phone = Column(String, nullable=False)
@@ -57,9 +60,19 @@ class PatientResponse(BaseModel):
 
 class Appointment(Base):
     __tablename__ = "Appointments"
+    __table_args__ = (
+        Index("ix_appointments_patient_created", "patient_id", "created_at", "id"),
+        Index(
+            "ix_appointments_status_created", "status", "created_at", "id",
+            mssql_include=["patient_id", "type", "scheduled_date", "insurance_required", "updated_at"],
+            postgresql_include=["patient_id", "type", "scheduled_date", "insurance_required", "updated_at"],
+        ),
+        Index("ix_appointments_scheduled_created", "scheduled_date", "created_at", "id"),
+        Index("ix_appointments_created", "created_at", "id"),
+    )
 
-    id = Column(UNIQUEIDENTIFIER, primary_key=True, server_default=func.newid())  # Auto-generate ID
-    patient_id = Column(UNIQUEIDENTIFIER, ForeignKey("Patients.id"), nullable=False)  # Foreign key to Patient
+    id = Column(Uuid, primary_key=True, default=uuid4)  # Auto-generate ID (UNIQUEIDENTIFIER on SQL Server)
+    patient_id = Column(Uuid, ForeignKey("Patients.id"), nullable=False)  # Foreign key to Patient
     type = Column(String(50), nullable=False)  # Type of appointment
     status = Column(String(20), nullable=False)  # Status of the appointment
     scheduled_date = Column(Date, nullable=True)  # Date of the appointment
@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Numeric, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Numeric, Enum, Index, Uuid
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 import enum
-from sqlalchemy.dialects.mssql import UNIQUEIDENTIFIER
+import uuid
 
 Base = declarative_base()
 
@@ -13,8 +13,12 @@ class ReservationStatus(enum.Enum):
 
 class Reservation(Base):
     __tablename__ = 'reservations'
+    __table_args__ = (
+        Index("ix_reservations_status_created", "status", "created_at", "id"),
+        Index("ix_reservations_created", "created_at", "id"),
+    )
 
-    id = Column(UNIQUEIDENTIFIER, primary_key=True, default=func.newid())
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
     user_id = Column(Integer, nullable=False)
     restaurant_name = Column(String(255), nullable=False)
     reservation_time = Column(DateTime, nullable=False)
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+class BulkItem(BaseModel):
+    index: int  # Position of the row in the request
+    id: UUID
+    created_at: Optional[datetime] = None  # Creates only
+
+class BulkRowError(BaseModel):
+    index: Optional[int]
+    errors: List[Dict[str, Any]]  # Pydantic validation errors, or the database's
+
+class BulkResponse(BaseModel):
+    mode: str
+    succeeded: int
+    failed: int
+    items: List[BulkItem]
+    errors: List[BulkRowError]
@@ -0,0 +1,396 @@
+import enum
+import json
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Literal, Optional, Type
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.endpoints.medicare import appointments_statement
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logging_config import logger
+from app.models.medicare import Appointment
+from app.models.reservations import Reservation
+from app.services.reservations import create_reservation, reservations_statement
+from app.schemas.reservations import ReservationCreate
+from app.services.token_budget import count_tokens
+
+#############
+# Tool arguments
+#############
+# Validators for tool_call.function.arguments. The raw JSON string is parsed
+# and validated in one step with model_validate_json.
+
+class WeatherArgs(BaseModel):
+    location: str
+    unit: Literal["celsius", "fahrenheit"] = "fahrenheit"
+
+class AppointmentsArgs(BaseModel):
+    patient_id: Optional[uuid.UUID] = None
+    status: Optional[str] = None
+    type: Optional[str] = None
+    scheduled_date: Optional[date] = None
+    skip: int = 0
+    limit: int = 10
+
+class ReservationsArgs(BaseModel):
+    status: Optional[Literal["pending", "confirmed", "canceled"]] = None
+    restaurant_name: Optional[str] = None
+    skip: int = 0
+
+class CreateReservationArgs(BaseModel):
+    user_id: Optional[int] = None
+    restaurant_name: str
+    reservation_time: datetime
+    number_of_people: int
+    budget: float
+    status: Literal["pending", "confirmed", "canceled"] = "pending"
+
+#############
+# Result encoding
+#############
+# Tool results go into the prompt, so they are compact JSON of only the
+# fields the model needs, paged server-side and capped in tokens. What does
+# not fit is reported as "N more rows" rather than sent.
+
+# Fields the model sees, per table
+APPOINTMENT_FIELDS = ("id", "patient_id", "type", "status", "scheduled_date", "insurance_required")
+RESERVATION_FIELDS = ("id", "restaurant_name", "reservation_time", "number_of_people", "budget", "status")
+
+def json_value(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+def compact_json(data) -> str:
+    return json.dumps(data, separators=(",", ":"), default=json_value)
+
+def project(row, fields) -> Dict[str, Any]:
+    """The requested fields of an ORM row, nulls left out."""
+    values = {name: getattr(row, name) for name in fields}
+    return {name: value for name, value in values.items() if value is not None}
+
+async def page_result(db: AsyncSession, statement, order_by, fields, skip: int = 0, limit: Optional[int] = None) -> str:
+    """Runs one page of `statement` and encodes it within TOOL_RESULT_MAX_TOKENS."""
+    limit = min(limit or settings.TOOL_RESULT_PAGE_SIZE, settings.TOOL_RESULT_PAGE_SIZE)
+    # One extra row tells whether there is more without counting every time
+    rows = (await db.scalars(statement.order_by(order_by).offset(skip).limit(limit + 1))).all()
+    more = 0
+    if len(rows) > limit:
+        rows = rows[:limit]
+        total = await db.scalar(select(func.count()).select_from(statement.subquery()))
+        more = total - skip - limit
+
+    encoded, budget, dropped = [], settings.TOOL_RESULT_MAX_TOKENS, 0
+    for row in rows:
+        item = compact_json(project(row, fields))
+        cost = count_tokens(item)
+        if cost > budget:
+            if encoded:
+                break
+            # The first row alone is over the cap: cut its text short, or leave it out
+            item = fit_row(project(row, fields), budget)
+            if item is None:
+                dropped = 1
+                break
+            cost = count_tokens(item)
+        budget -= cost
+        encoded.append(item)
+    more += len(rows) - len(encoded)
+
+    result = '{"rows":[' + ",".join(encoded) + "]"
+    if more:
+        too_large = " (the first is too large to show)" if dropped else ""
+        result += f',"more":{more},"note":' + json.dumps(
+            f"{more} more rows{too_large}, refine your filter or ask for the next page with "
+            f"skip={skip + len(encoded) + dropped}"
+        )
+    return result + "}"
+
+def fit_row(values: Dict[str, Any], budget: int) -> Optional[str]:
+    """A row encoded within `budget` tokens by halving its longest text
+    values; None when even that does not fit."""
+    values = dict(values)
+    while True:
+        item = compact_json(values)
+        if count_tokens(item) <= budget:
+            return item
+        texts = [name for name, value in values.items() if isinstance(value, str) and len(value) > 8]
+        if not texts:
+            return None
+        longest = max(texts, key=lambda name: len(values[name]))
+        values[longest] = values[longest][:len(values[longest]) // 2].rstrip(".") + "..."
+
+class _Blank(dict):
+    def __missing__(self, key):
+        return ""
+
+def render_result(template: str, result: str, placeholders: Optional[Dict[str, str]] = None) -> str:
+    """Formats a tool result for the user without a model call: `template` is
+    applied to the result object, or to each row of a paged result. Fields a
+    row leaves out (nulls are not encoded) read as their `placeholders` text."""
+    data = json.loads(result)
+    if "error" in data:
+        raise ValueError(data["error"])
+
+    def fields(row):
+        return _Blank({**(placeholders or {}), **{name: value for name, value in row.items() if value is not None}})
+
+    if "rows" not in data:
+        return template.format_map(fields(data))
+    lines = [template.format_map(fields(row)) for row in data["rows"]] or ["No results found."]
+    if data.get("more"):
+        lines.append(f"...and {data['more']} more. Refine your request to narrow the list.")
+    return "\n".join(lines)
+
+#############
+# Tool implementations
+#############
+
+# Function definitions for weather retrieval
+def get_current_weather(args: WeatherArgs):
+    """Get the current weather in a given location."""
+    location = args.location.lower()
+    if "tokyo" in location:
+        return json.dumps({"location": "Tokyo", "temperature": 10, "unit": args.unit})
+    elif "san francisco" in location:
+        return json.dumps({"location": "San Francisco", "temperature": 72, "unit": args.unit})
+    elif "paris" in location:
+        return json.dumps({"location": "Paris", "temperature": 22, "unit": args.unit})
+    else:
+        return json.dumps({"location": args.location, "temperature": "unknown"})
+
+async def fetch_appointments(args: AppointmentsArgs) -> str:
+    async with AsyncSessionLocal() as db:
+        statement = appointments_statement(args.patient_id, args.status, args.type, args.scheduled_date)
+        return await page_result(db, statement, Appointment.created_at, APPOINTMENT_FIELDS, args.skip, args.limit)
+
+async def fetch_reservations(args: ReservationsArgs) -> str:
+    async with AsyncSessionLocal() as db:
+        statement = reservations_statement(args.status, args.restaurant_name)
+        return await page_result(db, statement, Reservation.created_at, RESERVATION_FIELDS, args.skip)
+
+async def make_reservation(args: CreateReservationArgs) -> str:
+    # Predefine user_id statically for testing
+    predefined_user_id = int(str(uuid.uuid4())[:8], 16) % 1000000
+    reservation_data = ReservationCreate(user_id=predefined_user_id, **args.dict(exclude={"user_id"}))
+
+    async with AsyncSessionLocal() as db:
+        response = await create_reservation(db, reservation_data)
+        logger.info("Reservation created", extra={"reservation_id": response.id})
+        return compact_json(project(response, RESERVATION_FIELDS))
+
+#############
+# Registry
+#############
+
+@dataclass(frozen=True)
+class Tool:
+    name: str
+    description: str
+    parameters: Dict[str, Any]  # JSON schema sent to the model
+    arguments: Type[BaseModel]
+    handler: Callable[[BaseModel], Any]  # Blocking handlers run on the tool thread pool, async ones on the loop
+    writes: bool = False  # Never cached, never reused from a cache
+    # Direct response mode: when set, a successful result is rendered with this
+    # template (see render_result) as the final answer, skipping the completion
+    # that would otherwise phrase it
+    direct_template: Optional[str] = None
+    direct_placeholders: Dict[str, str] = field(default_factory=dict)  # For fields that may be null
+
+    @property
+    def schema(self) -> Dict[str, Any]:
+        return {
+            "type": "function",
+            "function": {"name": self.name, "description": self.description, "parameters": self.parameters},
+        }
+
+class ToolSchemaList(list):
+    """The `tools` list sent to the model, with its canonical JSON serialized
+    (and its tokens counted) once instead of on every call."""
+
+    def __init__(self, schemas):
+        super().__init__(schemas)
+        self.json_payload = json.dumps(schemas, sort_keys=True, separators=(",", ":"))
+        self.token_count = count_tokens(self.json_payload)
+
+class ToolArgumentsError(Exception):
+    def __init__(self, tool: Tool, error: ValidationError):
+        super().__init__(str(error))
+        self.tool = tool
+        self.error = error
+
+    @property
+    def missing(self) -> List[str]:
+        return [str(e["loc"][0]) for e in self.error.errors() if e["type"] == "missing" and e["loc"]]
+
+@dataclass
+class ToolSet:
+    """A named selection of tools; schemas and dispatch table are built once."""
+    name: str
+    tools: List[Tool]
+    schemas: ToolSchemaList = field(init=False)
+    by_name: Dict[str, Tool] = field(init=False)
+
+    def __post_init__(self):
+        self.schemas = ToolSchemaList([tool.schema for tool in self.tools])
+        self.by_name = {tool.name: tool for tool in self.tools}
+
+    def parse_arguments(self, name: str, arguments: str) -> BaseModel:
+        tool = self.by_name[name]
+        try:
+            return tool.arguments.model_validate_json(arguments or "{}")
+        except ValidationError as e:
+            raise ToolArgumentsError(tool, e)
+
+    def call(self, name: str, args: BaseModel):
+        """Routes the function calls to their corresponding implementations
+        (returns a coroutine for async handlers)."""
+        tool = self.by_name.get(name)
+        if tool is None:
+            return json.dumps({"error": f"Function {name} not found."})
+        return tool.handler(args)
+
+TOOLS: Dict[str, Tool] = {tool.name: tool for tool in [
+    Tool(
+        name="get_current_weather",
+        description="Get the current weather in a given location",
+        parameters={
+            "type": "object",
+            "properties": {
+                "location": {
+                    "type": "string",
+                    "description": "The city and state, e.g., San Francisco, CA",
+                },
+                "unit": {
+                    "type": "string",
+                    "enum": ["celsius", "fahrenheit"],
+                },
+            },
+            "required": ["location"],
+        },
+        arguments=WeatherArgs,
+        handler=get_current_weather,
+    ),
+    Tool(
+        name="get_appointments",
+        description="Retrieve medical appointments with optional filters such as status",
+        parameters={
+            "type": "object",
+            "properties": {
+                "status": {
+                    "type": "string",
+                    "description": "Filter appointments by status, e.g., Pending",
+                },
+                "type": {
+                    "type": "string",
+                    "description": "Filter appointments by type.",
+                },
+                "scheduled_date": {
+                    "type": "string",
+                    "format": "date",
+                    "description": "Filter appointments by scheduled date (YYYY-MM-DD).",
+                },
+                "skip": {
+                    "type": "integer",
+                    "description": "Rows to skip, to get the next page of results.",
+                },
+            },
+            "required": [],
+        },
+        arguments=AppointmentsArgs,
+        handler=fetch_appointments,
+        direct_template="- {type} appointment, {scheduled_date} ({status})",
+        direct_placeholders={"scheduled_date": "unscheduled"},
+    ),
+    Tool(
+        name="get_reservations",
+        description="Retrieve reservations details with optional filters",
+        parameters={
+            "type": "object",
+            "properties": {
+                "status": {
+                    "type": "string",
+                    "enum": ["pending", "confirmed", "canceled"],
+                    "description": "Filter reservations by status.",
+                },
+                "restaurant_name": {
+                    "type": "string",
+                    "description": "Filter reservations by restaurant name (partial match).",
+                },
+                "skip": {
+                    "type": "integer",
+                    "description": "Rows to skip, to get the next page of results.",
+                },
+            },
+            "required": [],
+        },
+        arguments=ReservationsArgs,
+        handler=fetch_reservations,
+    ),
+    Tool(
+        name="create_reservation",
+        description="Create reservation order",
+        parameters={
+            "type": "object",
+            "properties": {
+                "user_id": {
+                    "type": "integer",
+                    "description": "The ID of the user making the reservation.",
+                },
+                "restaurant_name": {
+                    "type": "string",
+                    "description": "Name of the restaurant.",
+                },
+                "reservation_time": {
+                    "type": "string",
+                    "format": "date-time",  # Use ISO 8601 format
+                    "description": "Date and time of the reservation in ISO 8601 format.",
+                },
+                "number_of_people": {
+                    "type": "integer",
+                    "description": "Number of people for the reservation.",
+                },
+                "budget": {
+                    "type": "number",
+                    "format": "float",
+                    "description": "Budget for the reservation.",
+                },
+                # Optional status field
+                "status": {
+                    "type": "string",
+                    "enum": ["pending", "confirmed", "canceled"],
+                    "description": "Status of the reservation.",
+                },
+            },
+            # user_id is assigned server-side
+            "required": ["restaurant_name", "reservation_time", "number_of_people", "budget"],
+        },
+        arguments=CreateReservationArgs,
+        handler=make_reservation,
+        writes=True,
+        direct_template=(
+            "Your reservation at {restaurant_name} for {number_of_people} people on {reservation_time} "
+            "is {status}. Reservation id: {id}."
+        ),
+    ),
+]}
+
+TOOL_SETS: Dict[str, ToolSet] = {
+    "appointments": ToolSet("appointments", [TOOLS["get_current_weather"], TOOLS["get_appointments"]]),
+    "reservations": ToolSet(
+        "reservations",
+        [TOOLS["get_current_weather"], TOOLS["get_reservations"], TOOLS["create_reservation"]],
+    ),
+}
+
+# Tools that write data: completions that select them, or that already contain
+# their results, are never served from (or stored in) the completion cache.
+WRITE_TOOLS = {tool.name for tool in TOOLS.values() if tool.writes}
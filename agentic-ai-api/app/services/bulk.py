@@ -0,0 +1,187 @@
+import uuid
+from itertools import groupby
+from typing import Any, Dict, List, Literal, Type
+from pydantic import BaseModel, ValidationError, create_model
+from sqlalchemy import case, insert, literal, select, update
+from sqlalchemy.exc import DBAPIError, StatementError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.logging_config import logger
+
+#############
+# Bulk create / update
+#############
+# A batch is validated in one pass, then written in chunks of BULK_CHUNK_SIZE
+# rows: one executemany per chunk, which SQLAlchemy sends as
+# multi-row INSERT ... VALUES (insertmanyvalues) and, through RETURNING, hands
+# back the generated columns without a refresh per row.
+#
+#   atomic       any invalid row fails the batch before the database is
+#                touched; all chunks commit together or not at all
+#   best_effort  invalid rows are skipped, each chunk commits on its own
+#
+# When a chunk is rejected by the database, its rows are retried one by one
+# (each in its own transaction, rolled back in atomic mode) to tell which
+# rows failed and why.
+
+Mode = Literal["atomic", "best_effort"]
+
+class BulkError(Exception):
+    """An atomic batch that was not written, with the per-row errors."""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(f"{len(errors)} rows failed")
+        self.errors = errors
+
+def validate_rows(schema: Type[BaseModel], rows: List[Any], errors: List[Dict[str, Any]]):
+    """(index, model) of the valid rows; the others are appended to `errors`."""
+    valid = []
+    for index, row in enumerate(rows):
+        if isinstance(row, Exception):  # An NDJSON line that did not parse
+            errors.append({"index": index, "errors": [{"msg": str(row)}]})
+            continue
+        try:
+            valid.append((index, schema.model_validate(row)))
+        except ValidationError as exc:
+            errors.append({"index": index, "errors": exc.errors(include_url=False, include_context=False)})
+    return valid
+
+def _database_error(index: int, exc: Exception) -> Dict[str, Any]:
+    orig = getattr(exc, "orig", None) or exc
+    return {"index": index, "errors": [{"type": type(orig).__name__, "msg": str(orig)[:300]}]}
+
+def _chunks(rows: List[Any]):
+    size = settings.BULK_CHUNK_SIZE
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+async def _write(db: AsyncSession, mode: Mode, chunks, execute, errors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Runs `execute(db, rows)` per chunk, returning its output rows."""
+    written, failed = [], []
+    for rows in chunks:
+        try:
+            result = await execute(db, rows)
+            if mode == "best_effort":
+                await db.commit()
+            written.extend(result)
+        except (DBAPIError, StatementError) as exc:
+            await db.rollback()
+            logger.info("Bulk chunk of %d rows failed, retrying row by row: %s", len(rows), type(exc).__name__)
+            if mode == "atomic":
+                failed = rows
+                break
+            for row in rows:
+                try:
+                    written.extend(await execute(db, [row]))
+                    await db.commit()
+                except (DBAPIError, StatementError) as row_exc:
+                    await db.rollback()
+                    errors.append(_database_error(row["index"], row_exc))
+
+    if mode == "atomic":
+        if failed:
+            # Nothing was written; find the culprits without keeping anything
+            for row in failed:
+                try:
+                    await execute(db, [row])
+                except (DBAPIError, StatementError) as exc:
+                    errors.append(_database_error(row["index"], exc))
+                finally:
+                    await db.rollback()
+            raise BulkError(errors or [{"index": None, "errors": [{"msg": "Batch rejected by the database"}]}])
+        if errors:  # Rows the statements did not find
+            await db.rollback()
+            raise BulkError(sorted(errors, key=lambda error: error["index"]))
+        await db.commit()
+    return written
+
+async def bulk_create(db: AsyncSession, model, schema: Type[BaseModel], rows: List[Any], mode: Mode) -> Dict[str, Any]:
+    table = model.__table__
+    errors: List[Dict[str, Any]] = []
+    valid = validate_rows(schema, rows, errors)
+    if mode == "atomic" and errors:
+        raise BulkError(errors)
+
+    # Keys are generated here, so a row is identified even where RETURNING is not
+    # row-aligned; created_at comes back from the database
+    values = [{"index": index, "id": uuid.uuid4(), **item.model_dump()} for index, item in valid]
+    statement = insert(table).returning(table.c.id, table.c.created_at, sort_by_parameter_order=True)
+
+    async def execute(db, rows):
+        result = await db.execute(statement, [{key: value for key, value in row.items() if key != "index"} for row in rows])
+        return [{"index": row["index"], "id": id, "created_at": created_at} for row, (id, created_at) in zip(rows, result.all())]
+
+    items = await _write(db, mode, _chunks(values), execute, errors)
+    return _response(mode, len(rows), items, errors)
+
+def update_schema(schema: Type[BaseModel]) -> Type[BaseModel]:
+    """`schema` with the "id" of the row to update; built once per endpoint
+    module, at import."""
+    return create_model(f"{schema.__name__}BulkUpdate", __base__=schema, id=(uuid.UUID, ...))
+
+# Bound parameters per UPDATE statement, under SQL Server's limit of 2100
+UPDATE_PARAMETERS = 2000
+
+async def bulk_update(
+    db: AsyncSession, model, schema: Type[BaseModel], rows: List[Any], mode: Mode, partial: bool = False
+) -> Dict[str, Any]:
+    """Updates rows by id, with `schema` from update_schema(). Like the
+    single-row PUT endpoints every field is replaced, or with `partial` only
+    the fields present in a row."""
+    table = model.__table__
+    errors: List[Dict[str, Any]] = []
+    valid = validate_rows(schema, rows, errors)
+    if mode == "atomic" and errors:
+        raise BulkError(errors)
+
+    values = [{"index": index, **item.model_dump(exclude_unset=partial)} for index, item in valid]
+
+    def columns(row):
+        return tuple(sorted(key for key in row if key not in ("index", "id")))
+
+    def statement(names, rows):
+        # UPDATE ... SET name = CASE WHEN id = ... END WHERE id IN (...) RETURNING id:
+        # one round trip that reports the ids it found. (UPDATE RETURNING is
+        # not available with executemany.) Later rows win, as they would one by one.
+        ids = [row["id"] for row in rows]
+        if not names:  # Nothing to set; the ids must still exist
+            return select(table.c.id).where(table.c.id.in_(ids))
+        return (
+            update(table)
+            .where(table.c.id.in_(ids))
+            .values({
+                name: case(
+                    *[(table.c.id == row["id"], literal(row[name], table.c[name].type)) for row in reversed(rows)],
+                    else_=table.c[name],
+                )
+                for name in names
+            })
+            .returning(table.c.id)
+        )
+
+    async def execute(db, rows):
+        # One statement per set of updated columns (a single set unless partial)
+        found = set()
+        for names, group in groupby(sorted(rows, key=columns), key=columns):
+            group = list(group)
+            size = max(1, UPDATE_PARAMETERS // (2 * len(names) + 1))
+            for start in range(0, len(group), size):
+                found.update((await db.execute(statement(names, group[start:start + size]))).scalars())
+        # Unknown ids are row errors, not silent no-ops; found by the UPDATE
+        # itself, so a concurrent delete cannot slip in between
+        for row in rows:
+            if row["id"] not in found:
+                errors.append({"index": row["index"], "errors": [{"type": "not_found", "msg": f"No row with id {row['id']}"}]})
+        return [{"index": row["index"], "id": row["id"]} for row in rows if row["id"] in found]
+
+    items = await _write(db, mode, _chunks(values), execute, errors)
+    return _response(mode, len(rows), sorted(items, key=lambda item: item["index"]), errors)
+
+def _response(mode: Mode, total: int, items: List[Dict[str, Any]], errors: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "mode": mode,
+        "succeeded": len(items),
+        "failed": total - len(items),
+        "items": items,
+        "errors": sorted(errors, key=lambda error: error["index"]),
+    }
@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+from app.core.config import settings
+
+# Set per request (see app.api.dependencies) to skip the cache entirely
+cache_bypass: ContextVar[bool] = ContextVar("cache_bypass", default=False)
+
+# Request arguments that do not change the completion itself
+IGNORED_KEYS = {"timeout", "stream", "stream_options"}
+
+def to_jsonable(value: Any) -> Any:
+    """Pydantic messages (e.g. ChatCompletionMessage) to plain dicts."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(exclude_none=True)
+    if isinstance(value, dict):
+        return {k: to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    return value
+
+def make_cache_key(request: Dict[str, Any]) -> str:
+    """Canonical hash of model, messages, tool schema and the other parameters."""
+    canonical = {
+        # Tool sets carry their schema pre-serialized (see agent_tools.ToolSchemaList)
+        k: getattr(v, "json_payload", None) or to_jsonable(v)
+        for k, v in request.items() if k not in IGNORED_KEYS
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class CompletionCache:
+    """Exact-match completion cache: bounded in-memory LRU with TTL, optionally
+    backed by SQLite so entries survive a restart. SQLite reads and writes run
+    on a worker thread, never on the event loop."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value, tag)
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completion_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, tag TEXT)"
+            )
+            # Files written before entries were tagged
+            if "tag" not in {row[1] for row in self._db.execute("PRAGMA table_info(completion_cache)")}:
+                self._db.execute("ALTER TABLE completion_cache ADD COLUMN tag TEXT")
+            self._db.execute("DELETE FROM completion_cache WHERE expires_at < ?", (time.time(),))
+
+    def _execute(self, sql: str, params=()):
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        if self._db is not None:
+            rows = await asyncio.to_thread(
+                self._execute,
+                "SELECT value, expires_at, tag FROM completion_cache WHERE key = ? AND expires_at >= ?",
+                (key, now),
+            )
+            if rows:
+                value, expires_at, tag = rows[0]
+                with self._lock:
+                    self._store(key, value, expires_at, tag)
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str, tag: Optional[str] = None):
+        """`tag` groups the entries that invalidate() drops together (the agent
+        that made the call)."""
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, value, expires_at, tag)
+        if self._db is not None:
+            await asyncio.to_thread(
+                self._execute,
+                "INSERT OR REPLACE INTO completion_cache (key, value, expires_at, tag) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, tag),
+            )
+
+    def _store(self, key: str, value: str, expires_at: float, tag: Optional[str] = None):
+        self._entries[key] = (expires_at, value, tag)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def invalidate(self, tag: str):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[2] == tag]:
+                del self._entries[key]
+        if self._db is not None:
+            await asyncio.to_thread(self._execute, "DELETE FROM completion_cache WHERE tag = ?", (tag,))
+
+    async def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            await asyncio.to_thread(self._execute, "DELETE FROM completion_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self._db is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+completion_cache = CompletionCache(
+    max_entries=settings.COMPLETION_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.COMPLETION_CACHE_TTL_SECONDS,
+    path=settings.COMPLETION_CACHE_PATH,
+) if settings.COMPLETION_CACHE_ENABLED else None
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+
+Message = Dict[str, Any]
+
+#############
+# History compaction
+#############
+
+def split_turns(messages: List[Message]) -> List[List[Message]]:
+    """Groups a history into turns, each starting at a user message, so an
+    assistant tool call is never separated from its tool results."""
+    turns: List[List[Message]] = []
+    for message in messages:
+        if message["role"] == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+def summarize_turns(turns: List[List[Message]], max_chars: int) -> str:
+    """Local extractive summary: the user request and the final answer of each
+    old turn, truncated, newest kept when it does not fit."""
+    lines = []
+    for turn in turns:
+        for message in turn:
+            if message["role"] == "system" and message.get("content", "").startswith("Summary of earlier conversation"):
+                lines.append(message["content"].split(":", 1)[1].strip())
+            elif message["role"] in ("user", "assistant") and message.get("content"):
+                lines.append(f"{message['role']}: {message['content'][:200]}")
+    summary = "\n".join(lines)
+    return summary[-max_chars:]
+
+def compact_history(
+    messages: List[Message],
+    max_turns: int = 10,
+    tool_output_turns: int = 2,
+    summary_chars: int = 2000,
+) -> List[Message]:
+    """Keeps the last `max_turns` turns verbatim and folds older ones into a
+    short summary. Tool outputs older than `tool_output_turns` turns are
+    dropped since the answers built on them are kept."""
+    turns = split_turns(messages)
+    old, recent = turns[:-max_turns], turns[-max_turns:]
+
+    compacted: List[Message] = []
+    if old:
+        compacted.append({
+            "role": "system",
+            "content": "Summary of earlier conversation: " + summarize_turns(old, summary_chars),
+        })
+    for index, turn in enumerate(recent):
+        if len(recent) - index > tool_output_turns:
+            # Drop the tool round trips, keep what the user asked and was told
+            turn = [m for m in turn if m["role"] != "tool" and not m.get("tool_calls")]
+        compacted.extend(turn)
+    return compacted
+
+#############
+# Stores
+#############
+
+class ConversationStore(ABC):
+    """Server-side conversation history keyed by conversation id."""
+
+    @abstractmethod
+    async def get(self, conversation_id: str) -> Optional[List[Message]]:
+        ...
+
+    @abstractmethod
+    async def save(self, conversation_id: str, messages: List[Message]):
+        ...
+
+    @abstractmethod
+    async def delete(self, conversation_id: str) -> bool:
+        ...
+
+class MemoryConversationStore(ConversationStore):
+    """In-process LRU with TTL (per worker; lost on restart)."""
+
+    def __init__(self, max_conversations: int = 10000, ttl_seconds: float = 3600):
+        self.max_conversations = max_conversations
+        self.ttl_seconds = ttl_seconds
+        self._conversations: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (expires_at, messages)
+
+    async def get(self, conversation_id: str) -> Optional[List[Message]]:
+        entry = self._conversations.get(conversation_id)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del self._conversations[conversation_id]
+            return None
+        self._conversations.move_to_end(conversation_id)
+        return list(entry[1])
+
+    async def save(self, conversation_id: str, messages: List[Message]):
+        self._conversations[conversation_id] = (time.time() + self.ttl_seconds, messages)
+        self._conversations.move_to_end(conversation_id)
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+
+    async def delete(self, conversation_id: str) -> bool:
+        return self._conversations.pop(conversation_id, None) is not None
+
+class SQLiteConversationStore(ConversationStore):
+    """Durable local store; queries run on a worker thread."""
+
+    def __init__(self, path: str, ttl_seconds: float = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS conversations "
+            "(id TEXT PRIMARY KEY, messages TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute("DELETE FROM conversations WHERE expires_at < ?", (time.time(),))
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            return cursor.fetchall(), cursor.rowcount
+
+    async def get(self, conversation_id: str) -> Optional[List[Message]]:
+        rows, _ = await asyncio.to_thread(
+            self._execute,
+            "SELECT messages FROM conversations WHERE id = ? AND expires_at >= ?",
+            (conversation_id, time.time()),
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    async def save(self, conversation_id: str, messages: List[Message]):
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT OR REPLACE INTO conversations (id, messages, expires_at) VALUES (?, ?, ?)",
+            (conversation_id, json.dumps(messages, default=str), time.time() + self.ttl_seconds),
+        )
+
+    async def delete(self, conversation_id: str) -> bool:
+        _, deleted = await asyncio.to_thread(self._execute, "DELETE FROM conversations WHERE id = ?", (conversation_id,))
+        return deleted > 0
+
+def create_conversation_store() -> ConversationStore:
+    if settings.CONVERSATION_STORE == "sqlite":
+        return SQLiteConversationStore(settings.CONVERSATION_STORE_PATH, ttl_seconds=settings.CONVERSATION_TTL_SECONDS)
+    return MemoryConversationStore(
+        max_conversations=settings.CONVERSATION_MAX_SESSIONS,
+        ttl_seconds=settings.CONVERSATION_TTL_SECONDS,
+    )
+
+conversation_store = create_conversation_store()
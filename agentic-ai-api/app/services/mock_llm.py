@@ -0,0 +1,171 @@
+import asyncio
+import json
+import random
+import re
+import time
+from itertools import count
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from app.core.config import settings
+from app.services.token_budget import count_prompt_tokens, count_tokens, message_field
+
+#############
+# Offline completion backend
+#############
+# Drop-in replacement for AsyncOpenAI (only chat.completions.create is used)
+# that replays scripted responses, tool calls included, after a simulated
+# latency. Selected with LLM_BACKEND=mock.
+#
+# Script format (MOCK_LLM_SCRIPT, JSON):
+#   {
+#     "latency": {"distribution": "lognormal", "median_ms": 400, "sigma": 0.5},
+#     "rules": [
+#       {"match": "weather", "tool_calls": [{"name": "get_current_weather", "arguments": {"location": "Paris"}}]},
+#       {"match": "weather", "after_tools": true, "content": "It is 22 degrees in Paris."},
+#       {"match": ".*", "content": "Done."}
+#     ]
+#   }
+# Rules are tried in order against the last user message; "after_tools"
+# rules only apply once tool results are in the conversation. A rule whose
+# tool is not offered in the request is skipped.
+
+# Built-in behaviour when no script is given: pick a tool by keyword, then answer
+DEFAULT_RULES = [
+    {"match": r"weather|temperature", "tool_calls": [{"name": "get_current_weather", "arguments": {"location": "Paris"}}]},
+    {"match": r"appointment", "tool_calls": [{"name": "get_appointments", "arguments": {"status": "Pending"}}]},
+    {
+        "match": r"\b(book|reserve|create)\b",
+        "tool_calls": [{
+            "name": "create_reservation",
+            "arguments": {
+                "restaurant_name": "Mock Bistro",
+                "reservation_time": "2030-01-01T19:00:00",
+                "number_of_people": 2,
+                "budget": 100.0,
+            },
+        }],
+    },
+    {"match": r"reservation", "tool_calls": [{"name": "get_reservations", "arguments": {}}]},
+    {"match": r".*", "after_tools": True, "content": "Here is what I found based on the tool results."},
+    {"match": r".*", "content": "This is a mock answer."},
+]
+
+class LatencyModel:
+    def __init__(self, distribution: str = "lognormal", median_ms: float = 300, sigma: float = 0.5, seed: Optional[int] = None):
+        self.distribution = distribution
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.random = random.Random(seed)
+
+    def sample(self) -> float:
+        """Seconds."""
+        if self.distribution == "fixed":
+            ms = self.median_ms
+        elif self.distribution == "uniform":
+            # sigma is the relative half-width around the median
+            ms = self.random.uniform(self.median_ms * (1 - self.sigma), self.median_ms * (1 + self.sigma))
+        else:
+            ms = self.random.lognormvariate(0, self.sigma) * self.median_ms
+        return max(ms, 0) / 1000
+
+class MockCompletions:
+    def __init__(self, rules: List[Dict[str, Any]], latency: LatencyModel):
+        self.rules = [{**rule, "pattern": re.compile(rule.get("match", ".*"), re.IGNORECASE)} for rule in rules]
+        self.latency = latency
+        self._ids = count(1)
+        self.calls = 0
+
+    def _respond(self, messages: List[Any], tools) -> Dict[str, Any]:
+        roles = [message_field(m, "role") for m in messages]
+        last_user = next((message_field(m, "content") or "" for m in reversed(messages) if message_field(m, "role") == "user"), "")
+        # Tool results of the current turn are what follow the last user message
+        current_turn = roles[len(roles) - roles[::-1].index("user"):] if "user" in roles else roles
+        after_tools = "tool" in current_turn
+        offered = {tool["function"]["name"] for tool in tools or []}
+
+        for rule in self.rules:
+            if bool(rule.get("after_tools")) != after_tools or not rule["pattern"].search(last_user):
+                continue
+            if rule.get("tool_calls"):
+                if after_tools or not all(call["name"] in offered for call in rule["tool_calls"]):
+                    continue
+                return {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [
+                        {
+                            "id": f"call_mock_{next(self._ids)}",
+                            "type": "function",
+                            "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))},
+                        }
+                        for call in rule["tool_calls"]
+                    ],
+                }
+            return {"role": "assistant", "content": rule.get("content", "")}
+        return {"role": "assistant", "content": ""}
+
+    async def create(self, model: str, messages: List[Any], tools=None, tool_choice=None, stream: bool = False, stream_options=None, **kwargs):
+        self.calls += 1
+        message = self._respond(messages, tools if tool_choice != "none" else None)
+        if tool_choice == "none":
+            message = {"role": "assistant", "content": message.get("content") or "This is a mock answer."}
+        prompt_tokens = count_prompt_tokens(messages, tools)
+        completion_tokens = count_tokens(message.get("content")) + sum(
+            count_tokens(call["function"]["arguments"]) for call in message.get("tool_calls") or []
+        )
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        completion_id = f"chatcmpl-mock-{next(self._ids)}"
+
+        await asyncio.sleep(self.latency.sample())
+
+        if stream:
+            return self._stream(completion_id, model, message, usage if (stream_options or {}).get("include_usage") else None)
+
+        return ChatCompletion.model_validate({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "tool_calls" if message.get("tool_calls") else "stop", "message": message}],
+            "usage": usage,
+        })
+
+    async def _stream(self, completion_id: str, model: str, message: Dict[str, Any], usage: Optional[Dict[str, int]]):
+        def chunk(delta=None, usage=None):
+            return ChatCompletionChunk.model_validate({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta}] if delta is not None else [],
+                "usage": usage,
+            })
+
+        for index, tool_call in enumerate(message.get("tool_calls") or []):
+            yield chunk({"tool_calls": [{"index": index, **tool_call}]})
+        for word in re.findall(r"\S+\s*", message.get("content") or ""):
+            yield chunk({"content": word})
+            await asyncio.sleep(0)
+        if usage:
+            yield chunk(usage=usage)
+
+class MockLLMClient:
+    def __init__(self, script_path: Optional[str] = None):
+        script = {}
+        if script_path:
+            with open(script_path) as f:
+                script = json.load(f)
+        latency = script.get("latency", {})
+        self.chat = SimpleNamespace(completions=MockCompletions(
+            script.get("rules", DEFAULT_RULES),
+            LatencyModel(
+                distribution=latency.get("distribution", settings.MOCK_LLM_LATENCY_DISTRIBUTION),
+                median_ms=latency.get("median_ms", settings.MOCK_LLM_LATENCY_MS),
+                sigma=latency.get("sigma", settings.MOCK_LLM_LATENCY_SIGMA),
+                seed=latency.get("seed", settings.MOCK_LLM_SEED),
+            ),
+        ))
+
+    async def close(self):
+        pass
@@ -1,21 +1,31 @@
-from uuid import uuid4
-import uuid
 import openai
-from openai import OpenAI
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
 import requests
 from fastapi import HTTPException, Depends
 from typing import Any, Optional, List, Dict
-from app.api.endpoints.medicare import get_appointments, AppointmentResponse, AppointmentCreate, Appointment
 from app.core.config import Settings
 from functools import lru_cache
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from datetime import date
+from dataclasses import dataclass
+from app.core.openai_client import get_openai_client
+from app.core.timing import record_stage, timed
+from app.core.logging_config import logger
+from app.core.tracing import span
+from app.core.metrics import cache_requests, current_agent, errors, openai_request_duration, record_token_usage, tool_duration
+from app.services.agent_tools import TOOL_SETS, WRITE_TOOLS, ToolSet, ToolArgumentsError, compact_json, render_result
+from app.services.completion_cache import completion_cache, cache_bypass, make_cache_key, to_jsonable
+from app.services.semantic_cache import get_semantic_cache, semantic_caches
+from app.services.conversation_store import conversation_store, compact_history
+from app.services.token_budget import TokenStats, pack_messages, token_stats
+from app.services.single_flight import completion_flights, coalesce_scope
+from app.services.rate_limiter import DeadlineExceeded, completion_scheduler
+from uuid import uuid4
 import json
+import time
+import asyncio
+import contextvars
 import base64
-from app.services.reservations import create_reservation, get_reservations  
-from app.schemas.reservations import ReservationCreate, ReservationResponse 
+from concurrent.futures import ThreadPoolExecutor
 
 @lru_cache()
 def get_settings():
@@ -23,631 +33,536 @@ def get_settings():
 
 settings = get_settings()
 
-client = OpenAI(
-    api_key=settings.OPENAI_API_KEY  # Use the API key from settings
-)
-
-# BaseModel for the JSON output
-
-# OpenAI Chat Completion
-def complete_chat(message: str):
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an assistant."},
-                {"role": "user", "content": message},
-            ],
-        )
-        print(f"AI Response: {response}")
-        return response
-    except Exception as e:
-        # Handle exceptions
-        print("An error occurred:", e)
-        return None
+def tool_call_names(message) -> List[str]:
+    message = to_jsonable(message)
+    return [tool_call["function"]["name"] for tool_call in message.get("tool_calls") or []]
+
+def is_cacheable_request(kwargs) -> bool:
+    if kwargs.get("stream") or cache_bypass.get():
+        return False
+    return not any(name in WRITE_TOOLS for message in kwargs["messages"] for name in tool_call_names(message))
+
+def is_cacheable_response(completion) -> bool:
+    return not any(name in WRITE_TOOLS for name in tool_call_names(completion.choices[0].message))
+
+# Every completion goes through here so the shared async client (and its
+# connection pool) is used and each call gets its own timeout. A `deadline`
+# (time.monotonic()) caps each attempt's timeout and the scheduler's queueing
+# and retries; past it DeadlineExceeded is raised.
+async def create_chat_completion(timeout: Optional[float] = None, deadline: Optional[float] = None, **kwargs):
+    # Fit the prompt into the context budget before anything else sees it
+    kwargs["messages"], estimated_tokens, tokens_saved = pack_messages(
+        kwargs["messages"],
+        settings.CONTEXT_TOKEN_BUDGET,
+        tools=kwargs.get("tools"),
+        tool_output_tokens=settings.CONTEXT_TOOL_OUTPUT_TOKENS,
+    )
+    stats = token_stats.get()
+    if stats is not None:
+        stats.calls += 1
+        stats.estimated_prompt_tokens += estimated_tokens
+        stats.tokens_saved += tokens_saved
+
+    cache_key = None
+    if completion_cache is not None and is_cacheable_request(kwargs):
+        cache_key = make_cache_key(kwargs)
+        cached = await completion_cache.get(cache_key)
+        cache_requests.inc(cache="completion", result="miss" if cached is None else "hit")
+        if cached is not None:
+            return ChatCompletion.model_validate_json(cached)
+
+    client = get_openai_client()
+
+    # Queued by priority within the RPM/TPM budget, retried with jittered backoff
+    reserved_tokens = estimated_tokens + (kwargs.get("max_tokens") or settings.SCHEDULER_COMPLETION_TOKENS)
+
+    model, agent = kwargs.get("model"), current_agent.get()
+
+    async def request():
+        # One attempt; the scheduler retries
+        started = time.perf_counter()
+        attempt_timeout = timeout or settings.OPENAI_TIMEOUT
+        if deadline is not None:
+            attempt_timeout = min(attempt_timeout, deadline - time.monotonic())
+        try:
+            with span("openai.chat.completions", model=model, stream=bool(kwargs.get("stream"))):
+                return await client.chat.completions.create(timeout=attempt_timeout, **kwargs)
+        except Exception as e:
+            errors.inc(component="openai", type=type(e).__name__)
+            raise
+        finally:
+            openai_request_duration.observe(time.perf_counter() - started, model=model, agent=agent)
+
+    async def call():
+        # Includes the scheduler queue and retries
+        with timed("llm"), span("llm.call", model=model, agent=agent, prompt_tokens=estimated_tokens):
+            completion = await completion_scheduler.run(request, reserved_tokens, deadline=deadline)
+        if kwargs.get("stream"):
+            return settle_stream(completion)
+        if getattr(completion, "usage", None):
+            completion_scheduler.record_usage(reserved_tokens, completion.usage.total_tokens)
+            record_token_usage(model, completion.usage)
+        return completion
+
+    async def settle_stream(chunks):
+        # The usage comes with the last chunk (stream_options.include_usage)
+        async for chunk in chunks:
+            if getattr(chunk, "usage", None):
+                completion_scheduler.record_usage(reserved_tokens, chunk.usage.total_tokens)
+                record_token_usage(model, chunk.usage)
+            yield chunk
+
+    # Identical in-flight calls share one round trip
+    scope = coalesce_scope.get()
+    if scope is not None and not kwargs.get("stream"):
+        completion = await completion_flights.do(cache_key or make_cache_key(kwargs), call, scope)
+    else:
+        completion = await call()
+
+    if stats is not None and getattr(completion, "usage", None):
+        stats.prompt_tokens += completion.usage.prompt_tokens
+        stats.completion_tokens += completion.usage.completion_tokens
+    if cache_key is not None and is_cacheable_response(completion):
+        await completion_cache.set(cache_key, completion.model_dump_json(), tag=agent)
+    return completion
 
 #############
-# Agent 3
+# Agent events
 #############
-# Agent function to process messages and call OpenAI API
-async def process_agent3(custom_message: str):
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "get_current_weather",
-                "description": "Get the current weather in a given location",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "location": {
-                            "type": "string",
-                            "description": "The city and state, e.g., San Francisco, CA",
-                        },
-                        "unit": {
-                            "type": "string",
-                            "enum": ["celsius", "fahrenheit"],
-                        },
-                    },
-                    "required": ["location"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "get_appointments",
-                "description": "Retrieve medical appointments with optional filters such as status",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "status": {
-                            "type": "string",
-                            "description": "Filter appointments by status, e.g., Pending",
-                        },
-                    },
-                    "required": [],
-                },
-            },
-        },
-    ]
-
-    # Function definitions for weather retrieval
-    def get_current_weather(location: str, unit: str = "fahrenheit"):
-        """Get the current weather in a given location."""
-        if "tokyo" in location.lower():
-            return json.dumps({"location": "Tokyo", "temperature": 10, "unit": unit})
-        elif "san francisco" in location.lower():
-            return json.dumps({"location": "San Francisco", "temperature": 72, "unit": unit})
-        elif "paris" in location.lower():
-            return json.dumps({"location": "Paris", "temperature": 22, "unit": unit})
-        else:
-            return json.dumps({"location": location, "temperature": "unknown"})
-
-    def fetch_appointments(
-        patient_id: str = None,
-        status: str = None,
-        type: str = None,
-        scheduled_date: Optional[date] = None,
-        skip: int = 0,
-        limit: int = 10,
-    ) -> List[dict]:
-        """Wrapper function to fetch appointments and ensure JSON serialization."""
-        
-        # Manually get a database session
-        db: Session = next(get_db())
-        try:
-            # Call the get_appointments function (assuming it exists)
-            appointments = get_appointments(
-                patient_id=patient_id,
-                status=status,
-                type=type,
-                scheduled_date=scheduled_date,
-                skip=skip,
-                limit=limit,
-                db=db,  # Pass the database session
+# Agents report their progress as events ({"event": ..., "data": ...}) so the
+# endpoints can either stream them to the client (SSE) or just wait for the
+# final "done" event.
+
+async def completion_events(stream: bool = False, **kwargs):
+    """Runs a completion, yielding "token" events as they arrive when streaming."""
+    if not stream:
+        completion = await create_chat_completion(**kwargs)
+        yield {"event": "done", "data": {"content": completion.choices[0].message.content}}
+        return
+
+    response = await create_chat_completion(stream=True, stream_options={"include_usage": True}, **kwargs)
+    parts = []
+    async for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield {"event": "token", "data": {"content": chunk.choices[0].delta.content}}
+    yield {"event": "done", "data": {"content": "".join(parts)}}
+
+async def turn_events(stream: bool = False, **kwargs):
+    """One model turn of the agent loop. Streams "token" events when asked and
+    ends with an internal "message" event carrying the assembled assistant
+    message and its usage."""
+    if not stream:
+        completion = await create_chat_completion(**kwargs)
+        yield {"event": "message", "data": {"message": completion.choices[0].message, "usage": completion.usage}}
+        return
+
+    response = await create_chat_completion(stream=True, stream_options={"include_usage": True}, **kwargs)
+    parts, tool_calls, usage = [], {}, None
+    async for chunk in response:
+        usage = chunk.usage or usage
+        stats = token_stats.get()
+        if chunk.usage and stats is not None:
+            stats.prompt_tokens += chunk.usage.prompt_tokens
+            stats.completion_tokens += chunk.usage.completion_tokens
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            parts.append(delta.content)
+            yield {"event": "token", "data": {"content": delta.content}}
+        # Tool calls arrive in fragments, keyed by index
+        for fragment in delta.tool_calls or []:
+            tool_call = tool_calls.setdefault(
+                fragment.index, {"id": None, "type": "function", "function": {"name": "", "arguments": ""}}
             )
-            
-            # Convert to JSON serializable format using Pydantic models
-            return [AppointmentResponse.from_orm(appointment).dict() for appointment in appointments]
-        finally:
-            # Ensure the session is closed
-            db.close()
-
+            tool_call["id"] = fragment.id or tool_call["id"]
+            if fragment.function and fragment.function.name:
+                tool_call["function"]["name"] += fragment.function.name
+            if fragment.function and fragment.function.arguments:
+                tool_call["function"]["arguments"] += fragment.function.arguments
+
+    message = ChatCompletionMessage.model_validate({
+        "role": "assistant",
+        "content": "".join(parts) or None,
+        "tool_calls": [tool_calls[index] for index in sorted(tool_calls)] or None,
+    })
+    yield {"event": "message", "data": {"message": message, "usage": usage}}
+
+@dataclass(frozen=True)
+class Agent:
+    name: str
+    tool_set: ToolSet
+    system_prompt: str = "You are a helpful assistant."
+    # Ask the user for missing required arguments instead of failing the tool call
+    ask_for_missing: bool = False
+    # Start a server-side conversation when the client does not pass one
+    sessions: bool = False
+    # Loop budgets; None falls back to the AGENT_MAX_* settings
+    max_steps: Optional[int] = None
+    max_tokens: Optional[int] = None
+    max_seconds: Optional[float] = None
+
+AGENTS: Dict[str, Agent] = {
+    "agent3": Agent("agent3", TOOL_SETS["appointments"]),
+    "agent4": Agent("agent4", TOOL_SETS["reservations"]),
+    # Agent 5: Conversation Chain
+    "agent5": Agent("agent5", TOOL_SETS["reservations"], ask_for_missing=True, sessions=True),
+}
+
+def missing_arguments_message(error: ToolArgumentsError) -> str:
+    properties = error.tool.parameters["properties"]
+    return " ".join(
+        f"I need more information: {properties.get(param, {}).get('description', param).rstrip('.')}."
+        for param in error.missing
+    )
+
+async def save_conversation(conversation_id: str, history: List[dict], new_messages: List[Any], answer: Optional[str]):
+    messages = history + to_jsonable(new_messages) + [{"role": "assistant", "content": answer}]
+    await conversation_store.save(conversation_id, compact_history(
+        messages,
+        max_turns=settings.CONVERSATION_MAX_TURNS,
+        tool_output_turns=settings.CONVERSATION_TOOL_OUTPUT_TURNS,
+        summary_chars=settings.CONVERSATION_SUMMARY_CHARS,
+    ))
+
+async def invalidate_reads(tool_names):
+    """A write tool succeeded: drops the cached answers (semantic and
+    completion cache) of every agent that can call it, as their reads may
+    now return something else."""
+    for agent in AGENTS.values():
+        if any(name in agent.tool_set.by_name for name in tool_names):
+            if agent.name in semantic_caches:
+                semantic_caches[agent.name].clear()
+            if completion_cache is not None:
+                await completion_cache.invalidate(agent.name)
+
+async def agent_events(agent: Agent, custom_message: str, stream: bool = False, conversation_id: Optional[str] = None):
+    """ReAct-style loop: the model calls tools until it answers without asking
+    for one, or until the step, token or wall-clock budget runs out."""
+    tool_set = agent.tool_set
+    max_steps = agent.max_steps or settings.AGENT_MAX_STEPS
+    max_tokens = agent.max_tokens or settings.AGENT_MAX_TOKENS
+    max_seconds = agent.max_seconds or settings.AGENT_MAX_SECONDS
+    current_agent.set(agent.name)
+
+    # Prior turns of the conversation, already compacted
+    history = []
+    if conversation_id is None and agent.sessions:
+        conversation_id = str(uuid4())
+    if conversation_id is not None:
+        history = await conversation_store.get(conversation_id) or []
+        yield {"event": "metadata", "data": {"conversation_id": conversation_id}}
+    messages = [{"role": "system", "content": agent.system_prompt}, *history, {"role": "user", "content": custom_message}]
+    new_messages_start = len(messages) - 1
+
+    # Answers only carry over between prompts without prior context
+    semantic_cache = get_semantic_cache(agent.name) if not cache_bypass.get() and not history else None
+    match = semantic_cache.lookup(custom_message) if semantic_cache else None
+    if semantic_cache:
+        cache_requests.inc(cache="semantic", result="hit" if match else "miss")
+
+    if match:
+        yield {
+            "event": "metadata",
+            "data": {"semantic_cache": {"cache_id": match.cache_id, "similarity": match.similarity}},
+        }
+        # A near-duplicate prompt was answered already
+        if conversation_id is not None:
+            await save_conversation(conversation_id, history, messages[new_messages_start:], match.answer)
+        if stream:
+            yield {"event": "token", "data": {"content": match.answer}}
+        yield {"event": "done", "data": {"content": match.answer}}
+        return
+
+    started = time.perf_counter()
+    deadline = time.monotonic() + max_seconds
+    stats = TokenStats()
+    token_stats.set(stats)
+    steps = 0
+    used_write_tool = False
+    answer, stop_reason = None, None
+    response_path = "model"  # "direct" when a tool result is rendered locally, "partial" when out of budget
+
+    while True:
+        # Time first: out of time, the step limit's closing completion is skipped too
+        if time.monotonic() >= deadline:
+            stop_reason = "max_seconds"
+        elif stats.prompt_tokens + stats.completion_tokens >= max_tokens:
+            stop_reason = "max_tokens"
+        elif steps >= max_steps:
+            stop_reason = "max_steps"
+        if stop_reason:
+            break
+
+        steps += 1
+        yield {"event": "step", "data": {"step": steps}}
 
-    # Function to handle function calls
-    def call_function(name, args):
-        """Routes the function calls to their corresponding implementations."""
-        if name == "get_current_weather":
-            return get_current_weather(**args)
-        elif name == "get_appointments":
-            return fetch_appointments(**args)
-        return json.dumps({"error": f"Function {name} not found."})
-
-    # Agent Function to interact with OpenAI API and handle responses
-    # Agent Function
-    try:
-        # Step 1: Call the OpenAI API with the initial user message and tools
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": custom_message},
-        ]
-        
-        completion = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            tools=tools,
-            tool_choice="auto",
-        )
-
-        # Debugging output (optional)
-        # print("*DEBUG Start*:", completion.choices[0].message)
-        
-        # Step 2: Handle each tool call in the response
-        tool_calls = completion.choices[0].message.tool_calls if completion.choices[0].message.tool_calls else []
-        
+        try:
+            with span("agent.turn", agent=agent.name, step=steps):
+                async for event in turn_events(
+                    stream,
+                    model="gpt-3.5-turbo",
+                    messages=messages,
+                    tools=tool_set.schemas,
+                    tool_choice="auto",
+                    deadline=deadline,
+                ):
+                    if event["event"] != "message":
+                        yield event
+                        continue
+                    assistant_message = event["data"]["message"]
+        except DeadlineExceeded:
+            # Queued, retrying or waiting on the model until the time ran out
+            stop_reason = "max_seconds"
+            break
+
+        # No tool requested: this is the final answer
+        tool_calls = assistant_message.tool_calls if assistant_message.tool_calls else []
+        if not tool_calls:
+            answer, stop_reason = assistant_message.content, "completed"
+            break
+        used_write_tool = used_write_tool or any(tool_call.function.name in WRITE_TOOLS for tool_call in tool_calls)
+
+        # Validate every call's arguments up front (precompiled Pydantic models)
+        calls = []
         for tool_call in tool_calls:
             name = tool_call.function.name
-            args = json.loads(tool_call.function.arguments)
-            
-            result = call_function(name, args)
-            
-            # Debugging output (optional)
-            # print("*DEBUG Start*:", result, "*DEBUG End*")
-            
-            messages.append(completion.choices[0].message)
+            args, error = None, None
+            try:
+                args = tool_set.parse_arguments(name, tool_call.function.arguments)
+            except KeyError:
+                error = json.dumps({"error": f"Function {name} not found."})
+            except ToolArgumentsError as e:
+                if agent.ask_for_missing and e.missing:
+                    # Stop and ask the user for more information instead
+                    answer, stop_reason = missing_arguments_message(e), "needs_input"
+                    break
+                error = json.dumps({"error": f"Invalid arguments for {name}."})
+            yield {
+                "event": "tool_selected",
+                "data": {
+                    "tool_call_id": tool_call.id,
+                    "name": name,
+                    "arguments": args.model_dump(mode="json") if args is not None else None,
+                },
+            }
+            calls.append((tool_call, args, error))
+        if stop_reason:
+            break
+
+        # Independent tool calls of a turn run concurrently
+        for tool_call, args, error in calls:
+            yield {"event": "tool_started", "data": {"tool_call_id": tool_call.id, "name": tool_call.function.name}}
+        results, statuses = {}, {}
+        with span("agent.tools", agent=agent.name, step=steps, calls=len(calls)):
+            for finished in asyncio.as_completed([run_tool(tool_set, tool_call, args, error) for tool_call, args, error in calls]):
+                tool_call, result, status, elapsed_ms = await finished
+                results[tool_call.id] = result
+                statuses[tool_call.id] = status
+                yield {
+                    "event": "tool_finished",
+                    "data": {
+                        "tool_call_id": tool_call.id,
+                        "name": tool_call.function.name,
+                        "status": status,
+                        "elapsed_ms": elapsed_ms,
+                    },
+                }
+
+        written = {
+            tool_call.function.name for tool_call, args, error in calls
+            if tool_call.function.name in WRITE_TOOLS and statuses[tool_call.id] == "ok"
+        }
+        if written:
+            await invalidate_reads(written)
+
+        # One assistant message per turn, then its results in the original
+        # tool_call_id order
+        messages.append(assistant_message)
+        for tool_call, args, error in calls:
+            result = results[tool_call.id]
             messages.append({
                 "role": "tool",
                 "tool_call_id": tool_call.id,
-                "content": result
+                "content": result if isinstance(result, str) else compact_json(result),
             })
 
-        # Step 3: Make a second API call with the updated messages
-        completion_2 = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            tools=tools,
+        # A plain lookup (the first turn, one tool call) whose tool opted into
+        # direct responses and succeeded: render the answer locally instead of
+        # asking the model to phrase it. This ends the loop, so later turns
+        # and multi-call turns always go back to the model, which may chain
+        # further steps.
+        answer = direct_answer(tool_set, calls, results, statuses) if steps == 1 and len(calls) == 1 else None
+        if answer is not None:
+            stop_reason, response_path = "completed", "direct"
+            if stream:
+                yield {"event": "token", "data": {"content": answer}}
+            break
+
+    if answer is None and stop_reason == "max_steps" and time.monotonic() >= deadline:
+        stop_reason = "max_seconds"
+    if answer is None and stop_reason == "max_steps":
+        # Out of steps: one last completion without tools so the model answers
+        # with what it has gathered so far, within the remaining time
+        try:
+            async for event in turn_events(
+                stream,
+                model="gpt-3.5-turbo",
+                messages=messages,
+                tools=tool_set.schemas,
+                tool_choice="none",
+                deadline=deadline,
+            ):
+                if event["event"] != "message":
+                    yield event
+                    continue
+                answer = event["data"]["message"].content
+        except DeadlineExceeded:
+            stop_reason = "max_seconds"
+    if answer is None and stop_reason in ("max_seconds", "max_tokens"):
+        # No time or tokens left for another completion: answer with what the
+        # tools returned so far
+        answer, response_path = partial_answer(messages, stop_reason), "partial"
+        if stream:
+            yield {"event": "token", "data": {"content": answer}}
+
+    if semantic_cache and stop_reason == "completed" and not used_write_tool:
+        semantic_cache.add(custom_message, answer)
+
+    if conversation_id is not None:
+        await save_conversation(conversation_id, history, messages[new_messages_start:], answer)
+
+    yield {
+        "event": "metadata",
+        "data": {
+            "agent": {
+                "steps": steps,
+                "stop_reason": stop_reason,
+                "response_path": response_path,
+                "tokens": stats.as_dict(),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            },
+        },
+    }
+    yield {"event": "done", "data": {"content": answer}}
+
+def partial_answer(messages: List[Any], stop_reason: str) -> str:
+    """The results of the last tool turn, for a run stopped by its time or
+    token budget."""
+    results = []
+    for message in reversed(messages):
+        if not isinstance(message, dict) or message["role"] != "tool":
+            break
+        results.insert(0, message["content"])
+    budget = "time" if stop_reason == "max_seconds" else "tokens"
+    if not results:
+        return f"I ran out of {budget} before I could answer."
+    return f"I ran out of {budget} before finishing. What I found so far:\n" + "\n".join(results)
+
+def direct_answer(tool_set: ToolSet, calls, results: Dict[str, Any], statuses: Dict[str, str]) -> Optional[str]:
+    if not settings.AGENT_DIRECT_RESPONSES:
+        return None
+    tools = [tool_set.by_name.get(tool_call.function.name) for tool_call, args, error in calls]
+    if not all(tool is not None and tool.direct_template for tool in tools):
+        return None
+    if any(statuses[tool_call.id] != "ok" for tool_call, args, error in calls):
+        return None
+    try:
+        return "\n\n".join(
+            render_result(tool.direct_template, results[tool_call.id], tool.direct_placeholders)
+            for tool, (tool_call, args, error) in zip(tools, calls)
         )
-
-        # Return the final response from the second API call
-        return completion_2.choices[0].message.content
-
-    except Exception as e:
-        # Handle exceptions
-        print("An error occurred:", e)
+    except (ValueError, TypeError):
+        # Not what the template expects (e.g. an error payload): let the model answer
         return None
 
-#############
-# Agent 4
-#############
-# Agent function to process messages and call OpenAI API
-async def process_agent4(custom_message: str):
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "get_current_weather",
-                "description": "Get the current weather in a given location",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "location": {
-                            "type": "string",
-                            "description": "The city and state, e.g., San Francisco, CA",
-                        },
-                        "unit": {
-                            "type": "string",
-                            "enum": ["celsius", "fahrenheit"],
-                        },
-                    },
-                    "required": ["location"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "get_reservations",
-                "description": "Retrieve all the reservations details",
-                "parameters": {
-                    "type": "object",
-                    "properties": {},
-                    "required": [],
-                },
-            },
-        },
-        {
-        "type": "function",
-        "function": {
-            "name": "create_reservation",
-            "description": "Create reservation order",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "integer",
-                        "description": "The ID of the user making the reservation.",
-                    },
-                    "restaurant_name": {
-                        "type": "string",
-                        "description": "Name of the restaurant.",
-                    },
-                    "reservation_time": {
-                        "type": "string",
-                        "format": "date-time",  # Use ISO 8601 format
-                        "description": "Date and time of the reservation in ISO 8601 format.",
-                    },
-                    "number_of_people": {
-                        "type": "integer",
-                        "description": "Number of people for the reservation.",
-                    },
-                    "budget": {
-                        "type": "number",
-                        "format": 'float',
-                        'description': 'Budget for the reservation.',
-                    },
-                    # Optional status field
-                    'status': {
-                        'type': 'string',
-                        'enum': ['pending', 'confirmed', 'canceled'],
-                        'description': 'Status of the reservation.',
-                    }
-                },
-                # Specify required fields
-                'required': ['user_id', 'restaurant_name', 'reservation_time', 'number_of_people', 'budget'],
-            },
-        },
-    },
-    ]
-
-    # Function definitions for weather retrieval
-    def get_current_weather(location: str, unit: str = "fahrenheit"):
-        """Get the current weather in a given location."""
-        if "tokyo" in location.lower():
-            return json.dumps({"location": "Tokyo", "temperature": 10, "unit": unit})
-        elif "san francisco" in location.lower():
-            return json.dumps({"location": "San Francisco", "temperature": 72, "unit": unit})
-        elif "paris" in location.lower():
-            return json.dumps({"location": "Paris", "temperature": 22, "unit": unit})
+# Blocking tools run on a bounded thread pool instead of the event loop; async
+# ones (the database tools) run on the loop directly.
+tool_executor = ThreadPoolExecutor(max_workers=settings.TOOL_MAX_WORKERS, thread_name_prefix="agent-tool")
+
+async def run_tool(tool_set: ToolSet, tool_call, args, error: Optional[str] = None):
+    """Runs one tool call with its own timeout; a failing tool only fails itself."""
+    name = tool_call.function.name
+    started = time.perf_counter()
+    status = "ok"
+    with span(f"tool {name}", tool=name) as tool_span:
+        if error is not None:
+            result, status = error, "error"
         else:
-            return json.dumps({"location": location, "temperature": "unknown"})
+            tool = tool_set.by_name.get(name)
+            try:
+                if tool is not None and asyncio.iscoroutinefunction(tool.handler):
+                    call = tool_set.call(name, args)
+                else:
+                    loop = asyncio.get_running_loop()
+                    context = contextvars.copy_context()
+                    call = loop.run_in_executor(tool_executor, context.run, tool_set.call, name, args)
+                result = await asyncio.wait_for(call, timeout=settings.TOOL_TIMEOUT)
+            except asyncio.TimeoutError:
+                result, status = json.dumps({"error": f"Function {name} timed out."}), "timeout"
+            except Exception:
+                logger.exception("Tool failed", extra={"tool": name})
+                result, status = json.dumps({"error": f"Function {name} failed."}), "error"
+        if tool_span is not None:
+            tool_span.set(status=status)
+    elapsed = time.perf_counter() - started
+    record_stage("tool", elapsed)
+    tool_duration.observe(elapsed, tool=name, status=status)
+    if status != "ok":
+        errors.inc(component="tool", type=status)
+    return tool_call, result, status, round(elapsed * 1000, 2)
+
+async def collect_answer(events, meta: Optional[dict] = None):
+    """Drains an event stream and returns the final answer. Metadata events
+    (e.g. semantic cache hits) are merged into `meta` when given."""
+    content = None
+    async for event in events:
+        if event["event"] == "done":
+            content = event["data"]["content"]
+        elif event["event"] == "metadata" and meta is not None:
+            meta.update(event["data"])
+    return content
 
-    def fetch_reservations() -> list[ReservationResponse]:
-        db: Session = next(get_db())  # Get a database session
-        try:
-            print("Accessing Database..")
-            # Fetch all reservations
-            reservations = get_reservations(db)
-            
-            # Convert SQLAlchemy objects to Pydantic models
-            response = [ReservationResponse.from_orm(reservation) for reservation in reservations]
-            
-            # Log the response for debugging
-            print(f"GET, Request Modeling: {response}")
-            
-            return response
-        finally:
-            db.close()  # Ensure the session is closed after use
-
-    def make_reservation(reservation_data: ReservationCreate) -> ReservationResponse:
-        db: Session = next(get_db())  # Get a database session
-        try:
-            print("Accessing Database..")
-            # Create a new reservation
-            new_reservation = create_reservation(db, reservation_data)  # Pass the reservation data
-            
-            # Convert SQLAlchemy object to Pydantic model
-            response = ReservationResponse.from_orm(new_reservation)
-            
-            # Log the response for debugging
-            print(f"POST, Request Modeling: {response}")
-            
-            return response  # Return the newly created reservation
-        finally:
-            db.close()  # Ensure the session is closed after use
-
-    # Function to handle function calls
-    def call_function(name, args):
-        """Routes the function calls to their corresponding implementations."""
-        if name == "get_current_weather":
-            return get_current_weather(**args)
-        elif name == "get_reservations":
-            return fetch_reservations(**args)
-        elif name == "create_reservation":
-            # Predefine user_id statically for testing
-            predefined_user_id = int(str(uuid.uuid4())[:8], 16) % 1000000  # Generate a new UUID
-            
-            # Create an instance of ReservationCreate with predefined user_id and other args
-            reservation_data = ReservationCreate(
-                user_id=predefined_user_id,
-                restaurant_name=args.get('restaurant_name'),
-                reservation_time=args.get('reservation_time'),
-                number_of_people=args.get('number_of_people'),
-                budget=args.get('budget'),
-                status=args.get('status', 'pending')  # Default status if not provided
-            )
-            # # Create an instance of ReservationCreate from args
-            # reservation_data = ReservationCreate(**args)
-            return make_reservation(reservation_data)
-        return json.dumps({"error": f"Function {name} not found."})
+# BaseModel for the JSON output
 
-    # Agent Function to interact with OpenAI API and handle responses
-    # Agent Function
+# OpenAI Chat Completion
+async def complete_chat(message: str):
     try:
-        # Step 1: Call the OpenAI API with the initial user message and tools
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": custom_message},
-        ]
-
-        print("*Parsing Request..*")
-        
-        completion = client.chat.completions.create(
+        response = await create_chat_completion(
             model="gpt-3.5-turbo",
-            messages=messages,
-            tools=tools,
-            tool_choice="auto",
-        )
-
-        # Debugging output (optional)
-        # print("*DEBUG Start*:", completion.choices[0].message)
-        print("Deciding Agent")
-        print("Searching for available tools")
-        # Step 2: Handle each tool call in the response
-        tool_calls = completion.choices[0].message.tool_calls if completion.choices[0].message.tool_calls else []
-        
-        for tool_call in tool_calls:
-            name = tool_call.function.name
-            args = json.loads(tool_call.function.arguments)
-            
-            result = call_function(name, args)
-            
-            # Debugging output (optional)
-            #print("*DEBUG tool_calls Start*:", result, "*DEBUG End*")
-            print("Tool Found")
-            
-            messages.append(completion.choices[0].message)
-            messages.append({
-                "role": "tool",
-                "tool_call_id": tool_call.id,
-                "content": f'{result}'
-            })
-            #print("*DEBUG messages Start*:", messages, "*DEBUG End*")
-            print("Making API Call..")
-            #print("**Considering the restaurant accepted the reservation already, we can check the availability here..**")
-
-        # Step 3: Make a second API call with the updated messages
-        completion_2 = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            tools=tools,
+            messages=[
+                {"role": "system", "content": "You are an assistant."},
+                {"role": "user", "content": message},
+            ],
         )
-        print("*Agent Status*: Successfull")
-        # Return the final response from the second API call
-        return completion_2.choices[0].message.content
-
-    except Exception as e:
+        # Verbose: sampled, and only formatted if it is written
+        logger.debug("AI Response: %s", response, extra={"sampled": True})
+        return response
+    except Exception:
         # Handle exceptions
-        print("An error occurred:", e)
+        logger.exception("Chat completion failed")
         return None
-    
-#############
-# Agent 5: Conversation Chain
-#############
 
-# Initialize a global state for conversation
-conversation_state: Dict[str, Any] = {}
-# Agent function to process messages and call OpenAI API
-async def process_agent5(custom_message: str):
-    
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "get_current_weather",
-                "description": "Get the current weather in a given location",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "location": {
-                            "type": "string",
-                            "description": "The city and state, e.g., San Francisco, CA",
-                        },
-                        "unit": {
-                            "type": "string",
-                            "enum": ["celsius", "fahrenheit"],
-                        },
-                    },
-                    "required": ["location"],
-                },
-            },
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "get_reservations",
-                "description": "Retrieve all the reservations details",
-                "parameters": {
-                    "type": "object",
-                    "properties": {},
-                    "required": [],
-                },
-            },
-        },
-        {
-        "type": "function",
-        "function": {
-            "name": "create_reservation",
-            "description": "Create reservation order",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "user_id": {
-                        "type": "integer",
-                        "description": "The ID of the user making the reservation.",
-                    },
-                    "restaurant_name": {
-                        "type": "string",
-                        "description": "Name of the restaurant.",
-                    },
-                    "reservation_time": {
-                        "type": "string",
-                        "format": "date-time",  # Use ISO 8601 format
-                        "description": "Date and time of the reservation in ISO 8601 format.",
-                    },
-                    "number_of_people": {
-                        "type": "integer",
-                        "description": "Number of people for the reservation.",
-                    },
-                    "budget": {
-                        "type": "number",
-                        "format": 'float',
-                        'description': 'Budget for the reservation.',
-                    },
-                    # Optional status field
-                    'status': {
-                        'type': 'string',
-                        'enum': ['pending', 'confirmed', 'canceled'],
-                        'description': 'Status of the reservation.',
-                    }
-                },
-                # Specify required fields
-                'required': ['restaurant_name', 'reservation_time', 'number_of_people', 'budget'],
-            },
-        },
-    },
-    ]
-    # Initialize conversation state
-    conversation_state = {}
-    # Function definitions for weather retrieval
-    def get_current_weather(location: str, unit: str = "fahrenheit"):
-        """Get the current weather in a given location."""
-        if "tokyo" in location.lower():
-            return json.dumps({"location": "Tokyo", "temperature": 10, "unit": unit})
-        elif "san francisco" in location.lower():
-            return json.dumps({"location": "San Francisco", "temperature": 72, "unit": unit})
-        elif "paris" in location.lower():
-            return json.dumps({"location": "Paris", "temperature": 22, "unit": unit})
-        else:
-            return json.dumps({"location": location, "temperature": "unknown"})
-
-    def fetch_reservations() -> list[ReservationResponse]:
-        db: Session = next(get_db())  # Get a database session
-        try:
-            print("Accessing Database..")
-            # Fetch all reservations
-            reservations = get_reservations(db)
-            
-            # Convert SQLAlchemy objects to Pydantic models
-            response = [ReservationResponse.from_orm(reservation) for reservation in reservations]
-            
-            # Log the response for debugging
-            print(f"GET, Request Modeling: {response}")
-            
-            return response
-        finally:
-            db.close()  # Ensure the session is closed after use
-
-    def make_reservation(reservation_data: ReservationCreate) -> ReservationResponse:
-        db: Session = next(get_db())  # Get a database session
-        try:
-            print("Accessing Database..")
-            # Create a new reservation
-            new_reservation = create_reservation(db, reservation_data)  # Pass the reservation data
-            
-            # Convert SQLAlchemy object to Pydantic model
-            response = ReservationResponse.from_orm(new_reservation)
-            
-            # Log the response for debugging
-            print(f"POST, Request Modeling: {response}")
-            
-            return response  # Return the newly created reservation
-        finally:
-            db.close()  # Ensure the session is closed after use
-
-    # Function to handle function calls
-    def call_function(name, args):
-        """Routes the function calls to their corresponding implementations."""
-        if name == "get_current_weather":
-            return get_current_weather(**args)
-        elif name == "get_reservations":
-            return fetch_reservations(**args)
-        elif name == "create_reservation":
-            # Predefine user_id statically for testing
-            predefined_user_id = int(str(uuid.uuid4())[:8], 16) % 1000000  # Generate a new UUID
-            
-            # Create an instance of ReservationCreate with predefined user_id and other args
-            reservation_data = ReservationCreate(
-                user_id=predefined_user_id,
-                restaurant_name=args.get('restaurant_name'),
-                reservation_time=args.get('reservation_time'),
-                number_of_people=args.get('number_of_people'),
-                budget=args.get('budget'),
-                status=args.get('status', 'pending')  # Default status if not provided
-            )
-            # # Create an instance of ReservationCreate from args
-            # reservation_data = ReservationCreate(**args)
-            return make_reservation(reservation_data)
-        return json.dumps({"error": f"Function {name} not found."})
+async def chat_events(message: str):
+    """Streaming variant of complete_chat."""
+    async for event in completion_events(
+        stream=True,
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": "You are an assistant."},
+            {"role": "user", "content": message},
+        ],
+    ):
+        yield event
 
-    # Agent Function to interact with OpenAI API and handle responses
-    # Agent Function
+# Agent function to process messages and call OpenAI API
+async def process_agent(name: str, custom_message: str, meta: Optional[dict] = None, conversation_id: Optional[str] = None):
     try:
-        messages = [
-            {"role": 'system', 'content': 'You are a helpful assistant.'},
-            {"role": 'user', 'content': custom_message},
-        ]
-
-        while True:
-            print("*Parsing Request..*")
-            
-            completion = client.chat.completions.create(
-                model='gpt-3.5-turbo',
-                messages=messages,
-                tools=tools,
-                tool_choice='auto',
-            )
-
-            print("Deciding Agent")
-            print("Searching for available tools")
-            
-            tool_calls = completion.choices[0].message.tool_calls if completion.choices[0].message.tool_calls else []
-
-            # Iterate through each tool call
-            for tool_call in tool_calls:
-                name = tool_call.function.name
-                args = json.loads(tool_call.function.arguments)
-
-                # Check for missing parameters dynamically
-                required_params = tools[0]['function']['parameters']['required']
-                missing_params = [param for param in required_params if param not in conversation_state or not conversation_state[param]]
-                
-                print("required_params: ", required_params)
-                print("missing_params: ", missing_params)
-
-                if missing_params:
-                    # Respond with missing parameters
-                    for param in missing_params:
-                        description = tools[0]['function']['parameters']['properties'][param]['description']
-                        
-                        # Ask user for each missing parameter
-                        response_message = f"I need more information: {description}."
-                        messages.append({"role": 'assistant', 'content': response_message})
-                        
-                        # Here you would normally wait for user input. IMPLEMENT UserID, and ConversationId to store Conversation Chain.
-                        # For simulation, we can just assume input is provided.
-                        # user_response = await get_user_response(param)  # Replace with actual input handling
-                        
-                        # # Update conversation state with user's response
-                        # conversation_state[param] = user_response
-                        
-                        # Append user's response to messages
-                        # messages.append({"role": 'user', 'content': user_response})
-
-                    # Break out of this loop to retry with updated context
-                    break
-
-                # If no parameters are missing, call the function
-                result = call_function(name, {**args, **conversation_state})
-                
-                messages.append({
-                    'role': 'tool',
-                    'tool_call_id': tool_call.id,
-                    'content': f'{result}'
-                })
-
-            # Step 3: Make a second API call with updated messages
-            completion_2 = client.chat.completions.create(
-                model='gpt-3.5-turbo',
-                messages=messages,
-                tools=tools,
-            )
-            
-            print("*Agent Status*: Successful")
-            
-            # Return final response from second API call
-            return completion_2.choices[0].message.content
-
-    except Exception as e:
-        print("An error occurred:", e)
-        return None
\ No newline at end of file
+        result = await collect_answer(agent_events(AGENTS[name], custom_message, conversation_id=conversation_id), meta)
+        logger.info("Agent finished", extra={"agent": name, **(meta or {}).get("agent", {})})
+        return result
+    except Exception:
+        # Handle exceptions
+        logger.exception("Agent failed", extra={"agent": name})
+        return None
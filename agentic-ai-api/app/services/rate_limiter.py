@@ -0,0 +1,199 @@
+import asyncio
+import heapq
+import random
+import time
+from contextvars import ContextVar
+from itertools import count
+from typing import Any, Awaitable, Callable, Dict, Optional
+import openai
+from app.core.config import settings
+from app.core.metrics import llm_scheduler_failures, llm_scheduler_queue_depth, llm_scheduler_rate_limited, llm_scheduler_retries, llm_scheduler_wait
+
+# Lower runs first. Interactive calls (/openai/ask) go ahead of agent and batch work.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BATCH = 2
+
+request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_DEFAULT)
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and 5xx
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+class DeadlineExceeded(TimeoutError):
+    """The caller's deadline passed while queued, between retries or on the
+    last attempt."""
+
+class TokenBucket:
+    """Continuously refilled bucket holding up to one minute of budget."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        # May go negative when a call used more than estimated: that is debt
+        self.level -= amount
+
+class CompletionScheduler:
+    """Client-side scheduler in front of every completion: keeps calls within
+    the requests-per-minute and tokens-per-minute budget, serves them by
+    priority (FIFO within a priority) and retries transient failures with
+    exponential backoff and full jitter."""
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._queue = []  # heap of (priority, sequence)
+        self._sequence = count()
+        self._condition: Optional[asyncio.Condition] = None
+        self.scheduled = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.max_queue_depth = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    async def acquire(self, tokens: int, priority: int = PRIORITY_DEFAULT, deadline: Optional[float] = None):
+        """Waits for a turn within the budget; `deadline` (time.monotonic())
+        bounds the wait."""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        waiter = (priority, next(self._sequence))
+        enqueued = time.monotonic()
+        async with self._condition:
+            heapq.heappush(self._queue, waiter)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            try:
+                while True:
+                    wait = None
+                    if self._queue[0] == waiter:
+                        wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                        if wait <= 0:
+                            self.requests.consume(1)
+                            self.tokens.consume(tokens)
+                            heapq.heappop(self._queue)
+                            break
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or (wait is not None and wait >= remaining):
+                            raise DeadlineExceeded("Deadline passed while queued")
+                        wait = remaining if wait is None else wait
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if waiter in self._queue:
+                    self._queue.remove(waiter)
+                    heapq.heapify(self._queue)
+                raise
+            finally:
+                # The next waiter may now be at the head
+                self._condition.notify_all()
+
+        waited = time.monotonic() - enqueued
+        self.scheduled += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        llm_scheduler_wait.observe(waited, priority=str(priority))
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        # Honour Retry-After when the API sends one
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def run(
+        self, fn: Callable[[], Awaitable[Any]], tokens: int, priority: Optional[int] = None, deadline: Optional[float] = None
+    ) -> Any:
+        """Runs `fn` (one attempt) when the budget allows, retrying transient
+        errors. With a `deadline` (time.monotonic()) it neither queues, backs
+        off nor retries past it and raises DeadlineExceeded instead."""
+        priority = request_priority.get() if priority is None else priority
+        attempt = 0
+        while True:
+            await self.acquire(tokens, priority, deadline)
+            try:
+                return await fn()
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, openai.RateLimitError):
+                    self.rate_limited += 1
+                    llm_scheduler_rate_limited.inc()
+                delay = self.backoff(attempt, e)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    self.failures += 1
+                    llm_scheduler_failures.inc()
+                    raise DeadlineExceeded("No time left to retry") from e
+                if attempt >= self.max_retries:
+                    self.failures += 1
+                    llm_scheduler_failures.inc()
+                    raise
+                self.retries += 1
+                llm_scheduler_retries.inc(error=type(e).__name__)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Settles the token bucket once the real usage is known."""
+        self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self.max_queue_depth,
+            "scheduled": self.scheduled,
+            "wait_seconds_avg": round(self.wait_seconds_total / self.scheduled, 4) if self.scheduled else 0.0,
+            "wait_seconds_max": round(self.wait_seconds_max, 4),
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+            "requests_available": round(self.requests.level, 2),
+            "tokens_available": round(self.tokens.level, 2),
+        }
+
+completion_scheduler = CompletionScheduler(
+    requests_per_minute=settings.OPENAI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.OPENAI_TOKENS_PER_MINUTE,
+    max_retries=settings.SCHEDULER_MAX_RETRIES,
+    backoff_base=settings.SCHEDULER_BACKOFF_BASE,
+    backoff_max=settings.SCHEDULER_BACKOFF_MAX,
+)
+
+llm_scheduler_queue_depth.set_function(
+    lambda: {("current",): len(completion_scheduler._queue), ("max",): completion_scheduler.max_queue_depth}
+)
@@ -1,39 +1,33 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.pagination import fetch_page
+from app.core.writes import delete_by_id, insert_returning, update_returning
 from app.models.reservations import Reservation
 from app.schemas.reservations import ReservationCreate, ReservationResponse
 from uuid import UUID
+from typing import Optional
 
-def create_reservation(db: Session, reservation: ReservationCreate) -> ReservationResponse:
-    db_reservation = Reservation(**reservation.dict())
-    db.add(db_reservation)
-    db.commit()
-    db.refresh(db_reservation)
-    return ReservationResponse.from_orm(db_reservation)
+async def create_reservation(db: AsyncSession, reservation: ReservationCreate) -> ReservationResponse:
+    row = await insert_returning(db, Reservation, reservation.dict())
+    return ReservationResponse.model_validate(row)
 
-def get_reservation(db: Session, reservation_id: UUID) -> ReservationResponse:
-    return db.query(Reservation).filter(Reservation.id == reservation_id).first()
+async def get_reservation(db: AsyncSession, reservation_id: UUID) -> ReservationResponse:
+    return await db.get(Reservation, reservation_id)
 
-def get_reservations(db: Session):
-    return db.query(Reservation).all()
+async def get_reservations(db: AsyncSession, limit: int, cursor: Optional[str] = None):
+    return await fetch_page(db, select(Reservation), Reservation, limit, cursor)
 
-def update_reservation(db: Session, reservation_id: UUID, reservation_data: ReservationCreate) -> ReservationResponse:
-    db_reservation = db.query(Reservation).filter(Reservation.id == reservation_id).first()
-    
-    if db_reservation:
-        for key, value in reservation_data.dict(exclude_unset=True).items():
-            setattr(db_reservation, key, value)
-        db.commit()
-        db.refresh(db_reservation)
-        return ReservationResponse.from_orm(db_reservation)
-    
-    return None
+def reservations_statement(status: Optional[str] = None, restaurant_name: Optional[str] = None):
+    statement = select(Reservation)
+    if status:
+        statement = statement.where(Reservation.status == status)
+    if restaurant_name:
+        statement = statement.where(Reservation.restaurant_name.ilike(f"%{restaurant_name}%"))
+    return statement
 
-def delete_reservation(db: Session, reservation_id: UUID):
-    db_reservation = db.query(Reservation).filter(Reservation.id == reservation_id).first()
-    
-    if db_reservation:
-        db.delete(db_reservation)
-        db.commit()
-        return True
-    
-    return False
+async def update_reservation(db: AsyncSession, reservation_id: UUID, reservation_data: ReservationCreate) -> ReservationResponse:
+    row = await update_returning(db, Reservation, reservation_id, reservation_data.dict(exclude_unset=True))
+    return ReservationResponse.model_validate(row) if row else None
+
+async def delete_reservation(db: AsyncSession, reservation_id: UUID):
+    return await delete_by_id(db, Reservation, reservation_id)
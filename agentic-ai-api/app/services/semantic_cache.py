@@ -0,0 +1,333 @@
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from difflib import get_close_matches
+from functools import lru_cache
+from itertools import count
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+
+#############
+# Prompt features
+#############
+# Local, offline embedding: a bag of normalised words (stopwords dropped,
+# misspellings of the domain words corrected, synonyms folded onto one term,
+# light stemming), each also contributing its character trigrams at a lower
+# weight. Word order does not count, so "show
+# pending appointments" and "list appointments that are pending" embed
+# identically. Features are hashed with a sign bit and the vector is
+# L2-normalised, so a dot product is the cosine similarity.
+#
+# The intent is a feature of its own: "#write" when the prompt has a verb that
+# changes data ("reserve", "cancel", "confirm", ...), kept as a word too,
+# else "#read" in place of the read verbs ("show", "list", ...). A write
+# request is never served from the cache nor stored in it: it has to reach
+# the tools, and "reserve a table" must not get the answer of "show my
+# reserved tables".
+#
+# Values (numbers, dates, times, days, names) embed as their class only
+# ("#num", "#date", "#name", ...): prompts that differ just in values embed
+# alike, but their answers differ, so an answer is only reused when
+# extract_entities() of both prompts is equal.
+
+ENTITY = re.compile(
+    r"(?P<date>\d{4}-\d{2}-\d{2})|(?P<time>\d{1,2}:\d{2})|(?P<num>\d+(?:[.,]\d+)?)"
+    r"|(?P<day>\b(?i:today|tonight|tomorrow|yesterday|(?:mon|tues|wednes|thurs|fri|satur|sun)day)\b)"
+    r"|(?P<name>\S+@\S+|\"[^\"]+\"|(?<![.!?]\s)(?<!^)\b(?!I\b)[A-Z][\w'-]*)",
+)
+WORD = re.compile(r"#\w+|[a-z]+")
+STOPWORDS = frozenset("""
+    a all also an and any are at be by can could did do does for from give
+    here i in is it its just know let like me my now of on or our
+    please scheduled still tell that the there these this those
+    to up us was we what which who will with would you your current currently
+    want need s
+""".split())
+READ_VERBS = frozenset("display fetch find get list look see show".split())
+WRITE_VERBS = {
+    "book": "reserve", "reserve": "reserve", "cancel": "cancel", "confirm": "confirm", "create": "create",
+    "make": "create", "add": "create", "schedule": "schedule", "reschedule": "schedule", "update": "update",
+    "change": "update", "modify": "update", "move": "update", "delete": "delete", "remove": "delete",
+}
+SYNONYMS = {
+    "appointments": "appointment", "appt": "appointment", "appts": "appointment", "visit": "appointment",
+    "visits": "appointment", "reservations": "reservation", "booking": "reservation", "bookings": "reservation",
+    "table": "reservation", "tables": "reservation", "booked": "reserved",
+    "cancelled": "canceled", "waiting": "pending", "outstanding": "pending",
+    "done": "completed", "finished": "completed", "forecast": "weather", "temperature": "weather",
+    "people": "person", "persons": "person", "guest": "person", "guests": "person", "patients": "patient",
+}
+DOMAIN_WORDS = sorted(
+    SYNONYMS.keys() | set(SYNONYMS.values()) | WRITE_VERBS.keys() | {"pending", "patient", "restaurant", "status"}
+)
+VOCABULARY = STOPWORDS | READ_VERBS | set(DOMAIN_WORDS)
+
+@lru_cache(maxsize=4096)
+def _spelling(word: str) -> str:
+    if len(word) < 6 or word in VOCABULARY:
+        return word
+    close = get_close_matches(word, DOMAIN_WORDS, n=1, cutoff=0.9)
+    return close[0] if close else word
+
+def _entities(text: str):
+    """(kind, value) of each value in the prompt; a capitalised word only
+    counts as a name when it is not the first of a sentence or a known word."""
+    for match in ENTITY.finditer(text.strip()):
+        kind, value = match.lastgroup, match.group()
+        if kind == "name" and value.lower() in VOCABULARY:
+            continue
+        yield match, kind, value
+
+def extract_entities(text: str) -> Tuple[str, ...]:
+    return tuple(sorted(value.lower().removesuffix("'s").strip('"') for _, _, value in _entities(text)))
+
+def terms(text: str) -> List[str]:
+    text = text.strip()
+    parts, position = [], 0
+    for match, kind, _ in _entities(text):
+        parts += [text[position:match.start()], f" #{kind} "]
+        position = match.end()
+    parts.append(text[position:])
+
+    result, intent = [], "#read"
+    for word in WORD.findall("".join(parts).lower()):
+        if word in STOPWORDS or word in READ_VERBS:
+            continue
+        word = _spelling(word)
+        if word in WRITE_VERBS:
+            intent = "#write"
+            result.append(WRITE_VERBS[word])
+            continue
+        word = SYNONYMS.get(word, word)
+        if word not in VOCABULARY and len(word) > 4 and word.endswith("s"):
+            word = word[:-1]
+        result.append(word)
+    result.append(intent)
+    return result
+
+def is_write_request(text: str) -> bool:
+    return "#write" in terms(text)
+
+def _hashed(feature: str):
+    value = zlib.crc32(feature.encode("utf-8"))
+    return value, -1.0 if value & 0x80000000 else 1.0
+
+def embed(text: str, dim: int = 512) -> np.ndarray:
+    return embed_terms(terms(text), dim)
+
+def embed_terms(features: List[str], dim: int = 512) -> np.ndarray:
+    vector = np.zeros(dim, dtype=np.float32)
+    for term in features:
+        value, sign = _hashed("w:" + term)
+        vector[value % dim] += sign
+        if term.startswith("#"):
+            continue
+        padded = f" {term} "
+        trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+        weight = 0.5 / len(trigrams) ** 0.5
+        for trigram in trigrams:
+            value, sign = _hashed("c:" + trigram)
+            vector[value % dim] += sign * weight
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+@dataclass
+class SemanticEntry:
+    uid: int
+    prompt: str
+    entities: Tuple[str, ...]
+    answer: str
+    expires_at: float
+    last_used: float
+
+@dataclass
+class SemanticMatch:
+    cache_id: str
+    similarity: float
+    answer: str
+
+class SemanticCache:
+    """Near-duplicate prompt cache for one agent.
+
+    Embeddings live in a preallocated matrix and are searched brute force
+    (one matrix-vector product), which is fast enough at a few thousand rows.
+    An answer is reused only from an entry with the same entities.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int = 1024,
+        ttl_seconds: float = 300,
+        answer_threshold: float = 0.9,
+        dim: int = 512,
+    ):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.answer_threshold = answer_threshold
+        self.dim = dim
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._expires = np.zeros(max_entries)  # 0 marks an empty slot
+        self._last_used = np.zeros(max_entries)
+        self._slots: List[Optional[SemanticEntry]] = [None] * max_entries
+        self._by_uid: Dict[int, int] = {}  # uid -> slot
+        self._uids = count(1)
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.false_hits = 0
+        self.evictions = 0
+        # Best similarity seen per lookup, in 0.05 buckets, to tune the threshold
+        self.similarity_histogram = [0] * 20
+
+    def lookup(self, prompt: str) -> Optional[SemanticMatch]:
+        features = terms(prompt)
+        query = embed_terms(features, self.dim)
+        now = time.time()
+        with self._lock:
+            self.lookups += 1
+            if not self._by_uid or "#write" in features:
+                return None
+
+            scores = self._vectors @ query
+            scores[self._expires < now] = -1.0
+            slot = int(np.argmax(scores))
+            similarity = float(scores[slot])
+            if similarity < 0:
+                return None
+            self.similarity_histogram[min(int(similarity * 20), 19)] += 1
+
+            # The closest entry with the same values
+            entities = extract_entities(prompt)
+            answers = [
+                (float(scores[index]), int(index)) for index in np.flatnonzero(scores >= self.answer_threshold)
+                if self._slots[index].entities == entities
+            ]
+            if not answers:
+                return None
+            similarity, slot = max(answers)
+            self.hits += 1
+            entry = self._slots[slot]
+
+            entry.last_used = now
+            self._last_used[slot] = now
+            return SemanticMatch(
+                cache_id=f"{self.namespace}:{entry.uid}", similarity=round(similarity, 4), answer=entry.answer
+            )
+
+    def add(self, prompt: str, answer: Optional[str]):
+        if answer is None or is_write_request(prompt):
+            return
+        vector = embed(prompt, self.dim)
+        now = time.time()
+        with self._lock:
+            slot = self._free_slot(now)
+            entry = SemanticEntry(
+                next(self._uids), prompt, extract_entities(prompt), answer, now + self.ttl_seconds, now
+            )
+            self._slots[slot] = entry
+            self._vectors[slot] = vector
+            self._expires[slot] = entry.expires_at
+            self._last_used[slot] = now
+            self._by_uid[entry.uid] = slot
+
+    def _free_slot(self, now: float) -> int:
+        # Empty or expired slots first
+        free = np.flatnonzero(self._expires < now)
+        if free.size:
+            self._remove(int(free[0]))
+            return int(free[0])
+        # Full: evict the least recently used entry
+        slot = int(np.argmin(self._last_used))
+        self._remove(slot)
+        self.evictions += 1
+        return slot
+
+    def _remove(self, slot: int):
+        entry = self._slots[slot]
+        if entry is not None:
+            del self._by_uid[entry.uid]
+            self._slots[slot] = None
+        self._vectors[slot] = 0
+        self._expires[slot] = 0
+        self._last_used[slot] = 0
+
+    def report_false_hit(self, uid: int) -> bool:
+        """A served entry was wrong for the prompt: count it and drop the entry."""
+        with self._lock:
+            slot = self._by_uid.get(uid)
+            if slot is None:
+                return False
+            self.false_hits += 1
+            self._remove(slot)
+            return True
+
+    def rebuild(self, dim: Optional[int] = None):
+        """Re-embeds the live entries (e.g. after changing the dimension) and
+        compacts the index, dropping expired ones."""
+        now = time.time()
+        with self._lock:
+            self.dim = dim or self.dim
+            entries = [entry for entry in self._slots if entry is not None and entry.expires_at >= now]
+            self._vectors = np.zeros((self.max_entries, self.dim), dtype=np.float32)
+            self._expires[:] = 0
+            self._last_used[:] = 0
+            self._slots = [None] * self.max_entries
+            self._by_uid = {}
+            for slot, entry in enumerate(entries):
+                self._slots[slot] = entry
+                self._vectors[slot] = embed(entry.prompt, self.dim)
+                self._expires[slot] = entry.expires_at
+                self._last_used[slot] = entry.last_used
+                self._by_uid[entry.uid] = slot
+
+    def clear(self):
+        with self._lock:
+            self._vectors[:] = 0
+            self._expires[:] = 0
+            self._last_used[:] = 0
+            self._slots = [None] * self.max_entries
+            self._by_uid = {}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._by_uid),
+            "max_entries": self.max_entries,
+            "answer_threshold": self.answer_threshold,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "false_hits": self.false_hits,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "false_hit_rate": round(self.false_hits / self.hits, 4) if self.hits else 0.0,
+            "similarity_histogram": {
+                f"{bucket / 20:.2f}": n for bucket, n in enumerate(self.similarity_histogram) if n
+            },
+        }
+
+# One index per agent, created on first use
+semantic_caches: Dict[str, SemanticCache] = {}
+
+def get_semantic_cache(namespace: str) -> Optional[SemanticCache]:
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    if namespace not in semantic_caches:
+        semantic_caches[namespace] = SemanticCache(
+            namespace,
+            max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+            answer_threshold=settings.SEMANTIC_CACHE_ANSWER_THRESHOLD,
+            dim=settings.SEMANTIC_CACHE_DIM,
+        )
+    return semantic_caches[namespace]
+
+def report_false_hit(cache_id: str) -> bool:
+    namespace, _, uid = cache_id.rpartition(":")
+    cache = semantic_caches.get(namespace)
+    return bool(cache and uid.isdigit() and cache.report_false_hit(int(uid)))
@@ -0,0 +1,59 @@
+import asyncio
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Name of the endpoint whose calls may be coalesced (see app.api.dependencies);
+# None disables coalescing for the request.
+coalesce_scope: ContextVar[Optional[str]] = ContextVar("coalesce_scope", default=None)
+
+class SingleFlight:
+    """Identical calls that arrive while one is already in flight wait for its
+    result instead of starting their own."""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.leaders: Counter = Counter()  # Calls that actually ran, per scope
+        self.coalesced: Counter = Counter()  # Calls that waited on a leader, per scope
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], scope: str = "default") -> Any:
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced[scope] += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader was cancelled (e.g. its client went away): run our own call
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting; do not warn about an unretrieved exception
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        self.leaders[scope] += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "scopes": {
+                scope: {"calls": self.leaders[scope], "coalesced": self.coalesced[scope]}
+                for scope in set(self.leaders) | set(self.coalesced)
+            },
+        }
+
+completion_flights = SingleFlight()
@@ -0,0 +1,111 @@
+import math
+import re
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+# tiktoken gives exact counts when installed; otherwise a local estimate is used
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+_WORDS = re.compile(r"\w+|[^\w\s]")
+
+# Per-message framing tokens used by the chat format
+MESSAGE_OVERHEAD = 3
+REPLY_OVERHEAD = 3
+
+def count_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    # BPE averages ~4 characters per token; short words and punctuation are one each
+    return sum(math.ceil(len(word) / 4) for word in _WORDS.findall(text))
+
+def message_field(message: Any, name: str):
+    """Messages are plain dicts or ChatCompletionMessage objects."""
+    return message.get(name) if isinstance(message, dict) else getattr(message, name, None)
+
+def count_message_tokens(message: Any) -> int:
+    tokens = MESSAGE_OVERHEAD + count_tokens(message_field(message, "content"))
+    for tool_call in message_field(message, "tool_calls") or []:
+        function = message_field(tool_call, "function")
+        tokens += count_tokens(message_field(function, "name")) + count_tokens(message_field(function, "arguments"))
+    return tokens
+
+def count_prompt_tokens(messages: List[Any], tools=None) -> int:
+    tokens = REPLY_OVERHEAD + sum(count_message_tokens(message) for message in messages)
+    if tools:
+        tokens += getattr(tools, "token_count", None) or count_tokens(str(tools))
+    return tokens
+
+@dataclass
+class TokenStats:
+    """Token accounting for one request, across all of its completions."""
+    calls: int = 0
+    estimated_prompt_tokens: int = 0
+    tokens_saved: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "estimated_prompt_tokens": self.estimated_prompt_tokens,
+            "tokens_saved": self.tokens_saved,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+# Set by whoever owns the request (e.g. the agent loop) to collect its counts
+token_stats: ContextVar[Optional[TokenStats]] = ContextVar("token_stats", default=None)
+
+def truncate_content(content: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    if len(content) <= max_chars:
+        return content
+    return f"{content[:max_chars]}... [truncated, {len(content) - max_chars} more characters]"
+
+def pack_messages(messages: List[Any], budget: int, tools=None, tool_output_tokens: int = 200) -> Tuple[List[Any], int, int]:
+    """Fits a prompt into `budget` tokens by dropping the lowest-priority
+    content first:
+
+    1. tool outputs, oldest first, truncated to `tool_output_tokens`;
+    2. whole earlier turns (from the oldest), never the system prompt or the
+       current user turn.
+
+    Returns the packed messages, their estimated size and the tokens saved.
+    """
+    sizes = [count_message_tokens(message) for message in messages]
+    fixed = count_prompt_tokens([], tools)
+    original = total = fixed + sum(sizes)
+    if total <= budget:
+        return messages, total, 0
+
+    messages = list(messages)
+    for index, message in enumerate(messages):
+        if total <= budget:
+            break
+        if message_field(message, "role") == "tool" and isinstance(message, dict):
+            messages[index] = {**message, "content": truncate_content(str(message["content"]), tool_output_tokens)}
+            new_size = count_message_tokens(messages[index])
+            total -= sizes[index] - new_size
+            sizes[index] = new_size
+
+    if total > budget:
+        # The current turn starts at the last user message
+        last_user = max((i for i, message in enumerate(messages) if message_field(message, "role") == "user"), default=len(messages))
+        start = 1 if messages and message_field(messages[0], "role") == "system" else 0
+        end = start
+        while total > budget and end < last_user:
+            # Drop one earlier turn (a user message and everything up to the next one)
+            end += 1
+            while end < last_user and message_field(messages[end], "role") != "user":
+                end += 1
+            total = fixed + sum(sizes[:start]) + sum(sizes[end:])
+        messages = messages[:start] + messages[end:]
+
+    return messages, total, original - total
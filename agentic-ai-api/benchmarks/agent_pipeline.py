@@ -0,0 +1,135 @@
+"""Agent pipeline benchmark against the offline mock LLM backend.
+
+Drives /openai/ask and /openai/agent3-5 in process (no network, no OpenAI
+key) at fixed concurrency levels and reports throughput and p50/p95/p99
+latency, with the time of each request split into LLM, tool and DB time.
+
+    python benchmarks/agent_pipeline.py --concurrency 1,8,32 --requests 200
+    python benchmarks/agent_pipeline.py --script mock_script.json --json results.json
+
+DB-backed tools need the configured database to be reachable; when it is not
+they fail fast and show up in the tool error count (tool_err), while the
+request itself still answers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from common import configure_environment, percentiles
+
+# Must be set before the app (and its settings) are imported. The rate
+# limits are lifted to measure the pipeline, not the client-side limiter.
+configure_environment(
+    LLM_BACKEND="mock",
+    OPENAI_REQUESTS_PER_MINUTE="100000000",
+    OPENAI_TOKENS_PER_MINUTE="100000000000",
+)
+
+import httpx
+
+# One prompt per endpoint, chosen to exercise its tools with the default mock script
+PROMPTS = {
+    "ask": "Give me a one line summary of what you can do.",
+    "agent3": "What's the weather like in Paris?",
+    "agent4": "Show me my reservations.",
+    "agent5": "Book a table for 2 at Mock Bistro.",
+}
+
+def tool_errors() -> float:
+    """Failed or timed out tool calls so far (errors_total{component="tool"})."""
+    from app.core.metrics import errors
+
+    return sum(value for (component, _), value in errors.collect().items() if component == "tool")
+
+async def run_level(client, endpoint: str, concurrency: int, requests: int):
+    from app.core.timing import stage_timings
+
+    samples = []
+    errors = 0
+    tool_errors_before = tool_errors()
+    queue = asyncio.Queue()
+    for index in range(requests):
+        queue.put_nowait(index)
+
+    async def one(index: int):
+        nonlocal errors
+        # Each worker runs in its own task, so the timings dict is per request
+        timings = {}
+        stage_timings.set(timings)
+        started = time.perf_counter()
+        response = await client.post(
+            f"/openai/{endpoint}",
+            # A distinct prompt and no-cache: every request does the full pipeline
+            params={"message": f"{PROMPTS[endpoint]} (#{index})"},
+            headers={"Cache-Control": "no-cache"},
+        )
+        total = time.perf_counter() - started
+        body = response.json()
+        if response.status_code != 200 or "error" in body:
+            errors += 1
+        samples.append((total, timings.get("llm", 0.0), timings.get("tool", 0.0), timings.get("db", 0.0)))
+
+    async def worker():
+        while not queue.empty():
+            await asyncio.create_task(one(queue.get_nowait()))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "tool_errors": int(tool_errors() - tool_errors_before),
+        "throughput_rps": round(requests / elapsed, 2),
+    }
+    for column, name in enumerate(("total", "llm", "tool", "db")):
+        p50, p95, p99 = percentiles([sample[column] * 1000 for sample in samples])
+        result[f"{name}_ms"] = {"p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2)}
+    return result
+
+def print_table(results):
+    print(f"{'endpoint':<8} {'conc':>5} {'req/s':>8} {'err':>4} {'tool_err':>8}  "
+          f"{'total p50/p95/p99 ms':>24}  {'llm p50/p95/p99':>24}  {'tool p50/p95/p99':>24}  {'db p50/p95/p99':>24}")
+    for r in results:
+        cells = ["/".join(f"{r[f'{name}_ms'][p]:.0f}" for p in ("p50", "p95", "p99")) for name in ("total", "llm", "tool", "db")]
+        print(f"{r['endpoint']:<8} {r['concurrency']:>5} {r['throughput_rps']:>8} {r['errors']:>4} {r['tool_errors']:>8}  "
+              + "  ".join(f"{cell:>24}" for cell in cells))
+
+async def main(args):
+    from app.core.database import dispose_engines
+    from main import app
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for endpoint in args.endpoints.split(","):
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                results.append(await run_level(client, endpoint, concurrency, args.requests))
+    await dispose_engines()  # Otherwise the aiosqlite connection threads keep the process alive
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", default="ask,agent3,agent4,agent5")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint and level")
+    parser.add_argument("--script", help="Mock LLM script (JSON), see app.services.mock_llm")
+    parser.add_argument("--latency-ms", type=float, help="Median mock LLM latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if args.script:
+        os.environ["MOCK_LLM_SCRIPT"] = args.script
+    if args.latency_ms is not None:
+        os.environ["MOCK_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ.setdefault("MOCK_LLM_SEED", str(args.seed))
+    asyncio.run(main(args))
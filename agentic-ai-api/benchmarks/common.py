@@ -0,0 +1,20 @@
+import os
+import sys
+from statistics import quantiles
+
+def configure_environment(**overrides):
+    """Settings every benchmark needs before the app is imported: placeholder
+    credentials (nothing here calls AWS or OpenAI) and the repo on sys.path."""
+    for name in ("OPENAI_API_KEY", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_REGION"):
+        os.environ.setdefault(name, "mock")
+    for name, value in overrides.items():
+        os.environ.setdefault(name, value)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def percentiles(values):
+    """p50, p95, p99."""
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return value, value, value
+    cuts = quantiles(values, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
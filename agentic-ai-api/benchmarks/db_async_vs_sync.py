@@ -0,0 +1,111 @@
+"""Async vs sync database path under concurrency.
+
+Serves the same appointments listing two ways, in process:
+
+  sync   a `def` route on the blocking SessionLocal (get_db), which Starlette
+         runs on its worker thread pool (the former implementation)
+  async  the actual /medicare/appointments route on AsyncSession (get_async_db)
+
+and reports throughput and p50/p95/p99 per concurrency level. Uses the
+configured database; --seed inserts a patient with that many appointments
+first.
+
+    python benchmarks/db_async_vs_sync.py --concurrency 16,64,256 --requests 2000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import date, timedelta
+from typing import Optional
+from common import configure_environment, percentiles
+
+configure_environment(LOG_LEVEL="WARNING", TRACING_ENABLED="false")
+
+import httpx
+from fastapi import Depends, FastAPI, Query
+from sqlalchemy.orm import Session
+from app.api.endpoints.medicare import appointments_statement, get_appointments
+from app.core.database import AsyncSessionLocal, dispose_engines, get_db
+from app.core.pagination import keyset_page, keyset_statement
+from app.models.medicare import Appointment, AppointmentResponse, Patient
+from app.schemas.pagination import Page
+
+def sync_get_appointments(
+    status: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(10),
+    db: Session = Depends(get_db),
+):
+    statement = keyset_statement(appointments_statement(status=status), Appointment, limit, cursor, db.get_bind().dialect.name)
+    return keyset_page(db.scalars(statement).all(), limit)
+
+app = FastAPI()
+app.add_api_route("/sync/appointments", sync_get_appointments, response_model=Page[AppointmentResponse])
+app.add_api_route("/async/appointments", get_appointments, response_model=Page[AppointmentResponse])
+
+async def seed(rows: int):
+    async with AsyncSessionLocal() as db:
+        patient = Patient(id=uuid.uuid4(), name="Benchmark", mobile_phone="000")
+        db.add(patient)
+        await db.flush()
+        for index in range(rows):
+            db.add(Appointment(
+                id=uuid.uuid4(),
+                patient_id=patient.id,
+                type="Checkup",
+                status="Pending" if index % 2 else "Completed",
+                scheduled_date=date.today() + timedelta(days=index % 90),
+            ))
+        await db.commit()
+
+async def run_level(client, path: str, concurrency: int, requests: int):
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.get(path, params={"status": "Pending", "limit": 20})
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += response.status_code != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    p50, p95, p99 = percentiles(latencies)
+    return {
+        "path": path,
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / elapsed, 1),
+        "errors": errors,
+        "p50_ms": round(p50, 2),
+        "p95_ms": round(p95, 2),
+        "p99_ms": round(p99, 2),
+    }
+
+async def main(args):
+    if args.seed:
+        await seed(args.seed)
+
+    results = []
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)  # Failures count as errors
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            for path in ("/sync/appointments", "/async/appointments"):
+                await run_level(client, path, concurrency, min(args.requests, 50))  # Warm up
+                results.append(await run_level(client, path, concurrency, args.requests))
+    await dispose_engines()  # Otherwise the aiosqlite connection threads keep the process alive
+
+    print(f"{'path':<22} {'conc':>5} {'req/s':>9} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for r in results:
+        print(f"{r['path']:<22} {r['concurrency']:>5} {r['throughput_rps']:>9} {r['errors']:>5} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="16,64,256", help="Comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per path and level")
+    parser.add_argument("--seed", type=int, default=0, help="Insert this many appointments first")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,250 @@
+"""Query plans and latency of the list queries, before and after the indexes.
+
+Seeds Patients, Appointments and reservations, then runs the API's own list
+queries (app.api.endpoints.medicare, app.services.reservations,
+app.core.pagination) at migration 0001 (bacpac schema, primary keys and
+idx_appointments_patient_id only) and again at the latest migration, and
+prints each query's plan and p50/p95 for both. Every index of
+0002_query_indexes has at least one query here that it is meant for.
+
+The tables are dropped and recreated, so this runs against its own database
+(a local SQLite file unless --database-url is given; never point it at a
+shared one).
+
+    python benchmarks/db_indexes.py --appointments 1000000
+    python benchmarks/db_indexes.py --database-url postgresql://bench@localhost/bench
+"""
+import argparse
+import os
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from common import configure_environment, percentiles
+
+STATUSES = (("Completed", 0.6), ("Confirmed", 0.2), ("Pending", 0.1), ("Cancelled", 0.1))
+TYPES = ("Checkup", "Consultation", "Follow-up", "Vaccination", "Lab test")
+RESERVATION_STATUSES = ("pending", "confirmed", "canceled")
+BATCH = 10000
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:///index_benchmark.db")
+    parser.add_argument("--appointments", type=int, default=1000000)
+    parser.add_argument("--patients", type=int, default=100000)
+    parser.add_argument("--reservations", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=30, help="Runs per query and phase")
+    parser.add_argument("--reuse", action="store_true", help="Keep already seeded tables")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.database_url  # Never the configured (shared) database
+configure_environment(LOG_LEVEL="WARNING", TRACING_ENABLED="false", DB_STATEMENT_TIMEOUT_MS="0")
+
+import sqlalchemy as sa
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app.api.endpoints.medicare import appointments_statement
+from app.core import migrations
+from app.core.database import engine
+from app.core.pagination import encode_cursor, keyset_statement
+from app.models.medicare import Appointment, Patient
+from app.models.reservations import Reservation
+from app.services.reservations import reservations_statement
+
+#############
+# Query plans
+#############
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(Explain, "sqlite")
+def _explain_sqlite(element, compiler, **kw):
+    return "EXPLAIN QUERY PLAN " + compiler.process(element.statement, **kw)
+
+@compiles(Explain, "postgresql")
+def _explain_postgresql(element, compiler, **kw):
+    return "EXPLAIN " + compiler.process(element.statement, **kw)
+
+@compiles(Explain)
+def _explain_default(element, compiler, **kw):
+    # SQL Server: run under SET SHOWPLAN_TEXT ON (see plan())
+    return compiler.process(element.statement, **kw)
+
+def plan(connection, statement):
+    # Plan rows are read from the DBAPI cursor: the result would otherwise
+    # apply the explained statement's column types to them
+    dialect = connection.dialect.name
+    if dialect == "mssql":
+        connection.exec_driver_sql("SET SHOWPLAN_TEXT ON")
+        try:
+            cursor = connection.execute(Explain(statement)).cursor
+            lines = []
+            while True:
+                lines.extend(str(row[0]).strip() for row in cursor.fetchall())
+                if not cursor.nextset():
+                    break
+        finally:
+            connection.exec_driver_sql("SET SHOWPLAN_TEXT OFF")
+        return lines[1:]  # The first row is the statement itself
+    if dialect in ("sqlite", "postgresql"):
+        return [str(row[-1]) for row in connection.execute(Explain(statement)).cursor.fetchall()]
+    return ["(no plan for %s)" % dialect]
+
+#############
+# Data
+#############
+
+def seed(connection):
+    rng = random.Random(args.seed)
+    started = datetime(2023, 1, 1)
+    span = 2 * 365 * 86400
+    statuses, weights = zip(*STATUSES)
+
+    def timestamp():
+        return started + timedelta(seconds=rng.randrange(span), microseconds=rng.randrange(0, 1000000, 1000))
+
+    patient_ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(args.patients)]
+    for offset in range(0, len(patient_ids), BATCH):
+        connection.execute(sa.insert(Patient.__table__), [
+            {"id": id, "name": f"Patient {offset + index}", "mobile_phone": "0000000", "created_at": timestamp(), "updated_at": started}
+            for index, id in enumerate(patient_ids[offset:offset + BATCH])
+        ])
+        connection.commit()
+
+    for offset in range(0, args.appointments, BATCH):
+        rows = []
+        for _ in range(min(BATCH, args.appointments - offset)):
+            created_at = timestamp()
+            rows.append({
+                "id": uuid.UUID(int=rng.getrandbits(128), version=4),
+                "patient_id": rng.choice(patient_ids),
+                "type": rng.choice(TYPES),
+                "status": rng.choices(statuses, weights)[0],
+                "scheduled_date": (created_at + timedelta(days=rng.randrange(90))).date(),
+                "insurance_required": rng.random() < 0.3,
+                "created_at": created_at,
+                "updated_at": created_at,
+            })
+        connection.execute(sa.insert(Appointment.__table__), rows)
+        connection.commit()
+        print(f"\r  appointments {offset + len(rows):,}", end="", flush=True)
+    print()
+
+    for offset in range(0, args.reservations, BATCH):
+        connection.execute(sa.insert(Reservation.__table__), [
+            {
+                "id": uuid.UUID(int=rng.getrandbits(128), version=4),
+                "user_id": rng.randrange(1000000),
+                "restaurant_name": f"Restaurant {rng.randrange(500)}",
+                "reservation_time": timestamp(),
+                "number_of_people": rng.randrange(1, 9),
+                "budget": rng.randrange(20, 500),
+                "status": rng.choice(RESERVATION_STATUSES),
+                "created_at": timestamp(),
+                "updated_at": started,
+            }
+            for _ in range(min(BATCH, args.reservations - offset))
+        ])
+        connection.commit()
+
+def analyze(connection):
+    if connection.dialect.name in ("sqlite", "postgresql"):
+        connection.exec_driver_sql("ANALYZE")
+        connection.commit()
+
+def middle_cursor(connection, model, statement):
+    """Cursor of the row halfway through `statement`'s keyset order (a deep page)."""
+    count = connection.scalar(sa.select(sa.func.count()).select_from(statement.subquery()))
+    row = connection.execute(
+        statement.with_only_columns(model.created_at, model.id).order_by(model.created_at, model.id).offset(count // 2).limit(1)
+    ).first()
+    return encode_cursor(row.created_at, row.id) if row else None
+
+def queries(connection):
+    """(name, index it is meant for, statement): the statements the list endpoints run."""
+    dialect = connection.dialect.name
+    patient_id = connection.scalar(
+        sa.select(Appointment.patient_id).group_by(Appointment.patient_id).order_by(sa.func.count().desc()).limit(1)
+    )
+    day = connection.scalar(sa.select(Appointment.scheduled_date).order_by(Appointment.created_at).limit(1)) or date.today()
+    pending = appointments_statement(status="Pending")
+    every = appointments_statement()
+
+    def page(statement, model, cursor=None):
+        return keyset_statement(statement, model, 20, cursor, dialect)
+
+    return [
+        ("appointments of a patient", "ix_appointments_patient_created",
+         page(appointments_statement(patient_id=patient_id), Appointment)),
+        ("appointments by status", "ix_appointments_status_created", page(pending, Appointment)),
+        ("appointments by status, deep page", "ix_appointments_status_created",
+         page(pending, Appointment, middle_cursor(connection, Appointment, pending))),
+        ("appointments by status, count", "ix_appointments_status_created",
+         sa.select(sa.func.count()).select_from(pending.subquery())),
+        ("appointments by date", "ix_appointments_scheduled_created",
+         page(appointments_statement(scheduled_date=day), Appointment)),
+        ("appointments, deep page", "ix_appointments_created",
+         page(every, Appointment, middle_cursor(connection, Appointment, every))),
+        ("patients, deep page", "ix_patients_created",
+         page(sa.select(Patient), Patient, middle_cursor(connection, Patient, sa.select(Patient)))),
+        ("reservations by status", "ix_reservations_status_created",
+         page(reservations_statement(status="confirmed"), Reservation)),
+        ("reservations, deep page", "ix_reservations_created",
+         page(reservations_statement(), Reservation, middle_cursor(connection, Reservation, reservations_statement()))),
+    ]
+
+def measure(connection, statement):
+    for _ in range(2):  # Warm the cache
+        connection.execute(statement).all()
+    latencies = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        connection.execute(statement).all()
+        latencies.append((time.perf_counter() - started) * 1000)
+    p50, p95, _ = percentiles(latencies)
+    return p50, p95
+
+def main():
+    with engine.connect() as connection:
+        seeded = args.reuse and sa.inspect(connection).has_table("Appointments") and connection.scalar(
+            sa.select(sa.func.count()).select_from(Appointment.__table__)
+        )
+        if seeded:
+            migrations.downgrade(connection, "0001")
+        else:
+            migrations.downgrade(connection, "base")
+            migrations.upgrade(connection, "0001")
+            print(f"Seeding {args.patients:,} patients, {args.appointments:,} appointments, {args.reservations:,} reservations")
+            seed(connection)
+
+        analyze(connection)
+        statements = queries(connection)
+        before = [(measure(connection, statement), plan(connection, statement)) for _, _, statement in statements]
+        connection.commit()
+
+        started = time.perf_counter()
+        migrations.upgrade(connection)
+        analyze(connection)
+        print(f"Migrated to the latest version in {time.perf_counter() - started:.1f}s ({connection.dialect.name})\n")
+        after = [(measure(connection, statement), plan(connection, statement)) for _, _, statement in statements]
+
+    print(f"{'query':<36} {'index':<34} {'p50 before':>11} {'p50 after':>10} {'p95 before':>11} {'p95 after':>10} {'speedup':>8}")
+    for (name, index, _), ((b50, b95), _), ((a50, a95), _) in zip(statements, before, after):
+        print(f"{name:<36} {index:<34} {b50:>11.3f} {a50:>10.3f} {b95:>11.3f} {a95:>10.3f} {b50 / max(a50, 1e-6):>7.1f}x")
+
+    print("\nPlans (before -> after)")
+    for (name, index, _), (_, plan_before), (_, plan_after) in zip(statements, before, after):
+        print(f"\n{name}  [{index}]")
+        for line in plan_before:
+            print(f"  before  {line}")
+        for line in plan_after:
+            print(f"  after   {line}")
+
+if __name__ == "__main__":
+    main()
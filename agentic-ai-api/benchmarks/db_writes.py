@@ -0,0 +1,135 @@
+"""Write latency: ORM round trips vs single-statement writes.
+
+Creates, updates and deletes appointments two ways, on the configured
+database:
+
+  orm        the former implementation: add + COMMIT + refresh (SELECT) for a
+             create, get (SELECT) + flush + COMMIT + refresh for an update,
+             get + DELETE + COMMIT for a delete
+  returning  app.core.writes, as the routes use it: one INSERT / UPDATE /
+             DELETE ... RETURNING (OUTPUT on SQL Server) + COMMIT
+
+and reports p50/p95 and the statements sent per operation. A local SQLite
+file has next to no round-trip time; --rtt-ms adds that much delay to
+every statement and COMMIT to stand in for a database across the network.
+
+    python benchmarks/db_writes.py --operations 500 --rtt-ms 1
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from common import configure_environment, percentiles
+
+configure_environment(LOG_LEVEL="WARNING", TRACING_ENABLED="false")
+
+from sqlalchemy import event
+from app.core.database import AsyncSessionLocal, async_engine, dispose_engines
+from app.core.writes import delete_returning, insert_returning, update_returning
+from app.models.medicare import Appointment, AppointmentResponse, Patient
+
+statements = []
+
+def simulate_round_trips(rtt_ms: float):
+    engine = async_engine.sync_engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split(None, 1)[0])
+        if rtt_ms:
+            time.sleep(rtt_ms / 1000)  # Runs on the driver's thread, like waiting on the network
+
+    @event.listens_for(engine, "commit")
+    def commit(connection):
+        statements.append("COMMIT")
+        if rtt_ms:
+            time.sleep(rtt_ms / 1000)
+
+#############
+# The two write paths
+#############
+
+async def orm_create(db, values):
+    appointment = Appointment(**values)
+    db.add(appointment)
+    await db.commit()
+    await db.refresh(appointment)
+    return AppointmentResponse.model_validate(appointment)
+
+async def orm_update(db, id, values):
+    appointment = await db.get(Appointment, id)
+    for key, value in values.items():
+        setattr(appointment, key, value)
+    await db.commit()
+    await db.refresh(appointment)
+    return AppointmentResponse.model_validate(appointment)
+
+async def orm_delete(db, id):
+    appointment = await db.get(Appointment, id)
+    await db.delete(appointment)
+    await db.commit()
+    return AppointmentResponse.model_validate(appointment)
+
+async def returning_create(db, values):
+    return AppointmentResponse.model_validate(await insert_returning(db, Appointment, values))
+
+async def returning_update(db, id, values):
+    return AppointmentResponse.model_validate(await update_returning(db, Appointment, id, values))
+
+async def returning_delete(db, id):
+    return AppointmentResponse.model_validate(await delete_returning(db, Appointment, id))
+
+PATHS = {
+    "orm": (orm_create, orm_update, orm_delete),
+    "returning": (returning_create, returning_update, returning_delete),
+}
+
+async def run(path: str, patient_id, operations: int):
+    create, update, delete = PATHS[path]
+    latencies = {"create": [], "update": [], "delete": []}
+    counts = {"create": 0, "update": 0, "delete": 0}
+
+    async def timed(name, call):
+        async with AsyncSessionLocal() as db:  # A session per request, as in the routes
+            statements.clear()
+            started = time.perf_counter()
+            result = await call(db)
+            latencies[name].append((time.perf_counter() - started) * 1000)
+            counts[name] = len(statements)
+            return result
+
+    for _ in range(operations):
+        values = {"patient_id": patient_id, "type": "Checkup", "status": "Pending"}
+        created = await timed("create", lambda db: create(db, values))
+        await timed("update", lambda db: update(db, created.id, {**values, "status": "Confirmed"}))
+        await timed("delete", lambda db: delete(db, created.id))
+    return {name: (percentiles(values)[:2], counts[name]) for name, values in latencies.items()}
+
+async def main(args):
+    simulate_round_trips(args.rtt_ms)
+    async with AsyncSessionLocal() as db:
+        patient = Patient(id=uuid.uuid4(), name="Benchmark", mobile_phone="000")
+        db.add(patient)
+        await db.commit()
+
+    results = {}
+    for path in PATHS:
+        await run(path, patient.id, min(args.operations, 20))  # Warm up
+        results[path] = await run(path, patient.id, args.operations)
+
+    async with AsyncSessionLocal() as db:
+        await db.delete(patient)
+        await db.commit()
+    await dispose_engines()
+
+    print(f"{'operation':<10} {'path':<10} {'statements':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    for operation in ("create", "update", "delete"):
+        for path, result in results.items():
+            (p50, p95), count = result[operation]
+            print(f"{operation:<10} {path:<10} {count:>10} {p50:>9.2f} {p95:>9.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operations", type=int, default=500, help="Create/update/delete cycles per path")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="Delay added per statement and COMMIT")
+    asyncio.run(main(parser.parse_args()))
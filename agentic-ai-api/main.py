@@ -1,5 +1,14 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.api import routers
+from app.core.openai_client import close_openai_client
+from app.core.config import settings
+from app.core.database import dispose_engines, prewarm_pool
+from app.core.migrations import migrate
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.tracing import TracingMiddleware
+from app.core.profiler import ProfilerMiddleware
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 import os
@@ -7,11 +16,24 @@ import os
 # Load environment variables from .env file
 load_dotenv()
 
-# Optionally set up logging (uncomment if you have a logging setup)
-# from app.core.logging_config import setup_logging
-# setup_logging()  # Call logging setup function
+# Structured logging through a background queue (see app.core.logging_config)
+from app.core.logging_config import RequestIdMiddleware, setup_logging, shutdown_logging
+setup_logging()  # Call logging setup function
 
-app = FastAPI(title="Nunia.AgenticAI.API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DB_MIGRATE_ON_STARTUP:
+        await migrate()
+    # Open the database connections before the first request needs them
+    if settings.DB_POOL_PREWARM:
+        await prewarm_pool()
+    yield
+    await dispose_engines()
+    # Close the shared OpenAI connection pool
+    await close_openai_client()
+    shutdown_logging()
+
+app = FastAPI(title="Nunia.AgenticAI.API", lifespan=lifespan)
 
 # Allow all origins (not recommended for production)
 app.add_middleware(
@@ -22,9 +44,26 @@ app.add_middleware(
     allow_headers=["*"],   # Allow all headers
 )
 
+# Request latency per route, exposed with the other metrics on /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Route-scoped profiling sessions (see /debug/profile); a no-op while none runs
+app.add_middleware(ProfilerMiddleware)
+
+# Span tracing of sampled requests (see /debug/traces)
+app.add_middleware(TracingMiddleware)
+
+# A request id on every log record (and in the X-Request-ID response header)
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers/endpoints from the app/api directory
 app.include_router(routers.router)
 
+# Prometheus scrape endpoint (per worker process)
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     try:
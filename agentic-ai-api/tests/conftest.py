@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import httpx
+import pytest
+
+# Settings the app needs at import time; nothing in the tests calls AWS or
+# OpenAI (completions come from the offline mock backend) and the database is
+# a throwaway SQLite file
+for name in ("OPENAI_API_KEY", "AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_REGION"):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("LLM_BACKEND", "mock")
+os.environ.setdefault("MOCK_LLM_LATENCY_MS", "0")
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="agentic-ai-tests-"), "test.db"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(scope="session")
+def database():
+    """The test database at the latest migration."""
+    from app.core import migrations
+    from app.core.database import engine
+
+    with engine.connect() as connection:
+        migrations.upgrade(connection)
+    return engine
+
+@pytest.fixture
+async def async_database(database):
+    """The test database for async code. Every test runs on its own event
+    loop, so the async pool is disposed after each one."""
+    from app.core.database import async_engine
+
+    yield async_engine
+    await async_engine.dispose()
+
+@pytest.fixture
+async def client(async_database):
+    """HTTP client for the app, in process (without its lifespan: nothing is
+    prewarmed or migrated)."""
+    from main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+@pytest.fixture
+async def mock_llm(monkeypatch):
+    """Installs the offline mock backend with the given rules (format in
+    app.services.mock_llm) and empties the caches; returns its completions,
+    which count the calls."""
+    from app.core import openai_client
+    from app.services.completion_cache import completion_cache
+    from app.services.mock_llm import LatencyModel, MockCompletions, MockLLMClient
+    from app.services.semantic_cache import semantic_caches
+
+    def install(rules):
+        client = MockLLMClient()
+        client.chat.completions = MockCompletions(rules, LatencyModel("fixed", 0))
+        monkeypatch.setattr(openai_client, "_client", client)
+        return client.chat.completions
+
+    if completion_cache is not None:
+        await completion_cache.clear()
+    semantic_caches.clear()
+    return install
@@ -0,0 +1,124 @@
+import json
+import uuid
+from datetime import datetime
+import pytest
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.reservations import Reservation
+from app.services.agent_tools import RESERVATION_FIELDS, TOOL_SETS, TOOLS, WRITE_TOOLS, ToolArgumentsError, WeatherArgs, compact_json, fit_row, page_result, render_result
+from app.services.openai_service import AGENTS
+from app.services.reservations import reservations_statement
+from app.services.token_budget import count_tokens
+
+pytestmark = pytest.mark.anyio
+
+#############
+# Registry
+#############
+
+def test_tool_sets_are_built_from_the_registry():
+    for tool_set in TOOL_SETS.values():
+        assert [schema["function"]["name"] for schema in tool_set.schemas] == [tool.name for tool in tool_set.tools]
+        assert all(tool_set.by_name[tool.name] is TOOLS[tool.name] for tool in tool_set.tools)
+        assert json.loads(tool_set.schemas.json_payload) == list(tool_set.schemas)
+        assert tool_set.schemas.token_count == count_tokens(tool_set.schemas.json_payload)
+    assert {agent.tool_set.name for agent in AGENTS.values()} <= set(TOOL_SETS)
+    assert WRITE_TOOLS == {"create_reservation"}
+
+def test_parse_arguments_validates_the_json():
+    tool_set = TOOL_SETS["reservations"]
+    assert tool_set.parse_arguments("get_current_weather", '{"location": "Paris"}') == WeatherArgs(location="Paris")
+    assert tool_set.parse_arguments("get_reservations", "").skip == 0
+
+    with pytest.raises(ToolArgumentsError) as raised:
+        tool_set.parse_arguments("create_reservation", '{"restaurant_name": "Luigi\'s", "budget": "cheap"}')
+    assert raised.value.tool is TOOLS["create_reservation"]
+    assert sorted(raised.value.missing) == ["number_of_people", "reservation_time"]
+
+    with pytest.raises(ToolArgumentsError):
+        tool_set.parse_arguments("get_current_weather", "not json")
+    with pytest.raises(KeyError):
+        tool_set.parse_arguments("get_appointments", "{}")  # Not in this set
+
+def test_unknown_tools_are_an_error_result():
+    assert json.loads(TOOL_SETS["appointments"].call("create_reservation", None)) == {"error": "Function create_reservation not found."}
+
+#############
+# Result encoding
+#############
+
+async def reservations_page(names, **kwargs) -> dict:
+    """page_result over new reservations named `names`, in that order."""
+    prefix = f"page-{uuid.uuid4()}"
+    async with AsyncSessionLocal() as db:
+        db.add_all(
+            Reservation(
+                id=uuid.uuid4(), user_id=1, restaurant_name=f"{prefix} {name}", reservation_time=datetime(2030, 1, 1),
+                number_of_people=2, budget=100, created_at=datetime(2030, 1, 1, 0, 0, index),
+            )
+            for index, name in enumerate(names)
+        )
+        await db.commit()
+        result = await page_result(db, reservations_statement(restaurant_name=prefix), Reservation.created_at, RESERVATION_FIELDS, **kwargs)
+    assert count_tokens(result) <= settings.TOOL_RESULT_MAX_TOKENS + 60  # The cap is on the rows; the note comes on top
+    return json.loads(result)
+
+async def test_rows_past_the_page_are_counted(async_database, monkeypatch):
+    monkeypatch.setattr(settings, "TOOL_RESULT_PAGE_SIZE", 2)
+    page = await reservations_page(["a", "b", "c", "d", "e"], skip=1)
+    assert [row["restaurant_name"][-1] for row in page["rows"]] == ["b", "c"]
+    assert page["more"] == 2
+    assert "skip=3" in page["note"]
+
+async def test_rows_past_the_token_cap_are_counted(async_database, monkeypatch):
+    monkeypatch.setattr(settings, "TOOL_RESULT_MAX_TOKENS", 300)
+    page = await reservations_page(["short"] * 2 + ["long " * 400])
+    assert len(page["rows"]) == 2
+    assert page["more"] == 1
+
+async def test_an_oversized_first_row_is_cut_short(async_database, monkeypatch):
+    monkeypatch.setattr(settings, "TOOL_RESULT_MAX_TOKENS", 100)
+    page = await reservations_page(["long " * 200, "short"])
+    assert len(page["rows"]) == 1
+    assert page["rows"][0]["restaurant_name"].endswith("...")
+    assert page["more"] == 1
+    assert "skip=1" in page["note"]
+
+async def test_a_first_row_that_cannot_fit_is_left_out(async_database, monkeypatch):
+    monkeypatch.setattr(settings, "TOOL_RESULT_MAX_TOKENS", 5)
+    page = await reservations_page(["long " * 200])
+    assert page["rows"] == []
+    assert page["more"] == 1
+    assert "too large" in page["note"] and "skip=1" in page["note"]
+
+def test_fit_row_halves_the_longest_text():
+    values = {"id": "1", "notes": "word " * 400, "name": "Luigi's trattoria"}
+    item = fit_row(values, 60)
+    assert count_tokens(item) <= 60
+    fitted = json.loads(item)
+    assert fitted["id"] == "1" and fitted["notes"].endswith("...")
+    assert fit_row({"id": 1, "size": 2}, 1) is None
+
+#############
+# Direct responses
+#############
+
+def test_appointments_render_a_placeholder_for_a_missing_date():
+    tool = TOOLS["get_appointments"]
+    result = compact_json({"rows": [
+        {"type": "checkup", "status": "Pending"},
+        {"type": "dental", "status": "Confirmed", "scheduled_date": "2030-01-05"},
+        {"type": "x-ray", "status": "Pending", "scheduled_date": None},
+    ], "more": 2})
+    assert render_result(tool.direct_template, result, tool.direct_placeholders).splitlines() == [
+        "- checkup appointment, unscheduled (Pending)",
+        "- dental appointment, 2030-01-05 (Confirmed)",
+        "- x-ray appointment, unscheduled (Pending)",
+        "...and 2 more. Refine your request to narrow the list.",
+    ]
+
+def test_render_result_without_rows():
+    assert render_result("{location}: {temperature}", '{"location": "Paris", "temperature": 22}') == "Paris: 22"
+    assert render_result("- {type}", '{"rows": []}') == "No results found."
+    with pytest.raises(ValueError):
+        render_result("- {type}", '{"error": "Function failed."}')
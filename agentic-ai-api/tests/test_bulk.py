@@ -0,0 +1,84 @@
+import uuid
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+BULK = "/reservations/reservations/bulk"
+
+def reservation(restaurant_name: str, **fields) -> dict:
+    return {
+        "user_id": 1,
+        "restaurant_name": restaurant_name,
+        "reservation_time": "2030-01-01T19:00:00",
+        "number_of_people": 2,
+        "budget": 100,
+        **fields,
+    }
+
+async def created(client, *names: str, **fields) -> list:
+    response = await client.post(BULK, json=[reservation(name, **fields) for name in names])
+    assert response.status_code == 200
+    return [item["id"] for item in response.json()["items"]]
+
+async def fetched(client, id: str) -> dict:
+    response = await client.get(f"/reservations/reservations/{id}")
+    return response.json()
+
+#############
+# Create
+#############
+
+async def test_atomic_create_writes_nothing_when_a_row_is_invalid(client):
+    name = f"atomic-{uuid.uuid4()}"
+    response = await client.post(BULK, json=[reservation(name), reservation(name, number_of_people="many")])
+    assert response.status_code == 422
+    assert [error["index"] for error in response.json()["detail"]["errors"]] == [1]
+
+    listed = await client.get("/reservations/reservations/", params={"limit": 100})
+    assert name not in {item["restaurant_name"] for item in listed.json()["items"]}
+
+async def test_best_effort_create_skips_the_invalid_rows(client):
+    response = await client.post(
+        f"{BULK}?mode=best_effort",
+        content=b'{"broken"\n' + b"\n".join(
+            f'{{"user_id": 1, "restaurant_name": "{name}", "reservation_time": "2030-01-01T19:00:00", "number_of_people": 2, "budget": 100}}'.encode()
+            for name in ("first", "second")
+        ),
+        headers={"content-type": "application/x-ndjson"},
+    )
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (2, 1)
+    assert [item["index"] for item in body["items"]] == [1, 2]
+    assert [error["index"] for error in body["errors"]] == [0]
+
+#############
+# Update
+#############
+
+async def test_update_reports_unknown_ids(client):
+    first, second = await created(client, "before", "before", status="confirmed")
+    rows = [{"id": id, **reservation("after")} for id in (first, str(uuid.uuid4()), second)]
+
+    response = await client.put(BULK, json=rows)
+    assert response.status_code == 422
+    assert response.json()["detail"]["errors"][0]["index"] == 1
+    assert response.json()["detail"]["errors"][0]["errors"][0]["type"] == "not_found"
+    assert (await fetched(client, first))["restaurant_name"] == "before"  # Rolled back
+
+    response = await client.put(f"{BULK}?mode=best_effort", json=rows)
+    body = response.json()
+    assert [item["index"] for item in body["items"]] == [0, 2]
+    assert [error["index"] for error in body["errors"]] == [1]
+    for id in (first, second):
+        # Partial: the status the rows leave out is kept
+        assert {key: value for key, value in (await fetched(client, id)).items() if key in ("restaurant_name", "status")} == {
+            "restaurant_name": "after",
+            "status": "confirmed",
+        }
+
+async def test_update_sets_each_row_its_own_values(client):
+    ids = await created(client, "a", "b", "c")
+    response = await client.put(BULK, json=[{"id": id, **reservation(f"renamed-{id}")} for id in ids])
+    assert response.json()["succeeded"] == 3
+    for id in ids:
+        assert (await fetched(client, id))["restaurant_name"] == f"renamed-{id}"
@@ -0,0 +1,38 @@
+import threading
+import pytest
+from app.services.completion_cache import CompletionCache
+
+pytestmark = pytest.mark.anyio
+
+async def test_persisted_entries_survive_a_restart(tmp_path):
+    cache = CompletionCache(path=str(tmp_path / "cache.db"))
+    await cache.set("key", "completion")
+    assert await CompletionCache(path=str(tmp_path / "cache.db")).get("key") == "completion"
+
+async def test_sqlite_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = CompletionCache(path=str(tmp_path / "cache.db"))
+    threads = []
+    execute = cache._execute
+
+    def recording_execute(sql, params=()):
+        threads.append(threading.current_thread())
+        return execute(sql, params)
+
+    monkeypatch.setattr(cache, "_execute", recording_execute)
+    await cache.set("key", "completion")
+    cache._entries.clear()  # Force a read from the file
+    assert await cache.get("key") == "completion"
+    await cache.invalidate("agent4")
+    await cache.clear()
+    assert len(threads) == 4 and threading.main_thread() not in threads
+
+async def test_invalidate_drops_one_tag(tmp_path):
+    cache = CompletionCache(path=str(tmp_path / "cache.db"))
+    await cache.set("read", "reservations", tag="agent4")
+    await cache.set("other", "appointments", tag="agent3")
+    await cache.invalidate("agent4")
+    assert await cache.get("read") is None and await cache.get("other") == "appointments"
+
+    # Also gone from the file
+    reopened = CompletionCache(path=str(tmp_path / "cache.db"))
+    assert await reopened.get("read") is None and await reopened.get("other") == "appointments"
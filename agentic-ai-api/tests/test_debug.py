@@ -0,0 +1,19 @@
+import pytest
+from app.core.config import settings
+
+pytestmark = pytest.mark.anyio
+
+DEBUG_ROUTES = [("GET", "/debug/traces"), ("GET", "/debug/traces/unknown"), ("GET", "/debug/db/pool"), ("POST", "/debug/profile")]
+
+@pytest.mark.parametrize("method, path", DEBUG_ROUTES)
+async def test_debug_routes_need_the_admin_token(client, monkeypatch, method, path):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    assert (await client.request(method, path)).status_code == 403
+    assert (await client.request(method, path, headers={"X-Admin-Token": "wrong"})).status_code == 403
+
+async def test_debug_routes_with_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": "secret"}
+    assert (await client.get("/debug/traces", headers=headers)).status_code == 200
+    assert (await client.get("/debug/traces/unknown", headers=headers)).status_code == 404
+    assert (await client.get("/debug/db/pool", headers=headers)).status_code == 200
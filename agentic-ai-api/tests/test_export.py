@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+import uuid
+import pytest
+from app.core.config import settings
+from app.schemas.reservations import ReservationResponse
+
+pytestmark = pytest.mark.anyio
+
+LIST = "/reservations/reservations/"
+
+@pytest.fixture
+async def names(client, monkeypatch):
+    """Three new reservations; exports read them two rows at a time."""
+    monkeypatch.setattr(settings, "EXPORT_CHUNK_SIZE", 2)
+    names = [f"export-{uuid.uuid4()}" for _ in range(3)]
+    rows = [
+        {"user_id": 1, "restaurant_name": name, "reservation_time": "2030-01-01T19:00:00", "number_of_people": 2, "budget": 100}
+        for name in names
+    ]
+    assert (await client.post("/reservations/reservations/bulk", json=rows)).status_code == 200
+    return names
+
+async def test_ndjson_export_streams_every_row(client, names):
+    response = await client.get(LIST, headers={"accept": "application/x-ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert set(names) <= {item["restaurant_name"] for item in items}
+    assert len(items) == len({item["id"] for item in items})
+    keys = [(item["created_at"], item["id"]) for item in items]
+    assert keys == sorted(keys)
+
+async def test_csv_export_has_a_header_and_one_line_per_row(client, names):
+    response = await client.get(LIST, params={"format": "csv"})
+    assert response.headers["content-disposition"] == 'attachment; filename="reservations.csv"'
+    header, *rows = list(csv.reader(io.StringIO(response.text)))
+    assert header == list(ReservationResponse.model_fields)
+    exported = {row[header.index("restaurant_name")]: row for row in rows}
+    assert set(names) <= set(exported)
+    assert exported[names[0]][header.index("number_of_people")] == "2"
+
+async def test_export_continues_after_a_cursor(client, names):
+    items = [json.loads(line) for line in (await client.get(LIST, params={"format": "ndjson"})).text.splitlines()]
+    page = await client.get(LIST, params={"limit": 1})
+    cursor = page.json()["next_cursor"]
+    after = [json.loads(line) for line in (await client.get(LIST, params={"format": "ndjson", "cursor": cursor})).text.splitlines()]
+    assert after == items[1:]
+
+async def test_invalid_cursor_fails_before_streaming(client):
+    response = await client.get(LIST, params={"format": "csv", "cursor": "not a cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import threading
+import time
+from dataclasses import replace
+from types import SimpleNamespace
+import httpx
+import openai
+import pytest
+from app.core import openai_client
+from app.services import openai_service
+from app.services.agent_tools import TOOLS, ToolSet
+from app.services.openai_service import AGENTS, Agent, agent_events, collect_answer
+from app.services.semantic_cache import semantic_caches
+
+pytestmark = pytest.mark.anyio
+
+RESERVATION_RULES = [
+    {
+        "match": r"\bbook\b",
+        "tool_calls": [{
+            "name": "create_reservation",
+            "arguments": {
+                "restaurant_name": "Luigi's",
+                "reservation_time": "2030-01-01T19:00:00",
+                "number_of_people": 2,
+                "budget": 100,
+            },
+        }],
+    },
+    {"match": "reservations", "tool_calls": [{"name": "get_reservations", "arguments": {"restaurant_name": "Luigi"}}]},
+    {"match": ".*", "after_tools": True, "content": "Here are your reservations."},
+]
+
+async def ask(agent, prompt: str) -> dict:
+    meta = {}
+    agent = AGENTS[agent] if isinstance(agent, str) else agent
+    meta["answer"] = await collect_answer(agent_events(agent, prompt), meta)
+    return meta
+
+#############
+# Cache invalidation on writes
+#############
+
+async def test_write_drops_the_cached_reads(async_database, mock_llm):
+    completions = mock_llm(RESERVATION_RULES)
+    await ask("agent4", "list my reservations at Luigi's")
+    await ask("agent5", "list my reservations at Luigi's")
+    assert "semantic_cache" in await ask("agent4", "show my reservations at Luigi's")
+    calls = completions.calls
+
+    booked = await ask("agent5", "book a table at Luigi's for 2 people")
+    assert booked["agent"]["response_path"] == "direct"
+    assert "Luigi's" in booked["answer"]
+
+    # Every agent that can book lost its cached reads
+    assert not semantic_caches["agent4"].stats()["entries"]
+    assert not semantic_caches["agent5"].stats()["entries"]
+    listed = await ask("agent4", "show my reservations at Luigi's")
+    assert "semantic_cache" not in listed
+    assert completions.calls == calls + 1 + 2
+
+#############
+# Wall-clock budget
+#############
+
+class TimingOutCompletions:
+    """Every attempt waits out its timeout and fails, as a stalled API would."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, timeout: float, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(timeout)
+        raise openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+async def test_retries_stop_at_the_deadline(mock_llm, monkeypatch):
+    completions = TimingOutCompletions()
+    monkeypatch.setattr(openai_client, "_client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    agent = Agent("deadline", AGENTS["agent3"].tool_set, max_seconds=0.5)
+
+    started = time.perf_counter()
+    meta = await ask(agent, "what's the weather in Paris")
+    assert time.perf_counter() - started < 0.9
+    assert meta["agent"]["stop_reason"] == "max_seconds"
+    assert meta["agent"]["response_path"] == "partial"
+    assert meta["answer"] == "I ran out of time before I could answer."
+
+async def test_no_closing_completion_without_time_left(mock_llm):
+    completions = mock_llm([
+        {"match": "weather", "tool_calls": [{"name": "get_current_weather", "arguments": {"location": "Paris"}}]},
+    ])
+
+    async def slow_weather(args):
+        await asyncio.sleep(0.3)
+        return json.dumps({"location": args.location, "temperature": 22})
+
+    tool_set = ToolSet("slow", [replace(TOOLS["get_current_weather"], handler=slow_weather)])
+    meta = await ask(Agent("slow", tool_set, max_steps=1, max_seconds=0.2), "what's the weather in Paris")
+    assert completions.calls == 1
+    assert meta["agent"]["stop_reason"] == "max_seconds"
+    assert "22" in meta["answer"]
+
+#############
+# Concurrent tool calls
+#############
+
+WEATHER_RULES = [
+    {"match": "weather", "tool_calls": [
+        {"name": "get_current_weather", "arguments": {"location": "Paris"}},
+        {"name": "get_current_weather", "arguments": {"location": "Tokyo"}},
+    ]},
+    {"match": ".*", "after_tools": True, "content": "Paris and Tokyo."},
+]
+
+def weather_agent(handler) -> Agent:
+    return Agent("weather", ToolSet("weather", [replace(TOOLS["get_current_weather"], handler=handler)]))
+
+async def tool_events(agent: Agent, prompt: str) -> list:
+    return [event["data"] async for event in agent_events(agent, prompt) if event["event"] == "tool_finished"]
+
+async def test_a_turn_runs_its_tool_calls_concurrently(mock_llm):
+    completions = mock_llm(WEATHER_RULES)
+    prompts = []
+    create = completions.create
+
+    async def recording_create(**kwargs):
+        prompts.append(kwargs["messages"])
+        return await create(**kwargs)
+
+    completions.create = recording_create
+    threads = []
+
+    def slow_weather(args):
+        # Blocking: runs on the tool thread pool, not the event loop
+        threads.append(threading.current_thread().name)
+        time.sleep(0.3 if args.location == "Paris" else 0.1)
+        return json.dumps({"location": args.location})
+
+    started = time.perf_counter()
+    finished = await tool_events(weather_agent(slow_weather), "what's the weather in Paris and Tokyo")
+    assert time.perf_counter() - started < 0.39
+
+    assert all(name.startswith("agent-tool") for name in threads)
+    # Reported as they finish, but fed back in the order the model asked
+    results = [message["content"] for message in prompts[-1] if isinstance(message, dict) and message["role"] == "tool"]
+    assert [json.loads(result)["location"] for result in results] == ["Paris", "Tokyo"]
+    assert [event["status"] for event in finished] == ["ok", "ok"]
+    assert finished[0]["elapsed_ms"] < finished[1]["elapsed_ms"]
+
+async def test_a_failing_tool_only_fails_itself(mock_llm, monkeypatch):
+    mock_llm(WEATHER_RULES)
+    monkeypatch.setattr(openai_service.settings, "TOOL_TIMEOUT", 0.1)
+
+    async def flaky_weather(args):
+        if args.location == "Paris":
+            await asyncio.sleep(1)
+        raise RuntimeError("no forecast")
+
+    finished = await tool_events(weather_agent(flaky_weather), "what's the weather in Paris and Tokyo")
+    assert sorted(event["status"] for event in finished) == ["error", "timeout"]
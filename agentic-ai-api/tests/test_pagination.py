@@ -0,0 +1,50 @@
+import uuid
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from app.core.database import AsyncSessionLocal
+from app.core.pagination import decode_cursor, encode_cursor, fetch_page
+from app.models.reservations import Reservation
+
+pytestmark = pytest.mark.anyio
+
+def test_cursor_round_trip():
+    key = (datetime(2030, 1, 1, 19, 0, 0, 123456), uuid.uuid4())
+    cursor = encode_cursor(*key)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == key
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor(datetime(2030, 1, 1), uuid.uuid4())[:-4], "WzFd"])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+async def test_pages_break_ties_on_id(async_database):
+    # Rows sharing a created_at, as a bulk insert gives them
+    name = f"keyset-{uuid.uuid4()}"
+    created_at = [datetime(2030, 1, 1)] * 5 + [datetime(2030, 1, 2)] * 2
+    async with AsyncSessionLocal() as db:
+        db.add_all(
+            Reservation(
+                id=uuid.uuid4(), user_id=1, restaurant_name=name, reservation_time=at,
+                number_of_people=2, budget=100, created_at=at,
+            )
+            for at in created_at
+        )
+        await db.commit()
+
+        statement = select(Reservation).where(Reservation.restaurant_name == name)
+        pages, cursor = [], None
+        while True:
+            page = await fetch_page(db, statement, Reservation, limit=2, cursor=cursor)
+            pages.append(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+    assert [len(items) for items in pages] == [2, 2, 2, 1]
+    keys = [(row.created_at, row.id) for items in pages for row in items]
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(created_at)
@@ -0,0 +1,112 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from app.core.metrics import render_metrics
+from app.services.openai_service import create_chat_completion
+from app.services.rate_limiter import PRIORITY_BATCH, PRIORITY_DEFAULT, PRIORITY_INTERACTIVE, CompletionScheduler, completion_scheduler
+
+pytestmark = pytest.mark.anyio
+
+def rate_limit_error(headers=None) -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return openai.RateLimitError("Rate limited", response=httpx.Response(429, headers=headers, request=request), body=None)
+
+#############
+# Ordering
+#############
+
+async def test_waiting_calls_run_by_priority_then_arrival():
+    scheduler = CompletionScheduler(requests_per_minute=6000, tokens_per_minute=100000)
+    scheduler.requests.level = 0  # Every call has to queue
+    order = []
+
+    def call(name):
+        async def fn():
+            order.append(name)
+        return fn
+
+    waiting = []
+    for name, priority in (("batch", PRIORITY_BATCH), ("default 1", PRIORITY_DEFAULT), ("interactive", PRIORITY_INTERACTIVE), ("default 2", PRIORITY_DEFAULT)):
+        waiting.append(asyncio.create_task(scheduler.run(call(name), tokens=10, priority=priority)))
+        await asyncio.sleep(0)
+    await asyncio.gather(*waiting)
+
+    assert order == ["interactive", "default 1", "default 2", "batch"]
+    assert scheduler.stats()["max_queue_depth"] == 4
+
+#############
+# Retries
+#############
+
+async def test_transient_errors_are_retried_up_to_the_limit():
+    scheduler = CompletionScheduler(requests_per_minute=600, tokens_per_minute=100000, max_retries=2, backoff_base=0.001)
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        raise rate_limit_error()
+
+    with pytest.raises(openai.RateLimitError):
+        await scheduler.run(failing, tokens=10)
+    assert len(attempts) == 3
+    assert (scheduler.retries, scheduler.rate_limited, scheduler.failures) == (2, 3, 1)
+
+async def test_other_errors_are_not_retried():
+    scheduler = CompletionScheduler(requests_per_minute=600, tokens_per_minute=100000, backoff_base=0.001)
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        await scheduler.run(failing, tokens=10)
+    assert len(attempts) == 1
+    assert scheduler.retries == 0
+
+def test_backoff_honours_retry_after():
+    scheduler = CompletionScheduler(requests_per_minute=600, tokens_per_minute=100000, backoff_base=0.5, backoff_max=20)
+    assert scheduler.backoff(0, rate_limit_error({"retry-after": "3"})) == 3
+    assert scheduler.backoff(0, rate_limit_error({"retry-after": "600"})) == 20
+    assert 0 <= scheduler.backoff(3, rate_limit_error()) <= 4
+
+#############
+# Metrics and usage
+#############
+
+async def test_scheduler_metrics_are_exported():
+    scheduler = CompletionScheduler(requests_per_minute=600, tokens_per_minute=100000, backoff_base=0.001)
+    failures = [rate_limit_error()]
+
+    async def flaky():
+        if failures:
+            raise failures.pop()
+        return "ok"
+
+    assert await scheduler.run(flaky, tokens=10) == "ok"
+    metrics = render_metrics()
+    for name in (
+        "llm_scheduler_queue_depth{stat=\"max\"}",
+        "llm_scheduler_wait_seconds_count",
+        "llm_scheduler_retries_total{error=\"RateLimitError\"}",
+        "llm_scheduler_rate_limited_total",
+        "# TYPE llm_scheduler_failures_total counter",
+    ):
+        assert name in metrics
+
+async def test_streamed_usage_settles_the_token_bucket(mock_llm, monkeypatch):
+    mock_llm([{"match": ".*", "content": "A streamed answer."}])
+    settled = []
+    monkeypatch.setattr(completion_scheduler, "record_usage", lambda estimated, actual: settled.append((estimated, actual)))
+
+    response = await create_chat_completion(
+        stream=True,
+        stream_options={"include_usage": True},
+        model="gpt-3.5-turbo",
+        messages=[{"role": "user", "content": "Say something."}],
+    )
+    chunks = [chunk async for chunk in response]
+    usage = chunks[-1].usage
+    assert usage is not None
+    assert len(settled) == 1 and settled[0][1] == usage.total_tokens
@@ -0,0 +1,106 @@
+import pytest
+from app.core.config import settings
+from app.services.semantic_cache import SemanticCache, embed, extract_entities, is_write_request
+
+ANSWER = settings.SEMANTIC_CACHE_ANSWER_THRESHOLD
+
+# Same question, same values: the cached answer is correct
+PARAPHRASES = [
+    ("show pending appointments", "list appointments that are pending"),
+    ("show me all pending appointments", "which appointments are still pending?"),
+    ("get completed appointments", "show appointments that are completed"),
+    ("show cancelled appointments", "list the canceled appointments"),
+    ("list appointments for patient 1234", "show the appointments of patient 1234"),
+    ("list appointments scheduled on 2025-01-02", "show appointments on 2025-01-02"),
+    ("show my reservations", "list all my reservations"),
+    ("list confirmed reservations", "which reservations are confirmed"),
+    ("show pending reservations", "list reservations that are pending"),
+    ("show my bookings", "list my reservations"),
+    ("what is the weather like in Boston, MA", "current weather for Boston MA"),
+    ("what's the weather in Paris", "weather in Paris"),
+    ("show pending apointments", "show pending appointments"),
+    ("show my tables at Luigi's for 2 people tomorrow at 19:00", "list my reservations at Luigi's for 2 people tomorrow at 19:00"),
+    ("show my booked tables", "list my reserved tables"),
+]
+
+# Same request with other values: the answer must not carry over
+OTHER_VALUES = [
+    ("list appointments for patient 1234 on 2025-01-02", "list appointments for patient 1234 on 2025-01-03"),
+    ("list appointments for patient 1234", "list appointments for patient 5678"),
+    ("show my table for 2 people at Luigi's", "show my table for 4 people at Luigi's"),
+    ("show my table for 2 people at Luigi's at 19:00", "show my table for 2 people at Luigi's at 20:00"),
+    ("show my table for 2 people at Luigi's tomorrow", "show my table for 2 people at Luigi's on Friday"),
+    ("what's the weather in Paris", "what's the weather in London"),
+]
+
+# Different requests: nothing carries over
+DIFFERENT = [
+    ("show pending appointments", "show completed appointments"),
+    ("show pending appointments", "show pending reservations"),
+    ("list confirmed reservations", "list canceled reservations"),
+    ("show my reservations", "book a reservation for 2 people"),
+    ("show pending appointments", "cancel my pending appointments"),
+    ("list appointments", "list patients"),
+    ("what's the weather in Paris", "show my reservations in Paris"),
+]
+
+# Read then write: the write request has to reach the tools
+WRITES = [
+    ("show my reserved tables at Luigi's for 2 people tomorrow at 19:00", "reserve a table at Luigi's for 2 people tomorrow at 19:00"),
+    ("show my bookings at Luigi's for 2 people tomorrow at 19:00", "book a table at Luigi's for 2 people tomorrow at 19:00"),
+    ("list confirmed reservations", "confirm my reservations"),
+    ("show canceled reservations", "cancel my reservations"),
+    ("show my pending appointments", "reschedule my pending appointments"),
+]
+
+def similarity(first, second):
+    return float(embed(first) @ embed(second))
+
+@pytest.mark.parametrize("cached, prompt", PARAPHRASES)
+def test_paraphrase_reuses_the_answer(cached, prompt):
+    cache = SemanticCache("test", answer_threshold=ANSWER)
+    cache.add(cached, "cached answer")
+    match = cache.lookup(prompt)
+    assert match is not None and match.answer == "cached answer", similarity(cached, prompt)
+
+@pytest.mark.parametrize("cached, prompt", OTHER_VALUES)
+def test_other_values_never_reuse_the_answer(cached, prompt):
+    cache = SemanticCache("test", answer_threshold=ANSWER)
+    cache.add(cached, "cached answer")
+    assert extract_entities(cached) != extract_entities(prompt)
+    assert cache.lookup(prompt) is None
+
+@pytest.mark.parametrize("cached, prompt", DIFFERENT)
+def test_different_request_misses(cached, prompt):
+    cache = SemanticCache("test", answer_threshold=ANSWER)
+    cache.add(cached, "cached answer")
+    assert cache.lookup(prompt) is None, similarity(cached, prompt)
+
+@pytest.mark.parametrize("cached, prompt", WRITES)
+def test_write_request_is_never_served(cached, prompt):
+    cache = SemanticCache("test", answer_threshold=ANSWER)
+    cache.add(cached, "cached answer")
+    assert is_write_request(prompt) and not is_write_request(cached)
+    assert cache.lookup(prompt) is None, similarity(cached, prompt)
+
+@pytest.mark.parametrize("cached, prompt", WRITES)
+def test_write_request_is_never_stored(cached, prompt):
+    cache = SemanticCache("test", answer_threshold=ANSWER)
+    cache.add(prompt, "cached answer")
+    assert cache.stats()["entries"] == 0
+
+def test_thresholds_separate_the_sets():
+    paraphrases = min(similarity(*pair) for pair in PARAPHRASES)
+    different = max(similarity(*pair) for pair in DIFFERENT + WRITES)
+    assert different < ANSWER <= paraphrases
+
+def test_answer_comes_from_the_entry_with_the_same_values():
+    cache = SemanticCache("test", answer_threshold=ANSWER)
+    cache.add("list appointments for patient 1234 on 2025-01-02", "on the 2nd")
+    cache.add("list appointments for patient 1234 on 2025-01-03", "on the 3rd")
+    assert cache.lookup("show the appointments of patient 1234 on 2025-01-03").answer == "on the 3rd"
+
+def test_entities():
+    assert extract_entities("Book a table for 2 people at Luigi's tomorrow at 19:00") == ("19:00", "2", "luigi", "tomorrow")
+    assert extract_entities("What is the weather in Paris. Show it in celsius") == ("paris",)
+    assert extract_entities("can I see my bookings") == ()
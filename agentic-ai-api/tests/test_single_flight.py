@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from app.services.single_flight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+class Call:
+    """A call that counts its runs and finishes when released."""
+
+    def __init__(self, result="answer"):
+        self.result = result
+        self.runs = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.runs += 1
+        await self.release.wait()
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+async def test_identical_calls_share_one_run():
+    flights, call = SingleFlight(), Call()
+    tasks = [asyncio.create_task(flights.do("key", call, scope="ask")) for _ in range(5)]
+    await asyncio.sleep(0)
+    call.release.set()
+
+    assert await asyncio.gather(*tasks) == ["answer"] * 5
+    assert call.runs == 1
+    assert flights.stats() == {"in_flight": 0, "scopes": {"ask": {"calls": 1, "coalesced": 4}}}
+
+async def test_different_keys_run_separately():
+    flights, call = SingleFlight(), Call()
+    call.release.set()
+    assert await asyncio.gather(flights.do("a", call), flights.do("b", call)) == ["answer", "answer"]
+    assert call.runs == 2
+
+async def test_the_leader_error_reaches_every_caller():
+    flights, call = SingleFlight(), Call(ValueError("failed"))
+    tasks = [asyncio.create_task(flights.do("key", call)) for _ in range(3)]
+    await asyncio.sleep(0)
+    call.release.set()
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert [str(result) for result in results] == ["failed"] * 3
+    assert all(isinstance(result, ValueError) for result in results)
+    assert call.runs == 1
+
+    # Nothing is left in flight: the next call runs again
+    call.result = "answer"
+    assert await flights.do("key", call) == "answer"
+    assert call.runs == 2
+
+async def test_a_cancelled_leader_hands_over_to_a_waiter():
+    flights, call = SingleFlight(), Call()
+    leader = asyncio.create_task(flights.do("key", call))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flights.do("key", call))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    call.release.set()
+    assert await follower == "answer"
+    assert leader.cancelled()
+    assert call.runs == 2
@@ -0,0 +1,52 @@
+from app.services.token_budget import count_prompt_tokens, pack_messages
+
+SYSTEM = {"role": "system", "content": "You are a helpful assistant."}
+
+def turn(number: int, tool_output: str = "") -> list:
+    """An earlier turn: the user's question, a tool round and the answer."""
+    messages = [{"role": "user", "content": f"Question {number} about my reservations?"}]
+    if tool_output:
+        messages += [
+            {"role": "assistant", "content": None, "tool_calls": [
+                {"id": f"call_{number}", "type": "function", "function": {"name": "get_reservations", "arguments": "{}"}},
+            ]},
+            {"role": "tool", "tool_call_id": f"call_{number}", "content": tool_output},
+        ]
+    return messages + [{"role": "assistant", "content": f"Answer {number}."}]
+
+def test_a_prompt_within_budget_is_unchanged():
+    messages = [SYSTEM, *turn(1), {"role": "user", "content": "And now?"}]
+    packed, tokens, saved = pack_messages(messages, budget=10000)
+    assert packed is messages
+    assert tokens == count_prompt_tokens(messages)
+    assert saved == 0
+
+def test_tool_outputs_are_truncated_first():
+    messages = [SYSTEM, *turn(1, "reservation " * 2000), {"role": "user", "content": "And now?"}]
+    before = count_prompt_tokens(messages)
+    packed, tokens, saved = pack_messages(messages, budget=before - 1000, tool_output_tokens=50)
+
+    assert [message["role"] for message in packed] == [message["role"] for message in messages]
+    assert "truncated" in packed[3]["content"]
+    assert "truncated" not in messages[3]["content"]  # The caller's messages are left alone
+    assert tokens == count_prompt_tokens(packed) <= before - 1000
+    assert saved == before - tokens
+
+def test_earlier_turns_are_dropped_oldest_first():
+    current = {"role": "user", "content": "And now?"}
+    messages = [SYSTEM, *turn(1), *turn(2), *turn(3), current]
+    keep = count_prompt_tokens([SYSTEM, *turn(3), current])
+    packed, tokens, _ = pack_messages(messages, budget=keep)
+
+    assert packed == [SYSTEM, *turn(3), current]
+    assert tokens == keep
+
+def test_the_system_prompt_and_current_turn_are_never_dropped():
+    current = [{"role": "user", "content": "And now?"}, *turn(4, "reservation " * 500)[1:3]]
+    messages = [SYSTEM, *turn(1), *current]
+    packed, tokens, _ = pack_messages(messages, budget=1)
+
+    assert packed[0] == SYSTEM
+    assert packed[1] == current[0]
+    assert [message["role"] for message in packed[1:]] == ["user", "assistant", "tool"]
+    assert tokens > 1  # Still over budget: the rest is sent as is